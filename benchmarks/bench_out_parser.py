@@ -0,0 +1,83 @@
+"""
+Parse throughput of the legacy line-by-line OUT parser (Theriapy.parse_file) and of the single-pass
+parser (out_parser.parse_out_text).
+
+Usage: python benchmarks/bench_out_parser.py [OUT ...] [--repeat N] [--write-fixtures]
+
+Without OUT arguments the synthetic OUTs of benchmarks/fixtures are used. They are not recorded Theriak
+outputs: mock.render_out writes them in the layout the parsers expect, so they only check that both parsers
+agree on that layout and measure their relative throughput (x2 to x3 for the fast parser on them). Pass real
+Theriak-Domino OUT files to benchmark and compare the parsers on actual outputs. --write-fixtures renders the
+synthetic OUTs again.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from theriapy.legacy import Theriapy
+from theriapy.mock import PHASE_CATALOGUE, render_out
+from theriapy.out_parser import parse_out_text
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+# synthetic OUTs rendered by mock.render_out, file name: (pressure, temperature, catalogue)
+FIXTURES = {
+    # pure solid phases only
+    "synthetic_pure_solids.OUT": (4000, 700, [c for c in PHASE_CATALOGUE if c[2] is None and not c[1]]),
+    # solutions with a free fluid
+    "synthetic_fluid.OUT": (4000, 500, PHASE_CATALOGUE),
+    # five solid solutions, no fluid
+    "synthetic_solutions.OUT": (6000, 620, [c for c in PHASE_CATALOGUE if not c[1]]),
+}
+
+
+def fixture_paths():
+    return [os.path.join(FIXTURES_DIR, name) for name in FIXTURES]
+
+
+def write_fixtures():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for name, (pressure, temperature, catalogue) in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, name), "w") as file:
+            file.write(render_out(pressure, temperature, FIXTURE_BULK, catalogue=catalogue))
+
+
+def bench(text, repeat):
+    legacy = Theriapy.__new__(Theriapy)  # parse_file does not need an initialized instance
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        legacy_res = legacy.parse_file(io.StringIO(text))[0]
+    t_legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        tables = parse_out_text(text)
+    t_fast = time.perf_counter() - start
+
+    return t_legacy, t_fast, list(legacy_res) == list(tables.to_legacy())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("outs", nargs="*", help="Theriak OUT files (synthetic fixtures by default)")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--write-fixtures", action="store_true", help="render the synthetic fixtures again")
+    args = parser.parse_args()
+
+    if args.write_fixtures:
+        write_fixtures()
+    for path in args.outs or fixture_paths():
+        with open(path) as file:
+            text = file.read()
+        t_legacy, t_fast, same = bench(text, args.repeat)
+        mb = len(text) * args.repeat / 1e6
+        print(f"{path}: legacy {mb / t_legacy:.1f} MB/s, fast {mb / t_fast:.1f} MB/s, "
+              f"speed-up x{t_legacy / t_fast:.1f}, same tables: {same}")
+
+
+if __name__ == "__main__":
+    main()
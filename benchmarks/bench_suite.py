@@ -0,0 +1,126 @@
+"""
+End-to-end throughput of TheriaPy on the mock Theriak backend (theriapy.mock).
+
+Times compute_pt_path, compute_ruled_pt_path, find_phase_apparition_temp and batch_plot_stacked_volumes
+for several path lengths and appends one JSON record per (benchmark, length) to the output file.
+find_phase_apparition_temp is run for n // 10 pressures (at least 1).
+With --baseline, the timings are compared to the records of a previous output file.
+
+Usage: python benchmarks/bench_suite.py [--lengths 10,100,1000] [--latency 0] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from matplotlib import pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from theriapy.mock import mock_container
+from theriapy.batch_plot import batch_plot_stacked_volumes
+
+BULK = "SI(65.44)AL(15.99)FE(4.97)MG(2.17)CA(4.25)NA(4.09)K(2.24)TI(0.78)O(?)H(6)"
+BULKS = ["SI(50.36)AL(30.54)FE(6.23)MG(2.46)CA(1.07)NA(4.62)K(4.73)O(?)H(2)",
+         BULK,
+         "SI(49.20)AL(16.70)FE(10.30)MG(5.40)CA(9.80)NA(3.10)K(0.70)TI(1.60)O(?)H(5)"]
+
+
+def path(n):
+    return np.linspace(4500, 12000, n).astype(int), np.linspace(520, 850, n).astype(int)
+
+
+def bench_compute_pt_path(ther, n):
+    press, temps = path(n)
+    ther.compute_pt_path(press, temps, [BULK] * n, verbose=0)
+    return n
+
+
+def bench_compute_ruled_pt_path(ther, n):
+    press, temps = path(n)
+    ther.compute_ruled_pt_path(press, temps, BULK, "remove_sol LIQtc_ 1", is_fluid=True, verbose=0)
+    return n
+
+
+def bench_find_phase_apparition_temp(ther, n):
+    calls = 0
+    for pressure in np.linspace(3000, 12000, max(1, n // 10)).astype(int):
+        ther.find_phase_apparition_temp(BULK, int(pressure), "GARNET_alm", tmin=300, tmax=1100)
+        calls += 1
+    return calls
+
+
+def bench_batch_plot_stacked_volumes(ther, n):
+    press, temps = path(n)
+    batch_plot_stacked_volumes(ther, BULKS, press, temps, normalize=True)
+    plt.close("all")
+    return n * len(BULKS)
+
+
+BENCHMARKS = {
+    "compute_pt_path": bench_compute_pt_path,
+    "compute_ruled_pt_path": bench_compute_ruled_pt_path,
+    "find_phase_apparition_temp": bench_find_phase_apparition_temp,
+    "batch_plot_stacked_volumes": bench_batch_plot_stacked_volumes,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def load_records(filepath):
+    records = {}
+    with open(filepath) as file:
+        for line in file:
+            if line.strip():
+                rec = json.loads(line)
+                records[(rec["benchmark"], rec["n"])] = rec  # last record wins
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lengths", default="10,100,1000", help="Comma-separated path lengths, e.g. 10,100,100000")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock Theriak latency per minimisation (s)")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS))
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         "results.jsonl"))
+    parser.add_argument("--baseline", default=None, help="Previous output file to compare with")
+    args = parser.parse_args()
+
+    baseline = load_records(args.baseline) if args.baseline else {}
+    revision = git_revision()
+    lengths = [int(n) for n in args.lengths.split(",")]
+
+    with open(args.output, "a") as out:
+        for name in args.benchmarks.split(","):
+            for n in lengths:
+                ther = mock_container(latency=args.latency)
+                start = time.perf_counter()
+                calls = BENCHMARKS[name](ther, n)
+                elapsed = time.perf_counter() - start
+                rec = {"benchmark": name, "n": n, "seconds": elapsed, "per_call_ms": 1000 * elapsed / calls,
+                       "minimisations": ther.theriak.n_calls, "latency": args.latency, "revision": revision,
+                       "python": platform.python_version(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+                out.write(json.dumps(rec) + "\n")
+                out.flush()
+
+                line = f"{name:<28} n={n:<7} {elapsed:9.3f} s  {rec['per_call_ms']:8.3f} ms/call"
+                if (name, n) in baseline:
+                    ratio = elapsed / baseline[(name, n)]["seconds"]
+                    line += f"  x{ratio:.2f} vs baseline" + ("  REGRESSION" if ratio > 1.2 else "")
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from theriapy.mock import mock_container
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+N = 400
+PRESSURES = np.linspace(3000, 12000, N)
+TEMPS = np.linspace(400, 900, N)
+
+
+@pytest.fixture(scope="module")
+def dense():
+    return mock_container().compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0)
+
+
+@pytest.mark.parametrize("vol_tol", [0.5, 2.0])
+def test_adaptive_path_matches_dense_path(dense, vol_tol):
+    ther = mock_container()
+    states = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, adaptive=True, vol_tol=vol_tol)
+    assert len(states) == N
+    assert ther.theriak.n_calls == N - states.interpolated.sum() < N
+    # reactions are located to the resolution of the path
+    assert [states.assemblage_at(i) for i in range(N)] == [dense.assemblage_at(i) for i in range(N)]
+    for phase in dense.phase_names:
+        assert states.first_appearance(phase) == dense.first_appearance(phase)
+    vols = states.get_merged_vols_df(normalize=True)
+    assert (vols - dense.get_merged_vols_df(normalize=True)[vols.columns]).abs().max().max() <= vol_tol
+
+
+def test_tighter_tolerance_costs_more_minimisations():
+    calls = []
+    for vol_tol in (5.0, 2.0, 0.5):
+        ther = mock_container()
+        ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, adaptive=True, vol_tol=vol_tol)
+        calls.append(ther.theriak.n_calls)
+    assert calls == sorted(calls) and calls[0] < calls[-1]
@@ -0,0 +1,54 @@
+import asyncio
+import os
+import time
+import pytest
+from theriapy.async_container import AsyncTheriakContainer
+from theriapy.mock import install_fake_theriak
+
+BULK = "SI(1)AL(1)FE(1)MG(1)O(?)"
+
+
+def running_theriaks(programs_dir):
+    """pids of the fake theriak processes of programs_dir"""
+    pids = []
+    for pid in os.listdir("/proc"):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as file:
+                if str(programs_dir).encode() in file.read():
+                    pids.append(pid)
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+@pytest.fixture
+def container(tmp_path):
+    install_fake_theriak(str(tmp_path / "bin"))
+    ther = AsyncTheriakContainer(str(tmp_path / "bin"), "mockdb", "mock", max_concurrency=2, source_dir=str(tmp_path))
+    yield ther
+    ther.close()
+
+
+def test_reuse_across_event_loops(container):
+    first = asyncio.run(container.compute_pt_path([4000, 4100], [500, 510], [BULK] * 2, verbose=0))
+    second = asyncio.run(container.compute_pt_path([4000, 4100], [500, 510], [BULK] * 2, verbose=0))
+    assert list(first.temperatures) == list(second.temperatures) == [500, 510]
+    assert first.phase_names == second.phase_names
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="lists the processes through /proc")
+def test_timeout_and_cancellation_kill_theriak(container, tmp_path, monkeypatch):
+    monkeypatch.setenv("THERIAPY_MOCK_HANG", "4005:505")
+
+    async def run():
+        with pytest.raises(TimeoutError):
+            await container.minimisation(4005, 505, BULK, timeout=1.0)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(container.minimisation(4005, 505, BULK), 1.0)
+        # the slots were given back
+        return await container.minimisation(4000, 500, BULK, timeout=30)
+
+    rock, element_list = asyncio.run(run())
+    assert rock.temperature == 500
+    time.sleep(0.2)
+    assert running_theriaks(tmp_path / "bin") == []
@@ -0,0 +1,62 @@
+import pytest
+from theriapy.batch_plot import batch_plot_stacked_volumes, iter_bulk_states
+from theriapy.mock import mock_container
+
+BULKS = ["SI(1)AL(1)FE(1)MG(1)O(?)", "SI(2)AL(1)FE(1)MG(1)O(?)", "SI(1)AL(2)FE(1)MG(1)O(?)"]
+P_PATH = [4000, 5000, 6000, 7000]
+T_PATH = [500, 550, 600, 650]
+
+
+def tracked_minimisations(ther, monkeypatch, fail_at=None):
+    closed = []
+    iter_minimisations = ther.iter_minimisations
+
+    def tracked(*args, **kwargs):
+        try:
+            for k, res in enumerate(iter_minimisations(*args, **kwargs)):
+                if k == fail_at:
+                    raise RuntimeError("minimisation failed")
+                yield res
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(ther, "iter_minimisations", tracked)
+    return closed
+
+
+def test_yields_one_states_per_bulk():
+    res = list(iter_bulk_states(mock_container(), BULKS, P_PATH, T_PATH))
+    assert [idx for idx, _ in res] == [0, 1, 2]
+    assert all(len(states) == len(P_PATH) for _, states in res)
+
+
+def test_minimisations_closed_when_stopped_early(monkeypatch):
+    ther = mock_container()
+    closed = tracked_minimisations(ther, monkeypatch)
+    gen = iter_bulk_states(ther, BULKS, P_PATH, T_PATH)
+    next(gen)
+    gen.close()
+    assert closed == [True]
+
+
+def test_minimisations_closed_on_error(monkeypatch):
+    ther = mock_container()
+    closed = tracked_minimisations(ther, monkeypatch, fail_at=6)
+    with pytest.raises(RuntimeError):
+        list(iter_bulk_states(ther, BULKS, P_PATH, T_PATH))
+    assert closed == [True]
+
+
+@pytest.mark.parametrize("verbose", [0, 1])
+def test_stacked_volumes_passes_verbose(monkeypatch, verbose):
+    ther = mock_container()
+    seen = []
+    compute_pt_path = ther.compute_pt_path
+
+    def tracked(*args, **kwargs):
+        seen.append(kwargs.get("verbose"))
+        return compute_pt_path(*args, **kwargs)
+
+    monkeypatch.setattr(ther, "compute_pt_path", tracked)
+    batch_plot_stacked_volumes(ther, BULKS[:2], P_PATH, T_PATH, verbose=verbose)
+    assert seen == [verbose, verbose]
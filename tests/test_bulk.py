@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from theriapy.bulk import BulkMatrix
+from theriapy.cache import canonical_bulk
+
+SAME_LAYOUT = ["SI(65.44)AL(15.99)FE(3.2)O(?)", "SI(60)AL(17.5)FE(4.25)O(?)", "SI(70.1)AL(12)FE(1)O(?)"]
+
+
+def test_round_trip_same_layout():
+    batch = BulkMatrix.from_strings(SAME_LAYOUT)
+    assert batch.elements == ["SI", "AL", "FE", "O"]
+    assert batch.free.tolist() == [False, False, False, True]
+    assert batch.to_strings() == SAME_LAYOUT
+    assert BulkMatrix.from_strings(batch.to_strings()).values.tolist() == batch.values.tolist()
+
+
+def test_canonical_matches_canonical_bulk():
+    batch = BulkMatrix.from_strings(SAME_LAYOUT).canonical()
+    assert batch.to_strings() == [canonical_bulk(bulk) for bulk in SAME_LAYOUT]
+
+
+def test_union_vocabulary():
+    bulks = ["SI(1)AL(2)O(?)", "MG(3)SI(4)O(?)", "SI(1)SI(0.5)O(?)"]
+    batch = BulkMatrix.from_strings(bulks)
+    assert batch.elements == ["SI", "AL", "O", "MG"]
+    np.testing.assert_array_equal(batch.values[[0, 1, 3]], [[1, 4, 1.5], [2, 0, 0], [0, 3, 0]])
+    assert batch.free.tolist() == [False, False, True, False]
+    canonical = batch.canonical()
+    assert canonical.to_strings() == ["AL(2)MG(0)O(?)SI(1)", "AL(0)MG(3)O(?)SI(4)", "AL(0)MG(0)O(?)SI(1.5)"]
+    assert canonical.to_strings(skip_zeros=True) == [canonical_bulk(bulk) for bulk in bulks]
+
+
+def test_given_vocabulary():
+    batch = BulkMatrix.from_strings(["SI(1)O(?)"], elements=["AL", "O", "SI"])
+    assert batch.to_strings() == ["AL(0)O(?)SI(1)"]
+    with pytest.raises(ValueError, match="not in the vocabulary"):
+        BulkMatrix.from_strings(["SI(1)K(1)"], elements=["SI"])
+
+
+@pytest.mark.parametrize("bulks", [
+    ["O(?)SI(1)", "SI(2)O(3)"],
+    ["O(?)SI(1)", "O(3)SI(2)"],
+    ["SI(2)O(3)", "SI(1)O(?)"],
+    ["SI(1)O(?)O(2)"],
+])
+def test_free_and_fixed_element_rejected(bulks):
+    with pytest.raises(ValueError, match="both as '\\?' and with an amount"):
+        BulkMatrix.from_strings(bulks)
+
+
+def test_empty_batch_rejected():
+    with pytest.raises(ValueError, match="No bulk"):
+        BulkMatrix.from_strings([])
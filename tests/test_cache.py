@@ -0,0 +1,66 @@
+import pytest
+from theriapy.cache import canonical_bulk, minimisation_key, MinimisationCache
+
+
+def test_canonical_bulk_sorts_and_sums():
+    assert canonical_bulk("SI(65.44)AL(15.99)O(?)") == "AL(15.99)O(?)SI(65.44)"
+    assert canonical_bulk("SI(1)AL(2)SI(0.5)") == "AL(2)SI(1.5)"
+
+
+def test_canonical_bulk_rejects_free_and_fixed_element():
+    with pytest.raises(ValueError):
+        canonical_bulk("SI(1)O(?)O(2)")
+    with pytest.raises(ValueError):
+        canonical_bulk("O(2)SI(1)O(?)")
+
+
+def test_minimisation_key_ignores_bulk_layout():
+    key = minimisation_key(4000, 500, "SI(1)AL(2)O(?)", "db", "v1")
+    assert key == minimisation_key(4000.0, 500.0, "AL(2.000)SI(1)O(?)", "db", "v1")
+    assert key != minimisation_key(4000, 501, "SI(1)AL(2)O(?)", "db", "v1")
+    assert key != minimisation_key(4000, 500, "SI(1)AL(2)O(?)", "other", "v1")
+    assert key != minimisation_key(4000, 500, "SI(1)AL(2)O(?)", "db", "v1", return_failed_minimisation=False)
+
+
+def test_memory_lru_eviction():
+    cache = MinimisationCache(max_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_store_survives_new_instance(tmp_path):
+    cache = MinimisationCache(cache_dir=str(tmp_path))
+    key = minimisation_key(4000, 500, "SI(1)O(?)", "db", "v1")
+    cache.put(key, ("rock", ["SI", "O"]))
+    other = MinimisationCache(cache_dir=str(tmp_path))
+    assert other.get(key) == ("rock", ["SI", "O"])
+    other.clear()
+    assert MinimisationCache(cache_dir=str(tmp_path)).get(key) is None
+
+
+def test_container_cache_hits(tmp_path):
+    from theriapy.mock import mock_container
+    ther = mock_container(cache=MinimisationCache())
+    first = ther.minimisation(4000, 500, "SI(1)AL(1)FE(1)MG(1)O(?)")
+    again = ther.minimisation(4000, 500, "AL(1)SI(1)FE(1)MG(1)O(?)")
+    assert again[0] is first[0]
+    assert ther.theriak.n_calls == 1
+
+
+@pytest.mark.parametrize("with_instrument", [False, True])
+def test_container_does_not_cache_failed_minimisations(with_instrument):
+    from theriapy.instrument import Instrumentation
+    from theriapy.mock import mock_container
+    ther = mock_container(cache=MinimisationCache(), failed=[(4000, 500)])
+    if with_instrument:
+        ther.instrument = Instrumentation()
+    for _ in range(2):
+        output, element_list = ther.minimisation(4000, 500, "SI(1)AL(1)FE(1)MG(1)O(?)",
+                                                 return_failed_minimisation=False)
+        assert isinstance(output, str)
+    assert ther.theriak.n_calls == 2
+    assert len(ther.cache.memory) == 0
@@ -0,0 +1,76 @@
+import io
+import os
+import pytest
+from theriapy.comp_mixer import (Composition, PhaseCompositions, add_solution, phase_threshold_vol, remove_composition,
+                                 remove_phase)
+from theriapy.legacy import Theriapy
+
+A = {"SI": 2.0, "AL": 1.0, "FE": 0.5}
+
+
+@pytest.mark.parametrize("b", [
+    {"SI": 0.5, "AL": 1.5, "FE": 0.1},
+    {"SI": 0.5, "MG": 3.0},
+    {"NA": 1.0},
+])
+def test_remove_matches_remove_composition(b):
+    res = Composition.from_dict(A).remove(Composition.from_dict(b))
+    assert res.elements == tuple(A)
+    assert res.to_dict() == remove_composition(A, b)
+
+
+# tables of the synthetic solutions fixture, as Theriapy.parse_file returns them
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "fixtures",
+                       "synthetic_solutions.OUT")
+
+
+@pytest.fixture(scope="module")
+def tables():
+    with open(FIXTURE) as file:
+        data_vol_d, _, data_comp = Theriapy.__new__(Theriapy).parse_file(io.StringIO(file.read()))[0]
+    return data_vol_d, data_comp
+
+
+@pytest.fixture(scope="module")
+def bulk(tables):
+    header, total = tables[1][0], tables[1][-1]
+    return {elt: float(total[k]) for k, elt in enumerate(header) if k > 0 and elt != 'E'}
+
+
+def assert_same(compo, expected):
+    assert set(compo.to_dict()) == set(expected)
+    for elt, value in expected.items():
+        assert compo.to_dict()[elt] == pytest.approx(value)
+
+
+@pytest.mark.parametrize("phase, prop", [("GARNET_alm", 0.5), ("rutile", 2.0), ("sillimanite", 0.5)])
+def test_phase_compositions_remove_phase(tables, bulk, phase, prop):
+    data_vol_d, data_comp = tables
+    new_comp, extracted = PhaseCompositions.from_data_comp(data_comp, data_vol_d).remove_phase(phase, bulk, prop)
+    expected_comp, expected_extracted = remove_phase(phase, bulk, prop, data_comp)
+    assert_same(new_comp, expected_comp)
+    assert_same(extracted, expected_extracted)
+
+
+def test_phase_compositions_add_solution(tables, bulk):
+    # a single GARNET phase is stable: comp_mixer.remove_solution keeps the last matching phase only
+    data_vol_d, data_comp = tables
+    new_comp, extracted = PhaseCompositions.from_data_comp(data_comp, data_vol_d).add_solution("GARNET", bulk, 0.3)
+    expected_comp, expected_extracted = add_solution("GARNET", bulk, 0.3, data_comp)
+    assert_same(new_comp, expected_comp)
+    assert_same(extracted, expected_extracted)
+
+
+def test_phase_compositions_remove_solution_sums_the_phases(tables, bulk):
+    data_vol_d, data_comp = tables
+    compositions = PhaseCompositions.from_data_comp(data_comp, data_vol_d)
+    _, extracted = compositions.remove_solution("_", bulk, 1.0)
+    expected = Composition.sum(*(compositions.get(name) for name in compositions.phases if "_" in name))
+    assert_same(extracted, expected.to_dict())
+
+
+@pytest.mark.parametrize("phase, limit", [("rutile", 0.1), ("rutile", 0.5), ("CHLR_daph", 0.01), ("kyanite", 0.1)])
+def test_phase_compositions_phase_threshold_vol(tables, bulk, phase, limit):
+    data_vol_d, data_comp = tables
+    new_comp = PhaseCompositions.from_data_comp(data_comp, data_vol_d).phase_threshold_vol(phase, bulk, limit)
+    assert_same(new_comp, phase_threshold_vol(phase, bulk, limit, data_vol_d, data_comp))
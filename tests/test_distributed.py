@@ -0,0 +1,79 @@
+import time
+from multiprocessing.connection import Client
+import pytest
+from theriapy import distributed
+from theriapy.distributed import DistributedPool, _kill_worker
+from theriapy.mock import MockTherCaller, install_fake_theriak
+
+BULK = "SI(1)AL(1)FE(1)MG(1)O(?)"
+PRESSURES = list(range(4000, 4400, 20))
+TEMPS = list(range(500, 600, 5))
+
+
+def summary(results):
+    return [([m.name for m in rock.mineral_assemblage], [f.name for f in rock.fluid_assemblage], el_lis)
+            for rock, el_lis in results]
+
+
+def serial():
+    caller = MockTherCaller()
+    return [caller.minimisation(p, t, BULK, return_failed_minimisation=True) for p, t in zip(PRESSURES, TEMPS)]
+
+
+@pytest.fixture
+def programs_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    install_fake_theriak(str(tmp_path / "bin"))
+    return str(tmp_path / "bin")
+
+
+def test_map_matches_serial(programs_dir):
+    with DistributedPool(shard_size=3) as pool:
+        pool.start_local_workers(2, programs_dir, "mockdb", "mock")
+        results = pool.map(PRESSURES, TEMPS, [BULK] * len(PRESSURES))
+    assert summary(results) == summary(serial())
+
+
+def test_lost_worker_is_replaced(programs_dir, monkeypatch):
+    monkeypatch.setenv("THERIAPY_MOCK_LATENCY", "0.05")
+    with DistributedPool(shard_size=2) as pool:
+        pool.start_local_workers(2, programs_dir, "mockdb", "mock")
+        results = pool.imap(PRESSURES, TEMPS, [BULK] * len(PRESSURES))
+        first = [next(results)]
+        _kill_worker(pool._local[0])
+        rest = list(results)
+        assert pool.n_workers == 2
+    assert summary(first + rest) == summary(serial())
+
+
+def test_call_fails_without_workers():
+    with DistributedPool(worker_wait=1.0) as pool:
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="No worker connected"):
+            pool.map(PRESSURES, TEMPS, [BULK] * len(PRESSURES))
+        assert time.monotonic() - start < 10
+
+
+def test_call_deadline_with_wedged_worker(programs_dir, monkeypatch):
+    monkeypatch.setenv("THERIAPY_MOCK_HANG", f"{PRESSURES[1]}:{TEMPS[1]}")
+    start = time.monotonic()
+    with DistributedPool(timeout=2.0) as pool:
+        pool.start_local_workers(1, programs_dir, "mockdb", "mock")
+        with pytest.raises(TimeoutError):
+            pool.map(PRESSURES, TEMPS, [BULK] * len(PRESSURES))
+        worker = pool._local[0]
+    # closing kills the wedged worker instead of waiting for it
+    assert worker.poll() is not None
+    assert time.monotonic() - start < 30
+
+
+def test_silent_client_does_not_block_workers(programs_dir, monkeypatch):
+    monkeypatch.setattr(distributed, "_HELLO_TIMEOUT", 1.0)
+    with DistributedPool() as pool:
+        silent = Client(pool.address, authkey=pool.authkey)  # authenticated, but never says hello
+        pool.start_local_workers(1, programs_dir, "mockdb", "mock")
+        pool.wait_for_workers(1, timeout=20)
+        with pytest.raises(EOFError):
+            silent.recv()  # dropped by the coordinator
+        silent.close()
+        assert summary(pool.map(PRESSURES, TEMPS, [BULK] * len(PRESSURES))) == summary(serial())
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from theriapy.mock import mock_container
+from theriapy.ensemble import perturb_bulk
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+PRESSURES = np.linspace(4000, 10000, 12)
+TEMPS = np.linspace(450, 800, 12)
+
+
+def test_perturb_bulk():
+    elements, members = perturb_bulk(BULK, 50, 0.1, seed=1)
+    assert members.shape == (50, len(elements))
+    assert np.isnan(members[:, elements.index("O")]).all()
+    assert (members[:, elements.index("SI")] >= 0).all()
+    np.testing.assert_array_equal(members, perturb_bulk(BULK, 50, 0.1, seed=1)[1])
+    _, fixed = perturb_bulk(BULK, 3, {"SI": 0.1}, seed=1)
+    assert (fixed[:, elements.index("AL")] == 1).all()
+    with pytest.raises(ValueError, match="Unknown distribution"):
+        perturb_bulk(BULK, 3, 0.1, distribution="cauchy")
+
+
+def test_ensemble_matches_member_paths():
+    ther = mock_container()
+    ensemble = ther.compute_bulk_ensemble(BULK, PRESSURES, TEMPS, 20, 0.05, decimals=1, seed=3)
+    assert ensemble.n_members == 20
+    assert len(ensemble.bulks) < 20  # rounded members share a computation
+    assert ther.theriak.n_calls == len(ensemble.bulks) * len(PRESSURES)
+
+    member_vols = ensemble.member_volumes()
+    for m in range(ensemble.n_members):
+        states = mock_container().compute_pt_path(PRESSURES, TEMPS, [ensemble.bulks[ensemble.member_bulk[m]]] * 12,
+                                                  verbose=0)
+        for phase in states.phase_names:
+            np.testing.assert_allclose(member_vols[m, :, ensemble.phases.index(phase)],
+                                       states.volumes[:, states.phase_index[phase]])
+
+    np.testing.assert_allclose(ensemble.mean_volumes(), member_vols.mean(axis=0))
+    np.testing.assert_allclose(ensemble.presence_probability(), (member_vols > 0).mean(axis=0))
+    df = ensemble.phase_summary(ensemble.phases[0])
+    assert list(df.columns) == ["pressure", "temperature", "mean", "p5", "p50", "p95", "presence"]
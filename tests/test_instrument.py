@@ -0,0 +1,79 @@
+import json
+import time
+import numpy as np
+import pytest
+from theriapy.cache import MinimisationCache
+from theriapy.instrument import EventListSink, Instrumentation, JsonLinesSink
+from theriapy.mock import mock_container
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+N = 20
+
+
+def stage_events(events):
+    return [event for event in events if event[0] == "stage"]
+
+
+def test_stage_timings():
+    ins = Instrumentation()
+    for _ in range(3):
+        with ins.stage("sleep"):
+            time.sleep(0.02)
+    ins.count("points", 2)
+    ins.count("points")
+    summary = ins.summary()
+    st = summary["stages"]["sleep"]
+    assert st["count"] == 3
+    assert 0.06 <= st["total"] < 1
+    assert st["min"] <= st["mean"] <= st["max"]
+    assert st["mean"] == pytest.approx(st["total"] / 3)
+    assert summary["counters"] == {"points": 3}
+    assert "sleep" in ins.report()
+    ins.reset()
+    assert ins.summary() == {"stages": {}, "counters": {}}
+
+
+def test_stage_recorded_on_exception():
+    ins = Instrumentation()
+    with pytest.raises(ZeroDivisionError):
+        with ins.stage("failing"):
+            1 / 0
+    assert ins.summary()["stages"]["failing"]["count"] == 1
+
+
+def test_sinks_receive_every_event(tmp_path):
+    events = EventListSink()
+    filepath = tmp_path / "events.jsonl"
+    ins = Instrumentation([events, JsonLinesSink(filepath)])
+    ther = mock_container(cache=MinimisationCache())
+    ther.instrument = ins
+    temps = np.linspace(450, 800, N).astype(int)
+    pressures = np.full(N, 5000)
+    ther.compute_pt_path(pressures, temps, [BULK] * N, verbose=0)
+    ther.compute_pt_path(pressures, temps, [BULK] * N, verbose=0)  # all cache hits
+    ins.close()
+
+    summary = ins.summary()
+    assert summary["counters"]["minimisations"] == N
+    assert summary["counters"]["cache_hits"] == N
+    assert summary["counters"]["cache_misses"] == N
+    for name, st in summary["stages"].items():
+        durations = [event[3] for event in stage_events(events.events) if event[1] == name]
+        assert len(durations) == st["count"]
+        assert sum(durations) / 1e9 == pytest.approx(st["total"])
+    assert {"theriak", "parse", "cache"} <= set(summary["stages"])
+
+    with open(filepath) as file:
+        records = [json.loads(line) for line in file]
+    assert len(records) == len(events.events)
+    for rec, event in zip(records, events.events):
+        if event[0] == "stage":
+            assert rec["stage"] == event[1]
+            assert rec["start"] == pytest.approx(event[2] / 1e9)
+            assert rec["duration"] == pytest.approx(event[3] / 1e9)
+        else:
+            assert (rec["counter"], rec["value"]) == (event[1], event[3])
+    last = {rec["counter"]: rec["value"] for rec in records if "counter" in rec}
+    assert last == summary["counters"]
+    starts = [rec["start"] for rec in records if "stage" in rec]
+    assert all(start >= 0 for start in starts)
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from theriapy.mock import mock_container
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+PRESSURES = [3000, 6000, 9000, 12000]
+PHASES = ["FSP_abh", "GARNET_alm", "rutile", "OPX_fs"]
+
+
+@pytest.mark.parametrize("k", [1, 3])
+def test_k_section_matches_bisection(k):
+    ther = mock_container()
+    isograds = ther.find_isograds(BULK, PRESSURES, PHASES, tmin=0, tmax=1200, tol=1, k=k)
+    assert isograds.n_minimisations == ther.theriak.n_calls
+
+    reference = mock_container()
+    expected = np.array([[reference.find_phase_apparition_temp(BULK, p, phase, tmin=0, tmax=1200, tol=1)
+                          for p in PRESSURES] for phase in PHASES])
+    np.testing.assert_allclose(isograds.as_array(), expected, atol=1)
+    # the probes are shared by the phases: fewer minimisations than one bisection per phase and pressure
+    assert isograds.n_minimisations < reference.theriak.n_calls
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from theriapy.journal import PathJournal
+from theriapy.mock import mock_container
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+N = 30
+PRESSURES = np.linspace(4000, 12000, N)
+TEMPS = np.linspace(450, 850, N)
+COMMAND = "remove_sol LIQtc_ 1"
+
+
+def interrupt_after(ther, monkeypatch, n_calls):
+    """Makes the minimisations of ther fail from the (n_calls + 1)-th one"""
+    minimisation = ther.theriak.minimisation
+    calls = []
+
+    def failing(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > n_calls:
+            raise KeyboardInterrupt
+        return minimisation(*args, **kwargs)
+
+    monkeypatch.setattr(ther.theriak, "minimisation", failing)
+
+
+def same_states(a, b):
+    assert len(a) == len(b)
+    np.testing.assert_array_equal(a.pressures, b.pressures)
+    np.testing.assert_array_equal(a.temperatures, b.temperatures)
+    np.testing.assert_array_equal(a.stable, b.stable)
+    assert a.get_merged_vols_df().equals(b.get_merged_vols_df())
+
+
+def test_resume_equals_full_run(tmp_path, monkeypatch):
+    path = str(tmp_path / "path.journal")
+    full = mock_container().compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0)
+
+    ther = mock_container()
+    interrupt_after(ther, monkeypatch, 12)
+    with pytest.raises(KeyboardInterrupt):
+        ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, resume=path)
+    assert len(PathJournal(path)) == 12
+
+    ther = mock_container()
+    resumed = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, resume=path)
+    assert ther.theriak.n_calls == N - 12
+    same_states(resumed, full)
+
+
+def test_ruled_resume_equals_full_run(tmp_path, monkeypatch):
+    path = str(tmp_path / "ruled.journal")
+    full = mock_container().compute_ruled_pt_path(PRESSURES, TEMPS, BULK, COMMAND, is_fluid=True, verbose=0)
+
+    ther = mock_container()
+    interrupt_after(ther, monkeypatch, 20)
+    with pytest.raises(KeyboardInterrupt):
+        ther.compute_ruled_pt_path(PRESSURES, TEMPS, BULK, COMMAND, is_fluid=True, verbose=0, resume=path)
+
+    resumed = mock_container().compute_ruled_pt_path(PRESSURES, TEMPS, BULK, COMMAND, is_fluid=True, verbose=0,
+                                                     resume=path)
+    same_states(resumed, full)
+
+
+def test_truncated_record_is_dropped(tmp_path):
+    path = str(tmp_path / "path.journal")
+    mock_container().compute_pt_path(PRESSURES[:5], TEMPS[:5], [BULK] * 5, verbose=0, resume=path)
+    with open(path, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 10)
+
+    journal = PathJournal(path)
+    assert len(journal) == 4
+    journal.close()
+
+    ther = mock_container()
+    resumed = ther.compute_pt_path(PRESSURES[:5], TEMPS[:5], [BULK] * 5, verbose=0, resume=path)
+    assert ther.theriak.n_calls == 1
+    same_states(resumed, mock_container().compute_pt_path(PRESSURES[:5], TEMPS[:5], [BULK] * 5, verbose=0))
+
+
+def test_journal_of_another_path_is_rejected(tmp_path):
+    path = str(tmp_path / "path.journal")
+    mock_container().compute_pt_path(PRESSURES[:5], TEMPS[:5], [BULK] * 5, verbose=0, resume=path)
+
+    with pytest.raises(ValueError, match="was written for"):
+        mock_container().compute_ruled_pt_path(PRESSURES[:5], TEMPS[:5], BULK, COMMAND, verbose=0, resume=path)
+    with pytest.raises(ValueError, match="does not match the path"):
+        mock_container().compute_pt_path(PRESSURES[:5] + 100, TEMPS[:5], [BULK] * 5, verbose=0, resume=path)
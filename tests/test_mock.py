@@ -0,0 +1,20 @@
+from theriapy.mock import MockTherCaller, render_out
+
+BULK = "SI(1)AL(1)FE(1)MG(1)H(2)O(?)"
+
+
+def test_failed_minimisation_follows_flag():
+    caller = MockTherCaller(failed=[(5000, 600)])
+    output, element_list = caller.minimisation(5000, 600, BULK, return_failed_minimisation=False)
+    assert isinstance(output, str) and element_list == []
+    assert not caller.check_minimisation(output)
+
+    rock, element_list = caller.minimisation(5000, 600, BULK, return_failed_minimisation=True)
+    assert element_list and rock.mineral_assemblage
+
+
+def test_successful_minimisation_ignores_flag():
+    caller = MockTherCaller(failed=[(5000, 600)])
+    rock, element_list = caller.minimisation(5000, 610, BULK, return_failed_minimisation=False)
+    assert element_list and rock.mineral_assemblage
+    assert caller.check_minimisation(render_out(5000, 610, BULK))
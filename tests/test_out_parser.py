@@ -0,0 +1,42 @@
+import io
+import os
+import pandas as pd
+import pytest
+from theriapy.comp_mixer import prepare_df
+from theriapy.legacy import Theriapy
+from theriapy.out_parser import parse_out_file
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks", "fixtures")
+# synthetic OUTs written by mock.render_out (see benchmarks/bench_out_parser.py), not recorded Theriak outputs:
+# they check that both parsers agree on the layout of the mock
+FIXTURES = ["synthetic_pure_solids.OUT", "synthetic_fluid.OUT", "synthetic_solutions.OUT"]
+
+
+def legacy_tables(path):
+    with open(path) as file:
+        return Theriapy.__new__(Theriapy).parse_file(io.StringIO(file.read()))[0]
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_fast_parser_matches_parse_file(name):
+    path = os.path.join(FIXTURES_DIR, name)
+    tables = parse_out_file(path)
+    assert tables.complete
+    assert list(tables.to_legacy()) == list(legacy_tables(path))
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+def test_fast_parser_matches_prepare_df(name):
+    path = os.path.join(FIXTURES_DIR, name)
+    for fast, legacy in zip(parse_out_file(path).to_legacy(), legacy_tables(path)):
+        if legacy:
+            pd.testing.assert_frame_equal(prepare_df(fast), prepare_df(legacy))
+
+
+def test_fixtures_cover_fluid_and_solutions():
+    fluids = parse_out_file(os.path.join(FIXTURES_DIR, "synthetic_fluid.OUT")).volumes['is_fluid']
+    assert fluids.any()
+    stable = parse_out_file(os.path.join(FIXTURES_DIR, "synthetic_pure_solids.OUT"))
+    assert not stable.volumes['is_fluid'].any()
+    solutions = parse_out_file(os.path.join(FIXTURES_DIR, "synthetic_solutions.OUT"))
+    assert sum('_' in name for name in solutions.volumes['phase']) >= 2
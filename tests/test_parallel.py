@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pytest
+from theriapy.mock import mock_container
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+N = 12
+PRESSURES = np.linspace(4000, 12000, N)
+TEMPS = np.linspace(450, 850, N)
+
+
+@pytest.fixture
+def ther(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return mock_container(programs_dir=str(tmp_path / "bin"))
+
+
+def same_states(a, b):
+    assert a.phase_names == b.phase_names
+    np.testing.assert_array_equal(a.pressures, b.pressures)
+    np.testing.assert_array_equal(a.temperatures, b.temperatures)
+    np.testing.assert_array_equal(a.stable, b.stable)
+    np.testing.assert_allclose(a.volumes, b.volumes)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_pool_matches_serial(ther, executor):
+    serial = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0)
+    pooled = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, n_workers=3, executor=executor)
+    same_states(pooled, serial)
+
+
+def test_pool_reuse_and_close(ther):
+    serial = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0)
+    pool = ther.get_pool(n_workers=2)
+    scratch_root = pool.scratch_root
+    with pool:
+        first = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, pool=pool)
+        second = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * N, verbose=0, pool=pool)
+        imap = list(pool.imap(PRESSURES[:5], TEMPS[:5], [BULK] * 5, window=2))
+        assert len(os.listdir(scratch_root)) == 2  # one scratch directory per worker thread, reused
+    same_states(first, serial)
+    same_states(second, serial)
+    assert [rock.temperature for rock, _ in imap] == [int(t) for t in TEMPS[:5]]
+    assert not os.path.exists(scratch_root)
+    with pytest.raises(RuntimeError):
+        pool.map(PRESSURES[:2], TEMPS[:2], [BULK] * 2)
+
+
+def test_unknown_executor(ther):
+    with pytest.raises(ValueError, match="Unknown executor"):
+        ther.get_pool(n_workers=2, executor="fiber")
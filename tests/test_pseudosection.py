@@ -0,0 +1,30 @@
+import numpy as np
+from theriapy.mock import mock_container
+from theriapy.pseudosection import assemblage_of
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+
+
+def test_quadtree_matches_dense_grid():
+    ther = mock_container()
+    grid = ther.compute_pt_grid(BULK, (2000, 14000), (400, 900), n_coarse=(4, 4), max_level=3)
+    assert grid.labels.shape == (33, 33)
+    assert grid.n_minimisations == ther.theriak.n_calls < 33 * 33
+
+    dense = mock_container()
+    mismatches = 0
+    for i, t in enumerate(grid.temperatures):
+        for j, p in enumerate(grid.pressures):
+            rock, _ = dense.minimisation(int(p), int(t), BULK)
+            mismatches += grid.assemblages[grid.labels[i, j]] != assemblage_of(rock)
+    assert mismatches == 0
+
+
+def test_computed_nodes_hold_minimised_volumes():
+    ther = mock_container()
+    grid = ther.compute_pt_grid(BULK, (4000, 8000), (500, 700), n_coarse=(2, 2), max_level=2)
+    i, j = np.argwhere(grid.computed)[len(np.argwhere(grid.computed)) // 2]
+    rock, _ = mock_container().minimisation(int(grid.pressures[j]), int(grid.temperatures[i]), BULK)
+    for phase in [*rock.mineral_assemblage, *rock.fluid_assemblage]:
+        assert grid.get_phase_vol(phase.name)[i, j] == phase.vol
+    assert (grid.cell_labels() == -1).any()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from theriapy.archive import load_states, save_states
+from theriapy.cache import MinimisationCache
+from theriapy.instrument import Instrumentation
+from theriapy.mock import MockTherCaller, mock_container
+from theriapy.retry import MinimisationError, RetryPolicy, minimise_with_retry
+
+BULK = "SI(1)AL(1)FE(1)MG(1)H(2)O(?)"
+PRESSURES = [4000, 4100, 4200, 4300]
+TEMPS = [500, 510, 520, 530]
+
+
+def test_offsets():
+    assert RetryPolicy(retries=3, perturbation=(10, 2)).offsets() == [(0, 0), (10, 2), (-10, -2), (20, 4)]
+
+
+def test_perturbed_retry_is_flagged_and_not_cached(tmp_path):
+    ther = mock_container(cache=MinimisationCache(),
+                          retry=RetryPolicy(timeout=0.05, retries=1, perturbation=(10, 0)), hang=[(4100, 510)])
+    states = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * 4, verbose=0)
+    assert states.perturbed.tolist() == [False, True, False, False]
+    assert states.perturbations == {1: (10, 0)}
+    assert states.pressures[1] == 4110
+    assert not states.failed.any()
+
+    n_calls = ther.theriak.n_calls
+    rock, _ = ther.minimisation(4100, 510, BULK)
+    assert rock.perturbation == (10, 0)
+    assert ther.theriak.n_calls == n_calls + 2  # computed again: not cached under the (4100, 510) key
+    ther.minimisation(4000, 500, BULK)
+    assert ther.theriak.n_calls == n_calls + 2
+
+    save_states(states, str(tmp_path / "archive"))
+    assert load_states(str(tmp_path / "archive")).perturbations == {1: (10, 0)}
+
+
+def test_recorded_failure():
+    ther = mock_container(retry=RetryPolicy(retries=2, on_failure="record"), crash=[(4200, 520)])
+    states = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * 4, verbose=0)
+    assert states.failed.tolist() == [False, False, True, False]
+    assert "empty Theriak output" in states.failures[2]
+    assert not states.stable[2].any()
+    assert ther.theriak.n_calls == 4 + 2
+
+
+def test_raised_failure():
+    ther = mock_container(retry=RetryPolicy(retries=1), crash=[(4200, 520)])
+    with pytest.raises(MinimisationError) as info:
+        ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * 4, verbose=0)
+    assert info.value.failure.attempts == 2
+    assert (info.value.failure.pressure, info.value.failure.temperature) == (4200, 520)
+
+
+def test_failed_minimisations_counted_with_retry():
+    ins = Instrumentation()
+    ther = mock_container(retry=RetryPolicy(retries=1), failed=[(4100, 510), (4300, 530)])
+    ther.instrument = ins
+    states = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * 4, verbose=0)
+    assert ins.summary()["counters"]["failed_minimisations"] == 2
+    assert ins.summary()["counters"]["minimisations"] == 4
+    assert np.all(states.stable.any(axis=1))
+
+
+def test_caller_timeout_restored():
+    caller = MockTherCaller(hang=[(4100, 510)])
+    caller.timeout = 30
+    minimise_with_retry(caller, 4000, 500, BULK, RetryPolicy(timeout=0.05))
+    assert caller.timeout == 30
+    with pytest.raises(MinimisationError):
+        minimise_with_retry(caller, 4100, 510, BULK, RetryPolicy(timeout=0.05))
+    assert caller.timeout == 30
+
+
+def test_configuration_errors_not_retried(monkeypatch):
+    caller = MockTherCaller()
+    calls = []
+
+    def missing_executable(pressure, temperature, bulk):
+        calls.append((pressure, temperature))
+        raise FileNotFoundError("theriak")
+
+    monkeypatch.setattr(caller, "call_theriak", missing_executable)
+    with pytest.raises(FileNotFoundError):
+        minimise_with_retry(caller, 4000, 500, BULK, RetryPolicy(retries=3, on_failure="record"))
+    assert calls == [(4000, 500)]
+    assert caller.timeout is None
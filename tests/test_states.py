@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+from theriapy.bulk import bulk_to_oxides
+from theriapy.mock import mock_container
+from theriapy.retry import RetryPolicy
+from theriapy.states import Projection
+
+BULK = "SI(1)AL(1)FE(1)MG(1)NA(0.2)CA(0.1)K(0.2)TI(0.05)H(2)O(?)"
+
+
+def baseline_vols_df(states):
+    """get_vols_df of the original, rock-scanning States"""
+    df = pd.DataFrame()
+    for i, st in enumerate(states.states):
+        for phase in [*st.mineral_assemblage, *st.fluid_assemblage]:
+            df.loc[i, phase.name] = phase.vol
+    return df.fillna(0)
+
+
+def baseline_molar_comp(states, phase):
+    """get_phase_molar_comp of the original, rock-scanning States"""
+    df = pd.DataFrame(index=range(len(states.states)))
+    for i, st in enumerate(states.states):
+        df.loc[i, 'index'] = i
+        phase_names = [mineral.name for mineral in st.mineral_assemblage]
+        if phase in phase_names:
+            df.loc[i, states.list_current_elements[i]] = st.mineral_assemblage[phase_names.index(phase)].composition_moles
+        else:
+            df.loc[i] = 0
+    return df.fillna(0)
+
+
+def baseline_comp_oxides(states, members):
+    """Oxide weights of the summed members, converted rock by rock by bulk_to_oxides (None where none is stable)"""
+    rows = []
+    for i, st in enumerate(states.states):
+        moles = {}
+        for mineral in st.mineral_assemblage:
+            if mineral.name in members:
+                for elt, n in zip(states.list_current_elements[i], mineral.composition_moles):
+                    moles[elt] = moles.get(elt, 0) + n
+        bulk = "".join(f"{elt}({n})" for elt, n in moles.items())
+        rows.append((bulk_to_oxides(bulk), bulk_to_oxides(bulk, normalize=False)) if moles else None)
+    return rows
+
+
+def path_states(n=60, projection=None):
+    ther = mock_container()
+    temps = np.linspace(450, 800, n).astype(int)
+    pressures = np.linspace(3000, 9000, n).astype(int)
+    return ther.compute_pt_path(pressures, temps, [BULK] * n, verbose=0, projection=projection)
+
+
+def test_volumes_match_baseline():
+    states = path_states()
+    expected = baseline_vols_df(states)
+    assert_frame_equal(states.get_vols_df(), expected, check_dtype=False)
+    total = expected.sum(axis=1)
+    assert_frame_equal(states.get_vols_df(normalize=True), expected.div(total, axis=0) * 100, check_dtype=False)
+
+
+def test_molar_comp_matches_baseline():
+    states = path_states()
+    for phase in ("GARNET_alm", "BIO_ann2", "quartz"):
+        expected = baseline_molar_comp(states, phase)
+        result = states.get_phase_molar_comp(phase)
+        # the original zeroed the 'index' column where the phase is absent, it is now always the state index
+        assert np.array_equal(result["index"], np.arange(len(states)))
+        assert_frame_equal(result.drop(columns="index"), expected.drop(columns="index"), check_dtype=False,
+                           check_like=True)
+
+
+def test_comp_oxides_match_baseline():
+    states = path_states()
+    groups = {"GARNET": ["GARNET_alm", "GARNET_py", "GARNET_gr"], "BIO_ann2": ["BIO_ann2"], "quartz": ["quartz"]}
+    normalized = states.get_comp_oxides(groups)
+    totals = states.get_comp_oxides(groups, normalize=False)
+    assert_frame_equal(states.get_phase_comp_oxides("BIO_ann2"), normalized["BIO_ann2"])
+    for name, members in groups.items():
+        expected = baseline_comp_oxides(states, members)
+        assert any(expected)
+        for i, row in enumerate(expected):
+            if row is None:
+                continue
+            oxides, total = row
+            result = normalized[name].iloc[i]
+            assert set(result.index) >= set(oxides)
+            assert result[list(oxides)].to_numpy() == pytest.approx(list(oxides.values()))
+            assert totals[name].iloc[i].sum() == pytest.approx(total)
+
+
+def test_pt_and_stable_arrays():
+    states = path_states()
+    assert np.array_equal(states.pressures, [st.pressure for st in states.states])
+    assert np.array_equal(states.temperatures, [st.temperature for st in states.states])
+    for i, st in enumerate(states.states):
+        names = {ph.name for ph in [*st.mineral_assemblage, *st.fluid_assemblage]}
+        assert {states.phase_names[c] for c in np.flatnonzero(states.stable[i])} == names
+
+
+def test_path_starting_with_failed_point():
+    pressures, temps = [4000, 4100, 4200, 4300], [500, 510, 520, 530]
+    ther = mock_container(retry=RetryPolicy(on_failure="record"), crash=[(4000, 500)])
+    states = ther.compute_pt_path(pressures, temps, [BULK] * 4, verbose=0)
+    assert states.failed[0]
+    assert states.assemblage_at(0) == ()
+    assert states.assemblage_at(1) != ()
+    segments = states.assemblage_segments()
+    assert segments[0][:3] == (0, 1, ())
+    assert segments[-1][1] == 4
+
+    states._reindex()
+    assert states.assemblage_segments() == segments
+
+
+def test_lean_projection_keeps_the_columns():
+    full = path_states()
+    lean = path_states(projection=Projection.lean(["GARNET_alm"], bulk=True))
+    assert lean.states == [None] * len(full)
+    assert lean.phase_names == full.phase_names
+    assert np.array_equal(lean.volumes, full.volumes)
+    assert np.array_equal(lean.stable, full.stable)
+    assert np.array_equal(lean.pressures, full.pressures)
+    assert_frame_equal(lean.get_merged_vols_df(normalize=True), full.get_merged_vols_df(normalize=True))
+    assert np.array_equal(lean.get_phase_comp_array("GARNET_alm"), full.get_phase_comp_array("GARNET_alm"))
+    assert np.allclose(lean.bulks[:, :len(full.list_current_elements[0])],
+                       [st.bulk_composition_moles for st in full.states])
+    with pytest.raises(ValueError, match="not kept"):
+        lean.get_phase_comp_array("BIO_ann2")
+    with pytest.raises(ValueError, match="not kept"):
+        full.bulks
+
+
+def test_memoised_views_follow_new_states():
+    states = path_states(n=10)
+    vols = states.get_vols_df()
+    merged = states.get_merged_vols_df(normalize=True)
+    molar = states.get_phase_molar_comp("GARNET_alm")
+    assert states.get_vols_df() is not vols  # callers get copies
+    vols.iloc[0, 0] = -1.0
+    assert states.get_vols_df().iloc[0, 0] != -1.0
+
+    rock, el_lis = mock_container().minimisation(9500, 820, BULK)
+    states.add_state(rock, el_lis)
+    assert len(states.get_vols_df()) == len(states.get_merged_vols_df(normalize=True)) == 11
+    assert len(states.get_phase_molar_comp("GARNET_alm")) == 11
+    assert_frame_equal(states.get_vols_df(), baseline_vols_df(states), check_dtype=False)
+    assert_frame_equal(states.get_phase_molar_comp("GARNET_alm").iloc[:10], molar, check_like=True)
+
+    states.add_failed_state(9600, 830, "timeout")
+    assert len(states.get_vols_df()) == 12
+
+    states.set_members({"SOLIDS": ["quartz", "GARNET_alm"]})
+    regrouped = states.get_merged_vols_df(normalize=True)
+    assert "SOLIDS" in regrouped.columns and "quartz" not in regrouped.columns
+    assert "SOLIDS" not in merged.columns
@@ -0,0 +1,43 @@
+import csv
+import pytest
+from theriapy.mock import mock_container
+from theriapy.sinks import VolumesCsvSink
+
+BULK = "SI(1)AL(1)FE(1)MG(1)O(?)"
+PRESSURES = list(range(4000, 4010))
+TEMPS = list(range(500, 510))
+
+
+def test_iter_pt_path_matches_compute_pt_path():
+    ther = mock_container()
+    steps = list(ther.iter_pt_path(PRESSURES, TEMPS, [BULK] * 10))
+    states = ther.compute_pt_path(PRESSURES, TEMPS, [BULK] * 10, verbose=0)
+    assert [step.index for step in steps] == list(range(10))
+    assert [step.rock.temperature for step in steps] == list(states.temperatures)
+
+
+def test_stop_ends_the_path():
+    ther = mock_container()
+    steps = list(ther.iter_pt_path(PRESSURES, TEMPS, [BULK] * 10, stop=lambda step: step.index == 3))
+    assert len(steps) == 4
+
+
+def test_stream_closes_sink_on_error(tmp_path):
+    ther = mock_container()
+    path = tmp_path / "vols.csv"
+    sink = VolumesCsvSink(str(path))
+    calls = []
+
+    def failing_minimisation(pressure, temperature, bulk, return_failed_minimisation=True):
+        if len(calls) == 3:
+            raise RuntimeError("Theriak crashed")
+        calls.append(pressure)
+        return ther.theriak.minimisation(pressure, temperature, bulk)
+
+    ther.minimisation = failing_minimisation
+    with pytest.raises(RuntimeError):
+        ther.stream_pt_path(PRESSURES, TEMPS, [BULK] * 10, sink)
+    assert sink.file.closed
+    with open(path) as file:
+        steps = {row["step"] for row in csv.DictReader(file)}
+    assert steps == {"0", "1", "2"}
@@ -0,0 +1,96 @@
+import numpy as np
+from theriapy.pseudosection import assemblage_of
+from theriapy.states import States
+
+
+def _phase_data(rock):
+    """(name, is_fluid, vol, composition_moles) of the stable phases of a rock"""
+    return [(phase.name, is_fluid, phase.vol, np.asarray(phase.composition_moles, dtype=float))
+            for phases, is_fluid in ((rock.mineral_assemblage, False), (rock.fluid_assemblage, True))
+            for phase in phases]
+
+
+def _vol_percents(rock):
+    vols = {}
+    for mineral in rock.mineral_assemblage:
+        vols[mineral.name] = mineral.vol
+    for fluid in rock.fluid_assemblage:
+        vols[fluid.name] = fluid.vol
+    total = sum(vols.values())
+    return {name: 100 * vol / total for name, vol in vols.items()} if total > 0 else vols
+
+
+def compute_adaptive_pt_path(ther, pressures, temps, bulks, n_coarse=16, vol_tol=2.0, pool=None, verbose=0,
+                             projection=None):
+    """
+    Computes a P-T path by bisection instead of minimising every point.
+    The path is first minimised at n_coarse + 1 evenly spaced points. A segment between two computed points is
+    bisected while its ends differ by their assemblage, their element list or their bulk, or while a phase
+    volume differs by more than vol_tol (in % of the rock volume). Reactions are therefore located to the
+    resolution of the path. The points inside the remaining segments are linearly interpolated (volumes and
+    compositions) and flagged in States.interpolated; their rocks are None.
+    """
+    if len(temps) != len(pressures):
+        raise Exception("Temperature list and pressure list have different sizes")
+    n = len(pressures)
+    results = {}  # index -> (rock, element_list, assemblage, vol percents)
+
+    def evaluate(indices):
+        indices = [i for i in dict.fromkeys(indices) if i not in results]
+        if not indices:
+            return
+        ps = [int(pressures[i]) for i in indices]
+        ts = [int(temps[i]) for i in indices]
+        bs = [bulks[i] for i in indices]
+        if pool is not None:
+            computed = ther.pool_minimisation(pool, ps, ts, bs)
+        else:
+            computed = [ther.minimisation(p, t, b) for p, t, b in zip(ps, ts, bs)]
+        for i, (rock, el_lis) in zip(indices, computed):
+            results[i] = (rock, el_lis, assemblage_of(rock), _vol_percents(rock))
+            if verbose:
+                print(int(temps[i]), int(pressures[i]), ":", results[i][2])
+
+    def needs_split(i, j):
+        if j - i < 2:
+            return False
+        rock_i, els_i, asm_i, vols_i = results[i]
+        rock_j, els_j, asm_j, vols_j = results[j]
+        if asm_i != asm_j or list(els_i) != list(els_j) or bulks[i] != bulks[j]:
+            return True
+        return any(abs(vols_i[name] - vols_j[name]) > vol_tol for name in vols_i)
+
+    nodes = sorted(set(np.linspace(0, n - 1, min(n_coarse, n - 1) + 1).round().astype(int).tolist())) if n else []
+    evaluate(nodes)
+    segments = list(zip(nodes[:-1], nodes[1:]))
+    while True:
+        split = [(i, j) for i, j in segments if needs_split(i, j)]
+        if not split:
+            break
+        evaluate([(i + j) // 2 for i, j in split])
+        nodes = sorted(set(nodes) | {(i + j) // 2 for i, j in split})
+        segments = list(zip(nodes[:-1], nodes[1:]))
+
+    states = States(projection=projection)
+    states.instrument = ther.instrument
+    for i, j in segments + ([(nodes[-1], None)] if nodes else []):
+        rock_i, els_i = results[i][:2]
+        states.add_state(rock_i, els_i)
+        if j is None:
+            break
+        phases_i = _phase_data(rock_i)
+        phases_j = {name: (vol, comp) for name, is_fluid, vol, comp in _phase_data(results[j][0])}
+        for k in range(i + 1, j):
+            w = (k - i) / (j - i)
+            phases = []
+            for name, is_fluid, vol, comp in phases_i:
+                vol_j, comp_j = phases_j[name]
+                size = min(len(comp), len(comp_j))
+                phases.append((name, is_fluid, (1 - w) * vol + w * vol_j,
+                               (1 - w) * comp[:size] + w * comp_j[:size]))
+            bulk = (1 - w) * np.asarray(rock_i.bulk_composition_moles, dtype=float) + \
+                w * np.asarray(results[j][0].bulk_composition_moles, dtype=float)
+            states.add_interpolated_state(int(pressures[k]), int(temps[k]), els_i, phases, bulk)
+    if verbose:
+        print(len(results), "minimisations for", n, "points")
+    return states
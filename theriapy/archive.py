@@ -0,0 +1,184 @@
+import json
+import os
+from dataclasses import asdict
+import numpy as np
+from theriapy.arrays import GrowableArray
+
+FORMAT_VERSION = 1
+
+
+def _from_array(arr, fill_value=0):
+    """GrowableArray wrapping an existing (possibly memory-mapped) array, copied only when it grows"""
+    grow = GrowableArray(dtype=arr.dtype, fill_value=fill_value, capacity=0)
+    grow.data = arr
+    grow.n_rows, grow.n_cols = arr.shape
+    return grow
+
+
+def save_states(states, dirpath):
+    """
+    Writes the columnar data of a States to a directory of .npy files plus a meta.json:
+    volumes.npy and stable.npy (n_states x n_phases), pt.npy (n_states x 2: P, T), element_lists.npy
+    (index of each state's element list in meta.json), interpolated.npy (indices of the interpolated
+    states), bulks.npy if the projection keeps the bulks and, for the k-th phase of meta["phase_names"],
+    comp_<k>_rows.npy (state indices where the phase is stable) and comp_<k>_vals.npy (molar compositions
+    over meta["elements"]). The failed states and their reasons are listed in meta["failures"]. Each column
+    block lives in its own file, so a phase's history can be read (or memory-mapped) without touching the
+    rest. The rocks themselves are not saved.
+    """
+    os.makedirs(dirpath, exist_ok=True)
+    element_lists = []
+    list_ids = {}
+    ids = np.empty(len(states), dtype=np.int32)
+    for i, el_lis in enumerate(states.list_current_elements):
+        key = tuple(el_lis)
+        if key not in list_ids:
+            list_ids[key] = len(element_lists)
+            element_lists.append(list(el_lis))
+        ids[i] = list_ids[key]
+
+    n_elements = len(states.list_all_elements)
+    np.save(os.path.join(dirpath, "volumes.npy"), np.ascontiguousarray(states.volumes))
+    np.save(os.path.join(dirpath, "stable.npy"), np.ascontiguousarray(states.stable))
+    np.save(os.path.join(dirpath, "pt.npy"), np.ascontiguousarray(states._pt.values))
+    np.save(os.path.join(dirpath, "element_lists.npy"), ids)
+    np.save(os.path.join(dirpath, "interpolated.npy"), np.asarray(states._interpolated, dtype=np.int64))
+    if states.projection.bulk:
+        np.save(os.path.join(dirpath, "bulks.npy"), states.bulks)
+    for k, phase in enumerate(states.phase_names):
+        vals = states._comp_vals[phase].values
+        padded = np.zeros((vals.shape[0], n_elements))
+        padded[:, :vals.shape[1]] = vals
+        np.save(os.path.join(dirpath, f"comp_{k}_rows.npy"), states._comp_rows[phase].values[:, 0])
+        np.save(os.path.join(dirpath, f"comp_{k}_vals.npy"), padded)
+
+    meta = {"format": "theriapy-states",
+            "version": FORMAT_VERSION,
+            "n_states": len(states),
+            "phase_names": list(states.phase_names),
+            "fluid_phases": sorted(states.fluid_phases),
+            "elements": list(states.list_all_elements),
+            "element_lists": element_lists,
+            "phase_elements": {phase: sorted(int(e) for e in states._comp_elements[phase])
+                               for phase in states.phase_names},
+            "members": states.members,
+            "failures": [[i, reason] for i, reason in sorted(states._failed.items())],
+            "perturbations": [[i, dp, dt] for i, (dp, dt) in sorted(states._perturbed.items())],
+            "projection": asdict(states.projection)}
+    # meta.json is written last: a directory without it is an incomplete archive
+    tmp = os.path.join(dirpath, "meta.json.tmp")
+    with open(tmp, "w") as file:
+        json.dump(meta, file)
+    os.replace(tmp, os.path.join(dirpath, "meta.json"))
+
+
+class StatesArchive:
+    """Read-only view of a States saved with save_states, loading arrays lazily.
+
+    With mmap=True the arrays are memory-mapped, so slicing a phase's history only reads the pages
+    it touches. Arrays are opened on first access and kept.
+
+    Attributes:
+        phase_names, fluid_phases, list_all_elements, members : As in States
+        n_states : Number of states
+    """
+
+    def __init__(self, dirpath, mmap=True):
+        self.dirpath = dirpath
+        self.mmap_mode = "r" if mmap else None
+        with open(os.path.join(dirpath, "meta.json")) as file:
+            meta = json.load(file)
+        if meta.get("format") != "theriapy-states" or meta.get("version", 0) > FORMAT_VERSION:
+            raise ValueError(f"{dirpath} is not a States archive readable by this version")
+        self.meta = meta
+        self.n_states = meta["n_states"]
+        self.phase_names = meta["phase_names"]
+        self.phase_index = {name: i for i, name in enumerate(self.phase_names)}
+        self.fluid_phases = set(meta["fluid_phases"])
+        self.list_all_elements = meta["elements"]
+        self.members = meta["members"]
+        self._arrays = {}
+
+    def __len__(self):
+        return self.n_states
+
+    def _load(self, name):
+        arr = self._arrays.get(name)
+        if arr is None:
+            arr = np.load(os.path.join(self.dirpath, name + ".npy"), mmap_mode=self.mmap_mode)
+            self._arrays[name] = arr
+        return arr
+
+    @property
+    def volumes(self):
+        return self._load("volumes")
+
+    @property
+    def stable(self):
+        return self._load("stable")
+
+    @property
+    def pressures(self):
+        return self._load("pt")[:, 0]
+
+    @property
+    def temperatures(self):
+        return self._load("pt")[:, 1]
+
+    def get_element_list(self, i):
+        return self.meta["element_lists"][int(self._load("element_lists")[i])]
+
+    def get_phase_vols(self, phase, rows=slice(None)):
+        if phase not in self.phase_index:
+            return np.zeros(len(range(self.n_states)[rows]))
+        return np.asarray(self.volumes[rows, self.phase_index[phase]])
+
+    def get_phase_comp_array(self, phase, with_fluids=True, rows=slice(None)):
+        """As States.get_phase_comp_array, restricted to the contiguous range of states rows (a slice)"""
+        start, stop, step = rows.indices(self.n_states)
+        if step != 1:
+            raise ValueError("rows must be a contiguous slice")
+        arr = np.zeros((max(stop - start, 0), len(self.list_all_elements)))
+        if phase in self.phase_index and (with_fluids or phase not in self.fluid_phases):
+            k = self.phase_index[phase]
+            comp_rows = self._load(f"comp_{k}_rows")
+            # comp rows are sorted: only the compositions within the range are read
+            lo, hi = np.searchsorted(comp_rows, [start, stop])
+            arr[np.asarray(comp_rows[lo:hi]) - start] = self._load(f"comp_{k}_vals")[lo:hi]
+        return arr
+
+    def to_states(self):
+        """A States holding the archived data (states has one None per rock), backed by the loaded arrays"""
+        from theriapy.states import States, Projection
+        projection = Projection(**self.meta["projection"]) if "projection" in self.meta else None
+        states = States(members=self.members, projection=projection)
+        states.members = self.members
+        states.states = [None] * self.n_states
+        lists = [list(el_lis) for el_lis in self.meta["element_lists"]]
+        states.list_current_elements = [lists[i] for i in self._load("element_lists")]
+        states._element_lists = {tuple(el_lis): el_lis for el_lis in lists}
+        states.list_all_elements = list(self.list_all_elements)
+        states.element_index = {el: i for i, el in enumerate(states.list_all_elements)}
+        states.phase_names = list(self.phase_names)
+        states.phase_index = dict(self.phase_index)
+        states.fluid_phases = set(self.fluid_phases)
+        if os.path.exists(os.path.join(self.dirpath, "interpolated.npy")):
+            states._interpolated = self._load("interpolated").tolist()
+        states._failed = {i: reason for i, reason in self.meta.get("failures", [])}
+        states._perturbed = {i: (dp, dt) for i, dp, dt in self.meta.get("perturbations", [])}
+        states._vols = _from_array(self._load("volumes"))
+        states._stable = _from_array(self._load("stable"), fill_value=False)
+        states._pt = _from_array(self._load("pt"))
+        if states.projection.bulk:
+            states._bulk = _from_array(self._load("bulks"))
+        for k, phase in enumerate(self.phase_names):
+            states._comp_rows[phase] = _from_array(self._load(f"comp_{k}_rows").reshape(-1, 1))
+            states._comp_vals[phase] = _from_array(self._load(f"comp_{k}_vals"))
+            states._comp_elements[phase] = set(self.meta["phase_elements"][phase])
+        states._reindex()
+        return states
+
+
+def load_states(dirpath, mmap=True):
+    """Loads a States saved with save_states, see StatesArchive.to_states"""
+    return StatesArchive(dirpath, mmap=mmap).to_states()
@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class GrowableArray:
+    """A 2D NumPy array with amortised O(1) row appends and column additions.
+
+    Attributes:
+        n_rows, n_cols : The used shape; values returns a view of data[:n_rows, :n_cols]
+        fill_value : Value of the new cells
+    """
+
+    def __init__(self, n_cols=0, dtype=float, fill_value=0, capacity=16):
+        self.dtype = dtype
+        self.fill_value = fill_value
+        self.n_rows = 0
+        self.n_cols = n_cols
+        self.data = np.full((capacity, max(n_cols, 4)), fill_value, dtype=dtype)
+
+    def reserve(self, n_rows, n_cols):
+        cap_rows, cap_cols = self.data.shape
+        if n_rows <= cap_rows and n_cols <= cap_cols:
+            return
+        new_rows = max(n_rows, 2 * cap_rows) if n_rows > cap_rows else cap_rows
+        new_cols = max(n_cols, 2 * cap_cols) if n_cols > cap_cols else cap_cols
+        data = np.full((new_rows, new_cols), self.fill_value, dtype=self.dtype)
+        data[:self.n_rows, :self.n_cols] = self.data[:self.n_rows, :self.n_cols]
+        self.data = data
+
+    def add_columns(self, n=1):
+        self.reserve(self.n_rows, self.n_cols + n)
+        self.n_cols += n
+        return self.n_cols - 1
+
+    def ensure_columns(self, n_cols):
+        if n_cols > self.n_cols:
+            self.add_columns(n_cols - self.n_cols)
+
+    def append_row(self, row=None):
+        self.reserve(self.n_rows + 1, self.n_cols)
+        if row is not None:
+            self.data[self.n_rows, :len(row)] = row
+        self.n_rows += 1
+        return self.n_rows - 1
+
+    @property
+    def values(self):
+        return self.data[:self.n_rows, :self.n_cols]
+
+    def __len__(self):
+        return self.n_rows
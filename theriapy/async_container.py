@@ -0,0 +1,140 @@
+import asyncio
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+from theriapy.cache import minimisation_key
+from theriapy.parallel import ScratchTherCaller
+from theriapy.states import States
+
+
+class AsyncTheriakContainer:
+    """asyncio version of TheriakContainer: Theriak runs as an asyncio subprocess.
+
+    Attributes:
+        max_concurrency : Maximum number of Theriak processes running at the same time. Each running call
+        uses one of max_concurrency scratch directories.
+        cache : Optional MinimisationCache, shared with TheriakContainer if needed
+        timeout : Default wall-clock limit in seconds of a Theriak run (None: no limit); the process is killed
+        and a TimeoutError raised beyond it
+    """
+
+    def __init__(self, programs_dir, database, theriak_version, max_concurrency=8, scratch_root=None,
+                 source_dir=None, cache=None, verbose=False, timeout=None):
+        self.programs_dir = programs_dir
+        self.database = database
+        self.theriak_version = theriak_version
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.verbose = verbose
+        self.timeout = timeout
+        self._own_scratch = scratch_root is None
+        self.scratch_root = tempfile.mkdtemp(prefix="theriapy_async_") if scratch_root is None else scratch_root
+        self.source_dir = os.getcwd() if source_dir is None else source_dir
+        self._loops = weakref.WeakKeyDictionary()  # event loop -> (semaphore, queue of callers)
+        self._loop_ids = itertools.count()
+
+    def _loop_callers(self):
+        """
+        Semaphore and queue of callers of the running event loop, created on its first call so that the
+        container can be reused across loops (e.g. successive asyncio.run); each loop has its scratch slots.
+        """
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            loop_id = next(self._loop_ids)
+            callers = asyncio.Queue()
+            for i in range(self.max_concurrency):
+                callers.put_nowait(
+                    ScratchTherCaller(self.programs_dir, self.database, self.theriak_version,
+                                      scratch_dir=os.path.join(self.scratch_root, f"loop_{loop_id}_slot_{i}"),
+                                      source_dir=self.source_dir, verbose=self.verbose))
+            state = self._loops[loop] = (asyncio.Semaphore(self.max_concurrency), callers)
+        return state
+
+    async def minimisation(self, pressure, temperature, bulk, return_failed_minimisation=True, timeout=None):
+        """
+        Minimises one point. The Theriak process is killed if the call is cancelled or lasts more than
+        timeout seconds (self.timeout by default), in which case a TimeoutError is raised. The output is
+        parsed in the default executor, off the event loop.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if self.cache is not None:
+            key = minimisation_key(pressure, temperature, bulk, self.database, self.theriak_version,
+                                   return_failed_minimisation)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        semaphore, callers = self._loop_callers()
+        async with semaphore:
+            caller = await callers.get()
+            proc = None
+            try:
+                caller.write_therin(int(pressure), int(temperature), bulk)
+                proc = await asyncio.create_subprocess_exec(str(caller.theriak_exe), cwd=caller.scratch_dir,
+                                                            stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE)
+                try:
+                    stdout, stderr = await asyncio.wait_for(proc.communicate(caller.theriak_input.encode("utf-8")),
+                                                            timeout)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Theriak did not complete within {timeout} s at P={pressure} "
+                                       f"T={temperature}") from None
+                res = await asyncio.get_running_loop().run_in_executor(
+                    None, caller.parse_output, stdout.decode("utf-8"), return_failed_minimisation)
+            finally:
+                if proc is not None and proc.returncode is None:
+                    # cancelled or timed out: the process must not outlive the call
+                    proc.kill()
+                    try:
+                        await asyncio.shield(proc.wait())
+                    except asyncio.CancelledError:
+                        pass
+                callers.put_nowait(caller)
+
+        if self.cache is not None:
+            self.cache.put(key, res)
+        return res
+
+    async def compute_pt_path(self, pressures, temps, bulks, verbose=1):
+        if len(temps) != len(pressures):
+            raise Exception("Temperature list and pressure list have different sizes")
+
+        results = await asyncio.gather(*[self.minimisation(int(pressures[i]), int(temps[i]), bulks[i])
+                                         for i in range(len(temps))])
+        states = States()
+        for i, (rock, el_lis) in enumerate(results):
+            states.add_state(rock, el_lis)
+            if verbose:
+                print(int(temps[i]), int(pressures[i]), ":", [mineral.name for mineral in rock.mineral_assemblage])
+        return states
+
+    async def get_fluid(self, bulk, pressure, temperature, fluid):
+        rock, element_list = await self.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
+        fluid_names = [fluid.name for fluid in rock.fluid_assemblage]
+        if fluid in fluid_names:
+            index = fluid_names.index(fluid)
+            return rock.fluid_assemblage[index], element_list
+
+    async def get_rock_volume(self, bulk, temperature, pressure, fluids_in=True):
+        rock, element_list = await self.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
+        vol = 0
+        for mineral in rock.mineral_assemblage:
+            vol = vol + mineral.vol
+        if fluids_in:
+            for fluid in rock.fluid_assemblage:
+                vol = vol + fluid.vol
+        return vol
+
+    def close(self):
+        if self._own_scratch:
+            shutil.rmtree(self.scratch_root, ignore_errors=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,3 +1,8 @@
+import os
+import re
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from theriapy.states import States
 
 
 def update_label_to_style_from_stackplot(label_to_style, legend_order, polycols, labels):
@@ -14,7 +19,8 @@ def update_label_to_style_from_stackplot(label_to_style, legend_order, polycols,
 def batch_plot_stacked_volumes(ther, bulks, p_path, t_path, bulks_labels = None, members_set=None,
                                shrink=None, shrink_part=0.95, normalize=True, normalize_to_solids=False,
                                liq_phases=None,
-                               move_end_lists=None, move_front_lists=None, verbose=0):
+                               move_end_lists=None, move_front_lists=None, verbose=0, n_workers=None,
+                               executor="thread"):
     idx = 0
     label_to_style = {}  # label -> dict(color=..., hatch=..., etc.)
     legend_order = []  # keep consistent ordering
@@ -27,7 +33,8 @@ def batch_plot_stacked_volumes(ther, bulks, p_path, t_path, bulks_labels = None,
         if verbose:
             print("Bulk", idx, bulk)
         bulk_arr = [bulk] * len(p_path)
-        states = ther.compute_pt_path(p_path, t_path, bulk_arr)
+        states = ther.compute_pt_path(p_path, t_path, bulk_arr, verbose=verbose, n_workers=n_workers,
+                                     executor=executor)
         if members_set:
             states.set_members(members_set)
 
@@ -48,3 +55,95 @@ def batch_plot_stacked_volumes(ther, bulks, p_path, t_path, bulks_labels = None,
         update_label_to_style_from_stackplot(label_to_style, legend_order, polycols, labels_in_plot)
 
         idx += 1
+
+
+def iter_bulk_states(ther, bulks, p_path, t_path, members_set=None, n_workers=None, executor="thread", verbose=0):
+    """
+    Yields (index, States) for the path of each bulk, in the order of bulks.
+    The points of all the bulks are minimised through a single MinimisationPool when n_workers > 1, so that
+    the workers stay busy across bulks; each States is yielded as soon as its last point is computed.
+    """
+    n_points = len(p_path)
+    pressures = [int(p) for p in p_path] * len(bulks)
+    temps = [int(t) for t in t_path] * len(bulks)
+    all_bulks = [bulk for bulk in bulks for _ in range(n_points)]
+
+    pool = ther.get_pool(n_workers=n_workers, executor=executor) if n_workers is not None and n_workers > 1 else None
+    results = None
+    try:
+        results = ther.iter_minimisations(pressures, temps, all_bulks, pool=pool)
+        for idx in range(len(bulks)):
+            if verbose:
+                print("Bulk", idx, bulks[idx])
+            states = States()
+            states.instrument = ther.instrument
+            for _ in range(n_points):
+                rock, el_lis = next(results)
+                states.add_state(rock, el_lis)
+            if members_set:
+                states.set_members(members_set)
+            yield idx, states
+    finally:
+        # also reached when the consumer stops early or a minimisation fails
+        if results is not None:
+            results.close()
+        if pool is not None:
+            pool.close()
+
+
+def batch_render_stacked_volumes(ther, bulks, p_path, t_path, output, bulks_labels=None, members_set=None,
+                                 layout="panels", ncols=4, fmt="png", dpi=100, label_to_style=None,
+                                 n_workers=None, executor="thread", verbose=0, **plot_kwargs):
+    """
+    Computes the paths of all the bulks (concurrently if n_workers > 1) and renders their stacked volumes
+    off-screen with the Agg canvas, without going through pyplot.
+
+    layout="panels" draws one panel per bulk in a single figure saved to output (a file path);
+    layout="files" saves one image per bulk in the directory output, each figure being released once saved.
+    The label_to_style registry is shared by all the panels, so a phase keeps its colour across bulks.
+    plot_kwargs are passed to States.plot_path_stacked_volumes (normalize, shrink, liq_phases, ...).
+    Returns the label_to_style registry and the list of the written files.
+    """
+    if layout not in ("panels", "files"):
+        raise ValueError(f"Unknown layout '{layout}', expected 'panels' or 'files'")
+    bulks_labels = list(bulks_labels) if bulks_labels else []
+    bulks_labels += [f"bulk{i}" for i in range(len(bulks_labels), len(bulks))]
+    label_to_style = {} if label_to_style is None else label_to_style
+    legend_order = []
+    written = []
+
+    if layout == "panels":
+        nrows = -(-len(bulks) // ncols)
+        fig = Figure(figsize=(6 * min(ncols, len(bulks)), 4 * nrows))
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(nrows, min(ncols, len(bulks)), squeeze=False).ravel()
+        for ax in axes[len(bulks):]:
+            ax.set_visible(False)
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    for idx, states in iter_bulk_states(ther, bulks, p_path, t_path, members_set=members_set, n_workers=n_workers,
+                                        executor=executor, verbose=verbose):
+        if layout == "panels":
+            ax = axes[idx]
+        else:
+            panel_fig = Figure(figsize=(6, 4))
+            FigureCanvasAgg(panel_fig)
+            ax = panel_fig.add_subplot()
+        polycols, labels_in_plot = states.plot_path_stacked_volumes(t_path, title=bulks_labels[idx],
+                                                                    label_to_style=label_to_style,
+                                                                    return_polycols=True, ax=ax, **plot_kwargs)
+        update_label_to_style_from_stackplot(label_to_style, legend_order, polycols, labels_in_plot)
+        if layout == "files":
+            name = re.sub(r"[^\w.-]", "_", bulks_labels[idx])
+            filepath = os.path.join(output, f"{idx:04d}_{name}.{fmt}")
+            panel_fig.savefig(filepath, dpi=dpi)
+            panel_fig.clear()
+            written.append(filepath)
+
+    if layout == "panels":
+        fig.tight_layout()
+        fig.savefig(output, dpi=dpi)
+        fig.clear()
+        written.append(output)
+    return label_to_style, written
@@ -44,7 +44,7 @@ ratio_el_to_ox = {
     "H": 0.111898344
 }
 
-def adjust_bulk_to_100(formula):
+def adjust_bulk_to_100(formula, verbose=True):
     # Extract elements and their values, keep "O(?)"
     elements = re.findall(r'([A-Z]{1,2})\(([\d.]+|\?)\)', formula)
 
@@ -73,7 +73,8 @@ def adjust_bulk_to_100(formula):
         for i in range(len(elements))
     )
 
-    print("result:", normalized_bulk)
+    if verbose:
+        print("result:", normalized_bulk)
     return normalized_bulk
 
 
@@ -86,11 +87,7 @@ def composition_dict_to_str(compo):
 
 # From pytheriak example (02)
 def bulk_from_compositionalvector(composition: list | np.ndarray, element_list: list | np.ndarray):
-    bulk = ""
-    for moles, element in zip(composition, element_list):
-        bulk += element
-        bulk += "(" + str(moles) + ")"
-    return bulk
+    return "".join([f"{element}({moles})" for moles, element in zip(composition, element_list)])
 
 
 def bulk_to_oxides(bulk, normalize=True):
@@ -113,3 +110,158 @@ def bulk_to_oxides(bulk, normalize=True):
         return normalized
     return total
 
+
+_bulk_pair = re.compile(r'([A-Z]+)\(([^)]*)\)')
+_bulk_values = re.compile(r'\(([^)]*)\)')
+
+
+class BulkMatrix:
+    """A batch of bulk compositions as an (n_elements, n_samples) matrix over a fixed element vocabulary.
+
+    Attributes:
+        elements : Element vocabulary, the rows of values
+        values : Float array (n_elements, n_samples) of the element amounts (moles or mol%)
+        free : Bool array (n_elements), True for the elements left to Theriak ("O(?)"); their values are ignored
+    """
+
+    def __init__(self, values, elements, free=None):
+        self.values = np.asarray(values, dtype=float).reshape(len(elements), -1)
+        self.elements = list(elements)
+        self.element_index = {el: i for i, el in enumerate(self.elements)}
+        self.free = np.zeros(len(self.elements), dtype=bool) if free is None else np.asarray(free, dtype=bool)
+
+    def __len__(self):
+        return self.values.shape[1]
+
+    @classmethod
+    def from_strings(cls, bulks, elements=None):
+        """
+        Decodes bulk strings. If all the strings list the same elements in the same order (the usual case for
+        batches), the values are parsed in a single pass; otherwise each string is mapped on the vocabulary
+        (elements, or the union of the elements in order of appearance), missing elements being 0 and
+        duplicated ones summed. An element "?" in one string must be "?" in all the strings that list it, a
+        ValueError is raised otherwise (as cache.canonical_bulk does within one string).
+        """
+        bulks = list(bulks)
+        if not bulks:
+            raise ValueError("No bulk to decode")
+        joined = "".join(bulks)
+        first = _bulk_pair.findall(bulks[0]) if bulks else []
+        names = [el for el, val in first]
+        # Same layout: the element names of the batch (values removed) repeat those of the first bulk
+        same_layout = len(set(names)) == len(names) > 0 and (elements is None or list(elements) == names) and \
+            _bulk_values.sub("", joined) == "".join(names) * len(bulks)
+        if same_layout:
+            free = [val.strip() == '?' for el, val in first]
+            raw = _bulk_values.findall(joined)
+            for k, is_free in enumerate(free):
+                if is_free:
+                    if any(val.strip() != '?' for val in raw[k::len(names)]):
+                        raise ValueError(f"Element {names[k]} is given both as '?' and with an amount")
+                    raw[k::len(names)] = ["0"] * len(bulks)
+            try:
+                return cls(np.array(raw, dtype=float).reshape(len(bulks), len(names)).T, names, free)
+            except ValueError:
+                pass  # "?" where the first bulk has a value: mapped element by element below
+
+        pairs = _bulk_pair.findall(joined)
+        if elements is None:
+            elements = list(dict.fromkeys(el for el, val in pairs))
+        index = {el: i for i, el in enumerate(elements)}
+        values = np.zeros((len(elements), len(bulks)))
+        free = np.zeros(len(elements), dtype=bool)
+        fixed = np.zeros(len(elements), dtype=bool)
+        for j, bulk in enumerate(bulks):
+            for el, val in _bulk_pair.findall(bulk):
+                if el not in index:
+                    raise ValueError(f"Element {el} of bulk {j} is not in the vocabulary")
+                if val.strip() == '?':
+                    free[index[el]] = True
+                else:
+                    fixed[index[el]] = True
+                    values[index[el], j] += float(val)
+        if (free & fixed).any():
+            both = [el for el, both in zip(elements, free & fixed) if both]
+            raise ValueError(f"Elements {both} are given both as '?' and with an amount")
+        return cls(values, elements, free)
+
+    @classmethod
+    def from_vectors(cls, compositions, element_list):
+        """From compositional vectors (n_samples, n_elements) over element_list, e.g. Rock.bulk_composition_moles"""
+        return cls(np.asarray(compositions, dtype=float).reshape(-1, len(element_list)).T, element_list)
+
+    def to_strings(self, fmt="%.10g", skip_zeros=False):
+        """
+        Encodes the samples as bulk strings, elements in vocabulary order and values written with fmt.
+        Elements at 0 in a sample are omitted if skip_zeros is True.
+        """
+        if skip_zeros:
+            res = []
+            for col in self.values.T:
+                res.append("".join(f"{el}(?)" if self.free[i] else f"{el}({fmt % col[i]})"
+                                   for i, el in enumerate(self.elements) if self.free[i] or col[i] != 0))
+            return res
+        template = "".join(f"{el}(?)" if self.free[i] else f"{el}({fmt})" for i, el in enumerate(self.elements))
+        rows = self.values[~self.free].T.tolist()
+        return [template % tuple(row) for row in rows]
+
+    def canonical(self):
+        """
+        Same batch with the elements sorted. to_strings() then gives the strings of cache.canonical_bulk for the
+        elements each bulk lists; the elements a bulk lacks in a union vocabulary are written at 0 (e.g. "AL(0)"),
+        to_strings(skip_zeros=True) leaves them out.
+        """
+        order = np.argsort(self.elements, kind="stable")
+        return BulkMatrix(self.values[order], [self.elements[i] for i in order], self.free[order])
+
+    def with_elements(self, elements):
+        """Same batch over another vocabulary (new elements at 0); dropping a non-zero element raises a ValueError"""
+        values = np.zeros((len(elements), len(self)))
+        free = np.zeros(len(elements), dtype=bool)
+        for i, el in enumerate(elements):
+            k = self.element_index.get(el)
+            if k is not None:
+                values[i] = self.values[k]
+                free[i] = self.free[k]
+        dropped = [el for el in self.elements if el not in set(elements)]
+        if any(self.values[self.element_index[el]].any() or self.free[self.element_index[el]] for el in dropped):
+            raise ValueError(f"Elements {dropped} are not in the new vocabulary")
+        return BulkMatrix(values, elements, free)
+
+    def normalized(self, total=100.0):
+        """Batch with the non-free elements of each sample scaled to total (adjust_bulk_to_100 for a batch)"""
+        values = self.values.copy()
+        sums = values[~self.free].sum(axis=0)
+        values[~self.free] *= np.divide(total, sums, out=np.zeros_like(sums), where=sums != 0)
+        return BulkMatrix(values, self.elements, self.free)
+
+    def to_oxides(self, normalize=True):
+        """
+        Oxide weights of the samples: returns the oxide names and an (n_oxides, n_samples) matrix, normalised to 100
+        if normalize is True. O and the free elements are ignored (bulk_to_oxides for a batch).
+        """
+        el_to_ox = {v: k for k, v in name_ox_to_el.items()}
+        rows = [i for i, el in enumerate(self.elements) if el != "O" and not self.free[i]]
+        unknown = [self.elements[i] for i in rows if self.elements[i] not in el_to_ox]
+        if unknown:
+            raise ValueError(f"No oxide for the elements {unknown}")
+        factors = np.array([molar_mass[self.elements[i]] / ratio_el_to_ox[self.elements[i]] for i in rows])
+        oxides = self.values[rows] * factors[:, None]
+        if normalize:
+            sums = oxides.sum(axis=0)
+            oxides = oxides * np.divide(100.0, sums, out=np.zeros_like(sums), where=sums != 0)
+        return [el_to_ox[self.elements[i]] for i in rows], oxides
+
+    @classmethod
+    def from_oxides(cls, oxides, weights, free_oxygen=True):
+        """
+        Element moles from oxide weights (n_oxides, n_samples), the inverse of to_oxides(normalize=False).
+        O is added as a free element ("O(?)") if free_oxygen is True.
+        """
+        elements = [name_ox_to_el[ox] for ox in oxides]
+        factors = np.array([ratio_el_to_ox[el] / molar_mass[el] for el in elements])
+        values = np.asarray(weights, dtype=float).reshape(len(oxides), -1) * factors[:, None]
+        if free_oxygen:
+            values = np.vstack([values, np.zeros((1, values.shape[1]))])
+            return cls(values, elements + ["O"], np.r_[np.zeros(len(elements), dtype=bool), True])
+        return cls(values, elements)
@@ -0,0 +1,143 @@
+import os
+import re
+import pickle
+import hashlib
+import tempfile
+from collections import OrderedDict
+
+
+def canonical_bulk(bulk):
+    """
+    Canonical form of a bulk string: elements sorted, duplicated elements summed and
+    values written with a fixed precision, e.g. "AL(15.99)SI(65.44)O(?)" -> "AL(15.99)O(?)SI(65.44)"
+    """
+    values = {}
+    for el, val in re.findall(r'([A-Z]+)\(([^)]*)\)', bulk):
+        is_free = val.strip() == '?'
+        if el in values and (values[el] == '?') != is_free:
+            raise ValueError(f"Element {el} is given both as '?' and with an amount in bulk {bulk!r}")
+        if is_free:
+            values[el] = '?'
+        else:
+            values[el] = values.get(el, 0.0) + float(val)
+    return "".join(f"{el}(?)" if values[el] == '?' else f"{el}({values[el]:.10g})" for el in sorted(values))
+
+
+def minimisation_key(pressure, temperature, bulk, database, theriak_version, return_failed_minimisation=True):
+    key = "|".join([str(database), str(theriak_version), str(int(pressure)), str(int(temperature)),
+                    canonical_bulk(bulk), str(bool(return_failed_minimisation))])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class MinimisationCache:
+    """Two-level cache of minimisation results (rock, element_list).
+
+    The values kept in memory are returned as is, not copied: a Rock returned by get is shared with every
+    later hit and must not be modified in place.
+
+    Attributes:
+        max_items : Number of results kept in the in-memory LRU
+        cache_dir : Directory of the on-disk store. No disk persistence if None.
+        max_disk_bytes : Size of the on-disk store above which the least recently used entries are removed
+    """
+
+    def __init__(self, max_items=4096, cache_dir=None, max_disk_bytes=2 * 1024 ** 3):
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.disk_bytes = 0
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def _disk_entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".pkl"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as file:
+                        value = pickle.load(file)
+                    os.utime(path)  # mark as recently used
+                except Exception:
+                    # Unreadable entry (e.g. written by another pytheriak version)
+                    self._remove(path)
+                else:
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.cache_dir is None:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(path):
+            self.disk_bytes -= os.path.getsize(path)
+        os.replace(tmp_path, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.max_disk_bytes:
+            self.evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.disk_bytes -= size
+        except OSError:
+            pass
+
+    def evict(self, target_bytes=None):
+        """Removes the least recently used disk entries until the store is below target_bytes
+        (90% of max_disk_bytes by default)."""
+        target_bytes = int(0.9 * self.max_disk_bytes) if target_bytes is None else target_bytes
+        entries = sorted(self._disk_entries())
+        self.disk_bytes = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self.disk_bytes <= target_bytes:
+                break
+            self._remove(path)
+
+    def clear(self, disk=True):
+        self.memory.clear()
+        if disk and self.cache_dir is not None:
+            for _, path, _ in self._disk_entries():
+                self._remove(path)
+            self.disk_bytes = 0
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -84,3 +85,202 @@ def remove_composition(compo_a, compo_b):
             subs_comp[elt] = max(0, compo_a[elt] - compo_b[elt])
 
     return subs_comp
+
+
+class Composition:
+    """Element amounts over a fixed element vocabulary, backed by a NumPy vector.
+
+    Arithmetic between compositions of the same vocabulary is a single vector operation; other
+    vocabularies are first aligned on the union of the elements (missing elements at 0).
+    """
+
+    __slots__ = ("elements", "values", "_index")
+
+    def __init__(self, values, elements):
+        self.elements = tuple(elements)
+        self.values = np.asarray(values, dtype=float)
+        self._index = None
+
+    @classmethod
+    def from_dict(cls, compo, elements=None):
+        elements = tuple(compo) if elements is None else tuple(elements)
+        return cls([compo.get(elt, 0.0) for elt in elements], elements)
+
+    def to_dict(self):
+        return dict(zip(self.elements, self.values.tolist()))
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {elt: i for i, elt in enumerate(self.elements)}
+        return self._index
+
+    def __getitem__(self, elt):
+        return self.values[self.index[elt]]
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __repr__(self):
+        return "Composition(" + ", ".join(f"{elt}={val:.6g}" for elt, val in zip(self.elements, self.values)) + ")"
+
+    def aligned(self, elements):
+        """Same composition over another vocabulary (elements not in it are dropped)"""
+        elements = tuple(elements)
+        if elements == self.elements:
+            return self
+        index = self.index
+        return Composition([self.values[index[elt]] if elt in index else 0.0 for elt in elements], elements)
+
+    def _pair(self, other):
+        if other.elements == self.elements:
+            return self.values, other.values, self.elements
+        elements = self.elements + tuple(elt for elt in other.elements if elt not in self.index)
+        return self.aligned(elements).values, other.aligned(elements).values, elements
+
+    def __add__(self, other):
+        a, b, elements = self._pair(other)
+        return Composition(a + b, elements)
+
+    def __sub__(self, other):
+        a, b, elements = self._pair(other)
+        return Composition(a - b, elements)
+
+    def __mul__(self, factor):
+        return Composition(self.values * factor, self.elements)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Composition(-self.values, self.elements)
+
+    def clip(self, lower=0.0, upper=None):
+        return Composition(np.clip(self.values, lower, upper), self.elements)
+
+    def remove(self, other):
+        """
+        As remove_composition: the elements of other are subtracted and clipped at 0, the other elements
+        are kept as they are; the result has the vocabulary of self
+        """
+        if other.elements == self.elements:
+            return (self - other).clip(0.0)
+        values = self.values.copy()
+        for i, elt in enumerate(self.elements):
+            if elt in other.index:
+                values[i] = max(0.0, values[i] - other[elt])
+        return Composition(values, self.elements)
+
+    def copy(self):
+        return Composition(self.values.copy(), self.elements)
+
+    @staticmethod
+    def sum(*compositions):
+        """Sum of compositions, as sum_compositions; a common vocabulary is summed as a single array reduction"""
+        if not compositions:
+            return Composition([], ())
+        elements = compositions[0].elements
+        if all(compo.elements == elements for compo in compositions):
+            return Composition(np.sum([compo.values for compo in compositions], axis=0), elements)
+        total = compositions[0]
+        for compo in compositions[1:]:
+            total = total + compo
+        return total
+
+
+class PhaseCompositions:
+    """Compositions (and volumes) of the stable phases of a minimisation, parsed once.
+
+    Attributes:
+        phases : Phase names, the rows of matrix
+        elements : Element vocabulary (without E), the columns of matrix
+        matrix : Float array (n_phases, n_elements) of the moles of elements in each phase
+        volumes : Dict phase -> volume [ccm] (solids and fluids), empty if unknown
+    """
+
+    def __init__(self, phases, elements, matrix, volumes=None):
+        self.phases = list(phases)
+        self.elements = tuple(elements)
+        self.matrix = np.asarray(matrix, dtype=float).reshape(len(self.phases), len(self.elements))
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.volumes = {} if volumes is None else dict(volumes)
+
+    @classmethod
+    def from_data_comp(cls, data_comp, data_vol_d=None):
+        """From the tables of Theriapy.parse_out (header row first)"""
+        header = list(data_comp[0])
+        cols = [k for k in range(1, len(header)) if header[k] != 'E']
+        rows = [row for row in data_comp[1:] if row[0] != 'total:']
+        matrix = [[float(row[k]) for k in cols] for row in rows]
+        volumes = None
+        if data_vol_d is not None:
+            k_vol = list(data_vol_d[0]).index('volume[ccm]')
+            volumes = {row[0]: float(row[k_vol]) for row in data_vol_d[1:] if row[0] != 'Total'}
+        return cls([row[0] for row in rows], [header[k] for k in cols], matrix, volumes)
+
+    @classmethod
+    def from_out_tables(cls, tables):
+        """From the typed tables of out_parser.parse_out_file"""
+        cols = [k for k, elt in enumerate(tables.elements) if elt != 'E']
+        volumes = {str(row['phase']): float(row['vol']) for row in tables.volumes}
+        return cls(tables.comp_phases, [tables.elements[k] for k in cols], tables.compositions[:, cols], volumes)
+
+    @classmethod
+    def from_rock(cls, rock, element_list):
+        """From a pytheriak Rock and its element list"""
+        phases = [*rock.mineral_assemblage, *rock.fluid_assemblage]
+        matrix = np.zeros((len(phases), len(element_list)))
+        for i, phase in enumerate(phases):
+            comp = phase.composition_moles[:len(element_list)]
+            matrix[i, :len(comp)] = comp
+        return cls([phase.name for phase in phases], element_list, matrix,
+                   {phase.name: phase.vol for phase in phases})
+
+    def get(self, phase):
+        """Composition of a phase (zero if the phase is not stable)"""
+        if phase not in self.phase_index:
+            return Composition(np.zeros(len(self.elements)), self.elements)
+        return Composition(self.matrix[self.phase_index[phase]], self.elements)
+
+    def solution(self, solution):
+        """Summed composition of the phases whose name contains solution"""
+        mask = [name.find(solution) != -1 for name in self.phases]
+        return Composition(self.matrix[mask].sum(axis=0), self.elements)
+
+    def composition(self, compo):
+        return compo if isinstance(compo, Composition) else Composition.from_dict(compo)
+
+    def remove_phase(self, phase, compo, prop):
+        """(new composition clipped at 0, extracted composition), as comp_mixer.remove_phase"""
+        compo = self.composition(compo)
+        if phase not in self.phase_index:
+            return compo.copy(), Composition([], ())
+        extracted = self.get(phase) * prop
+        return (compo - extracted).clip(0.0), extracted
+
+    def remove_solution(self, solution, compo, prop):
+        """
+        As remove_phase for all the phases whose name contains solution, their compositions being summed
+        (comp_mixer.remove_solution only kept the last matching phase)
+        """
+        compo = self.composition(compo)
+        extracted = self.solution(solution) * prop
+        return (compo - extracted).clip(0.0), extracted
+
+    def add_phase(self, phase, compo, prop):
+        return self.remove_phase(phase, compo, -prop)
+
+    def add_solution(self, solution, compo, prop):
+        return self.remove_solution(solution, compo, -prop)
+
+    def phase_threshold_vol(self, phase, compo, limit):
+        """Removes the part of phase above the volume fraction limit of the rock, as comp_mixer.phase_threshold_vol"""
+        compo = self.composition(compo)
+        if phase in self.volumes:
+            vol_phase = self.volumes[phase]
+            vol_total = sum(self.volumes.values())
+            vol_without_phase = vol_total - vol_phase
+            if vol_phase / vol_total > limit:
+                vol_extracted = vol_phase - limit * vol_without_phase / (1 - limit)
+                new_comp, resid = self.remove_phase(phase, compo, vol_extracted / vol_phase)
+                return new_comp
+        return compo
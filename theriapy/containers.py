@@ -1,8 +1,18 @@
+import os
 import re
 from dataclasses import dataclass
 import numpy as np
-from pytheriak import wrapper
 from theriapy.bulk import bulk_from_compositionalvector
+from theriapy.cache import minimisation_key
+from theriapy.instrument import NULL_INSTRUMENTATION
+from theriapy.parallel import MinimisationPool
+from theriapy.distributed import DistributedPool
+from theriapy.pseudosection import compute_pt_grid
+from theriapy.isograds import compute_isograds
+from theriapy.ensemble import compute_bulk_ensemble
+from theriapy.adaptive import compute_adaptive_pt_path
+from theriapy.journal import PathJournal
+from theriapy.retry import TimedTherCaller, FailedRock, minimise_with_retry, perturbation_of
 from theriapy.states import States
 
 
@@ -13,6 +23,17 @@ class Command:
     percent: float  # e.g. 95
 
 
+@dataclass
+class PathStep:
+    index: int
+    pressure: int
+    temperature: int
+    bulk: str  # bulk used for the minimisation
+    rock: object
+    element_list: list
+    next_bulk: str = None  # bulk carried to the next step (ruled paths)
+
+
 def parse_command(s: str) -> Command:
     # split on any non-alphanumeric/% and normalize to upper
     parts = [p for p in re.findall(r"[A-Za-z0-9_]+", s)]
@@ -23,93 +44,429 @@ def parse_command(s: str) -> Command:
 
 
 class TheriakContainer:
-    def __init__(self, programs_dir, database, theriak_version):
-        self.theriak = wrapper.TherCaller(programs_dir=programs_dir,
-                                          database=database,
-                                          theriak_version=theriak_version)
+    def __init__(self, programs_dir, database, theriak_version, cache=None, instrument=None, retry=None):
+        self.programs_dir = programs_dir
+        self.database = database
+        self.theriak_version = theriak_version
+        self.cache = cache  # MinimisationCache or None
+        self.instrument = NULL_INSTRUMENTATION if instrument is None else instrument  # Instrumentation
+        self.retry = retry  # RetryPolicy or None, also applied by the pools of get_pool
+        self.theriak = TimedTherCaller(programs_dir=programs_dir,
+                                       database=database,
+                                       theriak_version=theriak_version)
+
+    def _cache_key(self, pressure, temperature, bulk, return_failed_minimisation=True):
+        return minimisation_key(pressure, temperature, bulk, self.database, self.theriak_version,
+                                return_failed_minimisation)
+
+    @staticmethod
+    def _cacheable(rock):
+        """
+        Whether a result can be cached under the key of its point: not failed (FailedRock, or the output of a
+        failed minimisation when return_failed_minimisation is False) nor computed off the point
+        """
+        return not isinstance(rock, (str, FailedRock)) and perturbation_of(rock) == (0, 0)
 
     def minimisation(self, pressure, temperature, bulk, return_failed_minimisation=True):
-        rock, element_list = self.theriak.minimisation(int(pressure), int(temperature), bulk,
-                                                       return_failed_minimisation=return_failed_minimisation)
+        """
+        (rock, element_list) of a point, from the cache if one is set. Only the successful minimisations
+        computed at the requested point are cached (see _cacheable), failed ones are computed again.
+        The cached rocks are shared: the same Rock object is returned for every hit in memory, it must not be
+        modified in place.
+        """
+        ins = self.instrument
+        if self.cache is not None:
+            with ins.stage("cache"):
+                key = self._cache_key(pressure, temperature, bulk, return_failed_minimisation)
+                cached = self.cache.get(key)
+            if cached is not None:
+                ins.count("cache_hits")
+                return cached
+            ins.count("cache_misses")
+
+        if self.retry is not None:
+            with ins.stage("theriak"):
+                rock, element_list = minimise_with_retry(self.theriak, int(pressure), int(temperature), bulk,
+                                                         self.retry, return_failed_minimisation, ins)
+            ins.count("minimisations")
+            if isinstance(rock, FailedRock):
+                ins.count("failed_points")
+            elif perturbation_of(rock) != (0, 0):
+                ins.count("perturbed_points")
+        elif ins.enabled:
+            rock, element_list = self._instrumented_minimisation(int(pressure), int(temperature), bulk,
+                                                                 return_failed_minimisation)
+        else:
+            rock, element_list = self.theriak.minimisation(int(pressure), int(temperature), bulk,
+                                                           return_failed_minimisation=return_failed_minimisation)
+        if self.cache is not None and self._cacheable(rock):
+            with ins.stage("cache"):
+                self.cache.put(key, (rock, element_list))
         return rock, element_list
 
-    def compute_pt_path(self, pressures, temps, bulks, verbose=1):
+    def _instrumented_minimisation(self, pressure, temperature, bulk, return_failed_minimisation):
+        """TherCaller.minimisation split in a Theriak stage and a pytheriak parsing stage"""
+        ins = self.instrument
+        ins.count("minimisations")
+        with ins.stage("theriak"):
+            theriak_output = self.theriak.call_theriak(pressure=pressure, temperature=temperature, bulk=bulk)
+        if not self.theriak.check_minimisation(theriak_output=theriak_output):
+            ins.count("failed_minimisations")
+            if not return_failed_minimisation:
+                return theriak_output, []
+        with ins.stage("parse"):
+            blocks, element_list, output_line_overflow, fluids_stable = \
+                self.theriak.read_theriak(theriak_output=theriak_output)
+            rock = self.theriak.create_rock(blocks=blocks, output_line_overflow=output_line_overflow,
+                                            fluids_stable=fluids_stable)
+        return rock, element_list
+
+    def pool_minimisation(self, pool, pressures, temps, bulks):
+        """Minimises all points with a MinimisationPool, only dispatching the points missing from the cache."""
+        if self.cache is None:
+            self.instrument.count("minimisations", len(pressures))
+            with self.instrument.stage("pool"):
+                return pool.map(pressures, temps, bulks)
+
+        keys = [self._cache_key(p, t, b) for p, t, b in zip(pressures, temps, bulks)]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, res in enumerate(results) if res is None]
+        self.instrument.count("cache_hits", len(keys) - len(missing))
+        self.instrument.count("cache_misses", len(missing))
+        if missing:
+            self.instrument.count("minimisations", len(missing))
+            with self.instrument.stage("pool"):
+                computed = pool.map([pressures[i] for i in missing], [temps[i] for i in missing],
+                                    [bulks[i] for i in missing])
+            for i, res in zip(missing, computed):
+                if self._cacheable(res[0]):
+                    self.cache.put(keys[i], res)
+                results[i] = res
+        return results
+
+    def get_pool(self, n_workers=None, executor="thread", scratch_root=None):
+        """
+        MinimisationPool of n_workers threads or processes, or with executor="distributed" a DistributedPool
+        with n_workers local worker processes
+        """
+        if executor == "distributed":
+            return self.get_distributed_pool(n_local_workers=n_workers or os.cpu_count() or 1)
+        return MinimisationPool(self.programs_dir, self.database, self.theriak_version,
+                                n_workers=n_workers, executor=executor, scratch_root=scratch_root, retry=self.retry)
+
+    def get_distributed_pool(self, address=("127.0.0.1", 0), authkey=None, n_local_workers=0, shard_size=8,
+                             task_timeout=None, timeout=None):
+        """
+        DistributedPool listening on address, usable as pool by all the pool-based methods. n_local_workers
+        workers running this container's Theriak (and RetryPolicy) are started; more can join from other
+        nodes with "python -m theriapy.distributed worker --address host:port ..." and the pool's authkey.
+        timeout limits each call of the pool, see DistributedPool.
+        """
+        pool = DistributedPool(address=address, authkey=authkey, shard_size=shard_size, task_timeout=task_timeout,
+                               retry=self.retry, timeout=timeout)
+        if n_local_workers:
+            pool.start_local_workers(n_local_workers, self.programs_dir, self.database, self.theriak_version)
+        return pool
+
+    def iter_minimisations(self, pressures, temps, bulks, pool=None):
+        """Yields the (rock, element_list) of each point in order, concurrently if a MinimisationPool is given."""
+        if pool is None:
+            for i in range(len(temps)):
+                yield self.minimisation(int(pressures[i]), int(temps[i]), bulks[i])
+            return
 
+        ins = self.instrument
+        if self.cache is None:
+            ins.count("minimisations", len(pressures))
+            yield from pool.imap(pressures, temps, bulks)
+            return
+
+        keys = [self._cache_key(p, t, b) for p, t, b in zip(pressures, temps, bulks)]
+        cached = {}
+        for i, key in enumerate(keys):
+            res = self.cache.get(key)
+            if res is not None:
+                cached[i] = res
+        missing = [i for i in range(len(keys)) if i not in cached]
+        ins.count("cache_hits", len(cached))
+        ins.count("cache_misses", len(missing))
+        ins.count("minimisations", len(missing))
+        computed = pool.imap([pressures[i] for i in missing], [temps[i] for i in missing],
+                             [bulks[i] for i in missing])
+        for i in range(len(keys)):
+            if i in cached:
+                yield cached.pop(i)
+            else:
+                res = next(computed)
+                if self._cacheable(res[0]):
+                    self.cache.put(keys[i], res)
+                yield res
+
+    def iter_pt_path(self, pressures, temps, bulks, callback=None, stop=None, verbose=0, n_workers=None,
+                     executor="thread", pool=None, start=0):
+        """
+        Yields a PathStep as soon as each state of a P-T path is computed, in path order, from step start.
+        callback(step) is called for each step; the iteration ends after the first step for which stop(step)
+        is True, e.g. stop=lambda step: "LIQtc_h2oL" in [f.name for f in step.rock.fluid_assemblage].
+        """
         if len(temps) != len(pressures):
             raise Exception("Temperature list and pressure list have different sizes")
 
-        states = States()
-        for i in range(len(temps)):
-            rock, el_lis = self.minimisation(int(pressures[i]), int(temps[i]), bulks[i])
+        own_pool = pool is None and n_workers is not None and n_workers > 1
+        if own_pool:
+            pool = self.get_pool(n_workers=n_workers, executor=executor)
+        results = self.iter_minimisations(pressures[start:], temps[start:], bulks[start:], pool=pool)
+        if pool is not None and self.instrument.enabled:
+            results = self._timed_results(results, "pool")
+        try:
+            for i, (rock, el_lis) in enumerate(results, start):
+                step = PathStep(i, int(pressures[i]), int(temps[i]), bulks[i], rock, el_lis)
+                if verbose:
+                    print(int(temps[i]), int(pressures[i]), ":", [mineral.name for mineral in rock.mineral_assemblage])
+                if callback is not None:
+                    callback(step)
+                yield step
+                if stop is not None and stop(step):
+                    break
+        finally:
+            results.close()
+            if own_pool:
+                pool.close()
+
+    def _timed_results(self, results, stage):
+        """Times the wait for each item of a results generator; closing the wrapper closes the generator"""
+        try:
+            while True:
+                with self.instrument.stage(stage):
+                    res = next(results, None)
+                if res is None:
+                    return
+                yield res
+        finally:
+            results.close()
+
+    def compute_pt_path(self, pressures, temps, bulks, verbose=1, n_workers=None, executor="thread", pool=None,
+                        callback=None, stop=None, resume=None, adaptive=False, n_coarse=16, vol_tol=2.0,
+                        projection=None):
+        """
+        Computes the states along a P-T path.
+        If n_workers > 1 (or a MinimisationPool is given), the points are minimised concurrently by a
+        thread or process pool ("executor"); the states are still added in path order.
+        resume is a journal file path (or a PathJournal): the steps already in the journal are reloaded
+        instead of being computed again, and each new step is appended to it.
+        If adaptive is True, only a coarse subset of the points and the bisections of the segments where the
+        assemblage or a volume (beyond vol_tol %) changes are minimised; the other states are interpolated,
+        see adaptive.compute_adaptive_pt_path (callback, stop and resume are not available in this mode).
+        projection (a states.Projection) restricts what the States keeps, e.g. Projection.lean() to drop the rocks.
+        """
+        if adaptive:
+            if callback is not None or stop is not None or resume is not None:
+                raise ValueError("callback, stop and resume are not supported with adaptive=True")
+            own_pool = pool is None and n_workers is not None and n_workers > 1
+            if own_pool:
+                pool = self.get_pool(n_workers=n_workers, executor=executor)
+            try:
+                return compute_adaptive_pt_path(self, pressures, temps, bulks, n_coarse=n_coarse, vol_tol=vol_tol,
+                                                pool=pool, verbose=verbose, projection=projection)
+            finally:
+                if own_pool:
+                    pool.close()
+
+        states = States(projection=projection)
+        states.instrument = self.instrument
+        journal, own_journal = self._open_journal(resume)
+        try:
+            start = 0
+            if journal is not None:
+                journal.check_header({"kind": "path", "database": self.database})
+                start, stopped = self._replay_journal(journal, states, pressures, temps, bulks, stop)
+                if stopped:
+                    return states
+            for step in self.iter_pt_path(pressures, temps, bulks, callback=callback, stop=stop, verbose=verbose,
+                                          n_workers=n_workers, executor=executor, pool=pool, start=start):
+                if journal is not None:
+                    journal.append(step.index, step.pressure, step.temperature, step.bulk, step.rock,
+                                   step.element_list)
+                with self.instrument.stage("states.add_state"):
+                    states.add_state(step.rock, step.element_list)
+        finally:
+            if own_journal:
+                journal.close()
+        return states
+
+    @staticmethod
+    def _open_journal(resume):
+        if resume is None or isinstance(resume, PathJournal):
+            return resume, False
+        return PathJournal(resume), True
+
+    @staticmethod
+    def _replay_journal(journal, states, pressures, temps, bulks, stop):
+        """
+        Adds the journaled steps to states after checking them against the path (bulks is None for a ruled
+        path, whose bulks follow from the journal). Returns the index of the first step to compute and whether
+        stop ended the path within the journal.
+        """
+        for record in journal.records:
+            i, pressure, temperature, bulk, rock, el_lis, next_bulk = record
+            if i != len(states) or i >= len(pressures) \
+                    or (pressure, temperature) != (int(pressures[i]), int(temps[i])) \
+                    or (bulks is not None and bulk != bulks[i]):
+                raise ValueError(f"Step {i} of journal {journal.filepath} does not match the path")
             states.add_state(rock, el_lis)
+            if stop is not None and stop(PathStep(*record)):
+                return i + 1, True
+        return len(journal.records), False
+
+    def stream_pt_path(self, pressures, temps, bulks, sink, ruled=False, **kwargs):
+        """
+        Sends each state of a path to a sink instead of accumulating a States.
+        The sink is an object with an add_state(rock, element_list) method (e.g. States, VolumesCsvSink)
+        or a callable taking a PathStep. If ruled is True, bulks is a single bulk and kwargs must hold the
+        compute_ruled_pt_path command. Returns the number of computed steps.
+        """
+        steps = self.iter_ruled_pt_path(pressures, temps, bulks, **kwargs) if ruled else \
+            self.iter_pt_path(pressures, temps, bulks, **kwargs)
+        n = 0
+        try:
+            for step in steps:
+                if hasattr(sink, "add_state"):
+                    sink.add_state(step.rock, step.element_list)
+                else:
+                    sink(step)
+                n += 1
+        finally:
+            # the sink is flushed and closed (and the pool of iter_pt_path released) even if a step fails
+            steps.close()
+            if hasattr(sink, "close"):
+                sink.close()
+        return n
+
+    @staticmethod
+    def apply_command(rock, el_lis, current_bulk, command, is_fluid=False, verbose=1):
+        """Returns the bulk composition after applying a command to the solution of a rock"""
+        mineral_names = [mineral.name for mineral in rock.mineral_assemblage]
+        fluid_names = [fluid.name for fluid in rock.fluid_assemblage]
+        current_bulk_arr = np.array(rock.bulk_composition_moles)
+        if verbose:
+            print("P :", int(rock.pressure), ", T :", int(rock.temperature))
+            print("Command :", command.order, command.phase, )
+
+        # Check if an end-member of the solution exists
+        if is_fluid :
+            is_sol_stable = len([fluid for fluid in fluid_names if fluid.startswith(command.phase)]) > 0
+        else :
+            is_sol_stable = len([mineral for mineral in mineral_names if mineral.startswith(command.phase)]) > 0
+
+        if not is_sol_stable:
+            print("Phase not stable.")
+
+        elif is_sol_stable and command.order == "add_sol":
+            # Add a proportion of the solution
+            if is_fluid :
+                sol_idx = fluid_names.index(
+                    [fluid for fluid in fluid_names if fluid.startswith(command.phase)][0])
+                sol_moles = rock.fluid_assemblage[sol_idx].composition_moles
+            else :
+                sol_idx = mineral_names.index(
+                    [mineral for mineral in mineral_names if mineral.startswith(command.phase)][0])
+                sol_moles = rock.mineral_assemblage[sol_idx].composition_moles
+
+            ratio = command.percent / 100.0
+            new_bulk_arr = current_bulk_arr + [x * ratio for x in sol_moles]
+            current_bulk = bulk_from_compositionalvector(new_bulk_arr, el_lis)
             if verbose:
-                print(int(temps[i]), int(pressures[i]), ":", [mineral.name for mineral in rock.mineral_assemblage])
+                print("New bulk composition : ", current_bulk)
 
-        return states
+        elif is_sol_stable and command.order == "remove_sol":
+            if is_fluid:
+                sol_idx = fluid_names.index(
+                    [fluid for fluid in fluid_names if fluid.startswith(command.phase)][0])
+                sol_moles = rock.fluid_assemblage[sol_idx].composition_moles
+            else :
+                sol_idx = mineral_names.index(
+                    [mineral for mineral in mineral_names if mineral.startswith(command.phase)][0])
+                sol_moles = rock.mineral_assemblage[sol_idx].composition_moles
+            ratio = command.percent / 100.0
+            new_bulk_arr = current_bulk_arr - [x * ratio for x in sol_moles]
+            current_bulk = bulk_from_compositionalvector(new_bulk_arr, el_lis)
+            if verbose:
+                print("New bulk composition : ", current_bulk)
 
-    def compute_ruled_pt_path(self, pressures, temps, bulk, command, is_fluid=False, verbose=1):
+        return current_bulk
 
+    def iter_ruled_pt_path(self, pressures, temps, bulk, command, is_fluid=False, callback=None, stop=None,
+                           verbose=1, start=0):
+        """
+        Yields a PathStep for each state of a ruled P-T path, as soon as it is computed.
+        step.next_bulk is the bulk after applying the command. See iter_pt_path for callback and stop.
+        If start > 0, the path is continued from step start, bulk being the bulk of that step.
+        """
         if len(temps) != len(pressures):
             raise Exception("Temperature list and pressure list have different sizes")
-        command = parse_command(command)
+        if isinstance(command, str):
+            command = parse_command(command)
 
-        states = States()
         current_bulk = bulk
-        for i in range(len(temps)):
+        for i in range(start, len(temps)):
             rock, el_lis = self.minimisation(int(pressures[i]), int(temps[i]), current_bulk)
-            states.add_state(rock, el_lis)
-
-            # Update bulk
-            mineral_names = [mineral.name for mineral in rock.mineral_assemblage]
-            fluid_names = [fluid.name for fluid in rock.fluid_assemblage]
-            current_bulk_arr = np.array(rock.bulk_composition_moles)
-            if verbose:
-                print("P :", int(pressures[i]), ", T :", int(temps[i]))
-                print("Command :", command.order, command.phase, )
-
-            # Check if an end-member of the solution exists
-            if is_fluid :
-                is_sol_stable = len([fluid for fluid in fluid_names if fluid.startswith(command.phase)]) > 0
-            else :
-                is_sol_stable = len([mineral for mineral in mineral_names if mineral.startswith(command.phase)]) > 0
-
-            if not is_sol_stable:
-                print("Phase not stable.")
-
-            elif is_sol_stable and command.order == "add_sol":
-                # Add a proportion of the solution
-                if is_fluid :
-                    sol_idx = fluid_names.index(
-                        [fluid for fluid in fluid_names if fluid.startswith(command.phase)][0])
-                    sol_moles = rock.fluid_assemblage[sol_idx].composition_moles
-                else :
-                    sol_idx = mineral_names.index(
-                        [mineral for mineral in mineral_names if mineral.startswith(command.phase)][0])
-                    sol_moles = rock.mineral_assemblage[sol_idx].composition_moles
-
-                ratio = command.percent / 100.0
-                new_bulk_arr = current_bulk_arr + [x * ratio for x in sol_moles]
-                current_bulk = bulk_from_compositionalvector(new_bulk_arr, el_lis)
-                if verbose:
-                    print("New bulk composition : ", current_bulk)
-
-            elif is_sol_stable and command.order == "remove_sol":
-                if is_fluid:
-                    sol_idx = fluid_names.index(
-                        [fluid for fluid in fluid_names if fluid.startswith(command.phase)][0])
-                    sol_moles = rock.fluid_assemblage[sol_idx].composition_moles
-                else :
-                    sol_idx = mineral_names.index(
-                        [mineral for mineral in mineral_names if mineral.startswith(command.phase)][0])
-                    sol_moles = rock.mineral_assemblage[sol_idx].composition_moles
-                ratio = command.percent / 100.0
-                new_bulk_arr = current_bulk_arr - [x * ratio for x in sol_moles]
-                current_bulk = bulk_from_compositionalvector(new_bulk_arr, el_lis)
-                if verbose:
-                    print("New bulk composition : ", current_bulk)
+            step = PathStep(i, int(pressures[i]), int(temps[i]), current_bulk, rock, el_lis)
+            if not isinstance(rock, FailedRock):  # the bulk of a failed step is carried over unchanged
+                with self.instrument.stage("apply_command"):
+                    current_bulk = self.apply_command(rock, el_lis, current_bulk, command, is_fluid=is_fluid,
+                                                      verbose=verbose)
+            step.next_bulk = current_bulk
+            if callback is not None:
+                callback(step)
+            yield step
+            if stop is not None and stop(step):
+                break
 
+    def compute_ruled_pt_path(self, pressures, temps, bulk, command, is_fluid=False, verbose=1, callback=None,
+                              stop=None, resume=None, projection=None):
+        """
+        Computes the states along a P-T path, applying the command to the bulk after each step.
+        resume is a journal file path (or a PathJournal), see compute_pt_path; the run continues from the
+        bulk recorded after the last journaled step. projection: see compute_pt_path.
+        """
+        if isinstance(command, str):
+            command = parse_command(command)
+        states = States(projection=projection)
+        states.instrument = self.instrument
+        journal, own_journal = self._open_journal(resume)
+        try:
+            start = 0
+            if journal is not None:
+                journal.check_header({"kind": "ruled", "database": self.database, "bulk": bulk,
+                                      "command": (command.order, command.phase, command.percent),
+                                      "is_fluid": is_fluid})
+                start, stopped = self._replay_journal(journal, states, pressures, temps, None, stop)
+                if stopped:
+                    return states
+                if start:
+                    bulk = journal.records[start - 1][6]
+            for step in self.iter_ruled_pt_path(pressures, temps, bulk, command, is_fluid=is_fluid,
+                                                callback=callback, stop=stop, verbose=verbose, start=start):
+                if journal is not None:
+                    journal.append(step.index, step.pressure, step.temperature, step.bulk, step.rock,
+                                   step.element_list, step.next_bulk)
+                with self.instrument.stage("states.add_state"):
+                    states.add_state(step.rock, step.element_list)
+        finally:
+            if own_journal:
+                journal.close()
         return states
 
+    def compute_pt_grid(self, bulk, p_range, t_range, n_coarse=(4, 4), max_level=3, n_workers=None,
+                        executor="thread", verbose=0):
+        """Adaptive P-T grid of the assemblage fields of a bulk, see pseudosection.compute_pt_grid"""
+        if n_workers is not None and n_workers > 1:
+            with self.get_pool(n_workers=n_workers, executor=executor) as pool:
+                return compute_pt_grid(self, bulk, p_range, t_range, n_coarse=n_coarse, max_level=max_level,
+                                       pool=pool, verbose=verbose)
+        return compute_pt_grid(self, bulk, p_range, t_range, n_coarse=n_coarse, max_level=max_level,
+                               verbose=verbose)
+
     def find_phase_apparition_temp(self, bulk, pressure, phase, tmin=0, tmax=1200, tol=1, verbose=0):
 
         found_temp = None
@@ -135,15 +492,34 @@ class TheriakContainer:
         # Ensure we return an int
         return int(found_temp) if found_temp is not None else int(tmax)
 
+    def find_isograds(self, bulk, pressures, phases, tmin=0, tmax=1200, tol=1, k=None, with_fluids=False,
+                      n_workers=None, executor="thread", verbose=0):
+        """Phase-in temperature curves of several phases over an array of pressures, see isograds.compute_isograds"""
+        if n_workers is not None and n_workers > 1:
+            with self.get_pool(n_workers=n_workers, executor=executor) as pool:
+                return compute_isograds(self, bulk, pressures, phases, tmin=tmin, tmax=tmax, tol=tol, k=k,
+                                        with_fluids=with_fluids, pool=pool, verbose=verbose)
+        return compute_isograds(self, bulk, pressures, phases, tmin=tmin, tmax=tmax, tol=tol, k=k,
+                                with_fluids=with_fluids, verbose=verbose)
+
+    def compute_bulk_ensemble(self, bulk, pressures, temps, n_members, sigma, relative=True, distribution="normal",
+                              decimals=2, seed=None, n_workers=None, executor="thread", verbose=0):
+        """Monte Carlo propagation of the uncertainty of a bulk along a P-T path, see ensemble.compute_bulk_ensemble"""
+        kwargs = dict(relative=relative, distribution=distribution, decimals=decimals, seed=seed, verbose=verbose)
+        if n_workers is not None and n_workers > 1:
+            with self.get_pool(n_workers=n_workers, executor=executor) as pool:
+                return compute_bulk_ensemble(self, bulk, pressures, temps, n_members, sigma, pool=pool, **kwargs)
+        return compute_bulk_ensemble(self, bulk, pressures, temps, n_members, sigma, **kwargs)
+
     def get_fluid(self, bulk, pressure, temperature, fluid):
-        rock, element_list = self.theriak.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
+        rock, element_list = self.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
         fluid_names = [fluid.name for fluid in rock.fluid_assemblage]
         if fluid in fluid_names:
             index = fluid_names.index(fluid)
             return rock.fluid_assemblage[index], element_list
 
     def get_rock_volume(self, bulk, temperature, pressure, fluids_in=True):
-        rock, element_list = self.theriak.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
+        rock, element_list = self.minimisation(pressure, temperature, bulk, return_failed_minimisation=True)
         vol = 0
         for mineral in rock.mineral_assemblage:
             vol = vol + mineral.vol
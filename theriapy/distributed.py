@@ -0,0 +1,439 @@
+import argparse
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from theriapy.parallel import _new_caller
+from theriapy.retry import FailedRock, RetryPolicy
+
+AUTHKEY_ENV = "THERIAPY_AUTHKEY"
+_POLL = 0.5  # seconds between two checks of a waiting call
+_HELLO_TIMEOUT = 10.0  # seconds a connected worker has to introduce itself
+
+
+class _Job:
+    """Results of one map/imap call, filled by the connection threads"""
+
+    def __init__(self):
+        self.results = {}
+        self.error = None
+        self.cancelled = False
+        self.cond = threading.Condition()
+
+    def put(self, index, kind, payload):
+        with self.cond:
+            if kind == "result":
+                self.results[index] = payload
+            elif self.error is None:
+                self.error = RuntimeError(f"Minimisation {index} failed on a worker: {payload}")
+            self.cond.notify_all()
+
+    def take(self, index, deadline=None, stalled=None):
+        """
+        Waits for the result of index. Raises a TimeoutError past deadline (time.monotonic() value), and the
+        RuntimeError returned by stalled(), polled while waiting, once the pool cannot compute the point.
+        """
+        with self.cond:
+            while index not in self.results:
+                if self.error is not None:
+                    raise self.error
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Minimisation {index} not completed before the deadline of the call")
+                error = None if stalled is None else stalled()
+                if error is not None:
+                    raise error
+                self.cond.wait(_POLL if remaining is None else min(remaining, _POLL))
+            return self.results.pop(index)
+
+
+class DistributedPool:
+    """Dispatches minimisations to worker processes over sockets, with the interface of a MinimisationPool.
+
+    The coordinator listens on address; workers (run_worker, or "python -m theriapy.distributed worker" on
+    any node that has Theriak and the database) connect to it, each wrapping its own TherCaller. Points
+    are sent in shards of shard_size and each result is streamed back as soon as it is computed. Shards
+    in progress on a worker whose connection is lost, or that sends nothing for task_timeout seconds (it is
+    then disconnected, and restarted if it is a local worker), are sent again to the other workers. A point
+    lost with max_requeues workers fails: it raises, or gives a FailedRock if retry records failures. A call
+    raises a RuntimeError when no worker has been connected for worker_wait seconds while it waits, and a
+    TimeoutError when it lasts more than timeout seconds.
+    Messages are pickled over multiprocessing.connection, authenticated by authkey: only run workers you trust.
+
+    Attributes:
+        address : (host, port) the coordinator listens on, port is chosen by the system if 0
+        authkey : Shared secret of the coordinator and its workers, random if None
+        shard_size : Number of points sent to a worker at once
+        task_timeout : Seconds without a result after which a worker is considered wedged, None to wait forever
+        worker_wait : Seconds a call waits for a worker to (re)connect when none is connected
+        timeout : Default limit in seconds of a map or imap call, None for no limit
+        retry : RetryPolicy given to the local workers, its on_failure also applies to the lost points
+        workers : Names of the connected workers
+    """
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=None, shard_size=8, task_timeout=None, max_requeues=2,
+                 retry=None, worker_wait=60.0, timeout=None):
+        self.authkey = os.urandom(16) if authkey is None else authkey
+        self.shard_size = shard_size
+        self.task_timeout = task_timeout
+        self.max_requeues = max_requeues
+        self.retry = retry
+        self.worker_wait = worker_wait
+        self.timeout = timeout
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+        self.workers = []
+        self._tasks = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._worker_joined = threading.Condition(self._lock)
+        self._no_worker_since = time.monotonic()
+        self._threads = []
+        self._local = []  # local worker processes, see start_local_workers
+        self._local_cmd = None
+        self._local_env = None
+        self._scratch_root = None
+        self._accept_thread = threading.Thread(target=self._accept, daemon=True)
+        self._accept_thread.start()
+
+    @property
+    def n_workers(self):
+        return len(self.workers)
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                continue  # failed handshake, or woken up by close
+            try:
+                name = self._hello(conn)
+            except (OSError, EOFError, TypeError, IndexError):
+                name = None
+            if name is None or self._closed:
+                conn.close()
+                continue
+            thread = threading.Thread(target=self._serve, args=(conn, name), daemon=True)
+            self._threads.append(thread)
+            with self._lock:
+                self.workers.append(name)
+                self._worker_joined.notify_all()
+            thread.start()
+
+    def _hello(self, conn):
+        """
+        Name sent by a worker that just connected, None if it sends nothing within _HELLO_TIMEOUT seconds
+        (a client that never says hello must not block the workers connecting after it)
+        """
+        deadline = time.monotonic() + _HELLO_TIMEOUT
+        while not conn.poll(_POLL):
+            if self._closed or time.monotonic() >= deadline:
+                return None
+        return conn.recv()[1]
+
+    def _serve(self, conn, name):
+        """Sends the shards to one worker and hands its results to the jobs"""
+        try:
+            while not self._closed:
+                try:
+                    job, items, lost = self._tasks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if job.cancelled:
+                    continue
+                remaining = dict(items)
+                try:
+                    conn.send(("task", items))
+                    while remaining:
+                        if not self._poll(conn, name):
+                            # closed while the worker is busy: a local worker is killed, not waited for
+                            self._restart_local(name)
+                            return
+                        kind, index, payload = conn.recv()
+                        del remaining[index]
+                        job.put(index, kind, payload)
+                except (OSError, EOFError):  # TimeoutError is an OSError
+                    self._requeue(job, remaining, lost + 1)
+                    self._restart_local(name)
+                    return
+            conn.send(("stop",))
+        except (OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self.workers.remove(name)
+                if not self.workers:
+                    self._no_worker_since = time.monotonic()
+
+    def _poll(self, conn, name):
+        """
+        Waits for a message of the worker, raises a TimeoutError after task_timeout seconds; returns False if
+        the pool is closed meanwhile
+        """
+        start = time.monotonic()
+        while not conn.poll(_POLL):
+            if self._closed:
+                return False
+            if self.task_timeout is not None and time.monotonic() - start >= self.task_timeout:
+                raise TimeoutError(f"No result from worker {name} for {self.task_timeout} s")
+        return True
+
+    def _requeue(self, job, remaining, lost):
+        """Sends the points of a lost shard again, or fails them once max_requeues workers were lost on them"""
+        if not remaining:
+            return
+        if lost <= self.max_requeues:
+            self._tasks.put((job, list(remaining.items()), lost))
+            return
+        for index, (pressure, temperature, bulk, _) in remaining.items():
+            reason = f"lost with {lost} workers"
+            if self.retry is not None and self.retry.on_failure == "record":
+                job.put(index, "result", (FailedRock(pressure, temperature, bulk, reason, lost), []))
+            else:
+                job.put(index, "error", reason)
+
+    def _restart_local(self, name):
+        """
+        Kills the local worker process of a lost connection, if any, and starts a replacement unless the pool
+        is closed
+        """
+        host, _, pid = name.rpartition(":")
+        if host != socket.gethostname():
+            return
+        for k, process in enumerate(self._local):
+            if str(process.pid) == pid:
+                _kill_worker(process)
+                if not self._closed:
+                    self._local[k] = self._spawn_local()
+                return
+
+    def _stalled(self, since):
+        """Error of a call waiting since since (time.monotonic()) if no worker was connected for worker_wait"""
+        with self._lock:
+            if self.workers or self._closed:
+                return None
+            idle = time.monotonic() - max(since, self._no_worker_since)
+        if idle > self.worker_wait:
+            return RuntimeError(f"No worker connected to {self.address} for {self.worker_wait} s")
+        return None
+
+    def _spawn_local(self):
+        # own process group, so that a wedged worker is killed with its Theriak process
+        return subprocess.Popen(self._local_cmd, env=self._local_env, start_new_session=os.name == "posix")
+
+    def wait_for_workers(self, n=1, timeout=None):
+        """Blocks until n workers are connected, raises a TimeoutError after timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while len(self.workers) < n:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{len(self.workers)} of {n} workers connected to {self.address}")
+                self._worker_joined.wait(remaining)
+
+    def start_local_workers(self, n, programs_dir, database, theriak_version, source_dir=None, retry=None,
+                            verbose=False):
+        """
+        Starts n worker processes on this machine, connected to the pool, and waits for them. They apply retry
+        (the pool's RetryPolicy by default).
+        """
+        retry = self.retry if retry is None else retry
+        if self._scratch_root is None:
+            self._scratch_root = tempfile.mkdtemp(prefix="theriapy_dist_")
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([package_dir] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+        env[AUTHKEY_ENV] = self.authkey.hex()
+        host, port = self.address
+        cmd = [sys.executable, "-m", "theriapy.distributed", "worker", "--address", f"{host}:{port}",
+               "--programs-dir", programs_dir, "--database", database, "--theriak-version", theriak_version,
+               "--source-dir", os.getcwd() if source_dir is None else source_dir,
+               "--scratch-root", self._scratch_root]
+        if retry is not None:
+            cmd += ["--retries", str(retry.retries), "--perturbation", *(str(v) for v in retry.perturbation),
+                    "--on-failure", retry.on_failure]
+            if retry.timeout is not None:
+                cmd += ["--timeout", str(retry.timeout)]
+        if verbose:
+            cmd.append("--verbose")
+        self._local_cmd, self._local_env = cmd, env
+        target = len(self.workers) + n
+        self._local.extend(self._spawn_local() for _ in range(n))
+        self.wait_for_workers(target, timeout=60)
+
+    def _submit(self, job, pressures, temps, bulks, return_failed_minimisation, start):
+        items = [(start + k, (int(p), int(t), b, return_failed_minimisation))
+                 for k, (p, t, b) in enumerate(zip(pressures, temps, bulks))]
+        for k in range(0, len(items), self.shard_size):
+            self._tasks.put((job, items[k:k + self.shard_size], 0))
+        return len(items)
+
+    def map(self, pressures, temps, bulks, return_failed_minimisation=True, timeout=None):
+        """Returns the (rock, element_list) results in the order of the inputs."""
+        return list(self.imap(pressures, temps, bulks, return_failed_minimisation, window=len(pressures) or 1,
+                              timeout=timeout))
+
+    def imap(self, pressures, temps, bulks, return_failed_minimisation=True, window=None, timeout=None):
+        """
+        Yields the (rock, element_list) results in the order of the inputs, keeping at most window
+        (4 x shard_size x n_workers by default) points in flight. Pending shards are dropped if the iteration
+        is stopped, or if it raises because the call lasted more than timeout seconds (self.timeout by default)
+        or no worker was connected for worker_wait seconds.
+        """
+        if self._closed:
+            raise ValueError("The pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        window = 4 * self.shard_size * max(self.n_workers, 1) if window is None else window
+        window = max(window, self.shard_size)
+        job = _Job()
+        n = len(pressures)
+        submitted = 0
+        try:
+            for i in range(n):
+                while submitted < n and submitted - i < window:
+                    stop = min(n, submitted + self.shard_size)
+                    submitted += self._submit(job, pressures[submitted:stop], temps[submitted:stop],
+                                              bulks[submitted:stop], return_failed_minimisation, submitted)
+                yield job.take(i, deadline, lambda: self._stalled(start))
+        finally:
+            job.cancelled = True
+
+    def close(self):
+        """Stops the workers (they exit once their shard is done) and the coordinator"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            # wakes up the accept thread
+            socket.create_connection(self.address, timeout=1).close()
+        except OSError:
+            pass
+        self._accept_thread.join()
+        self._listener.close()
+        for thread in self._threads:
+            thread.join()
+        for process in self._local:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                _kill_worker(process)
+        if self._scratch_root is not None:
+            shutil.rmtree(self._scratch_root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _kill_worker(process):
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        process.kill()
+    process.wait()
+
+
+def run_worker(address, authkey, programs_dir, database, theriak_version, source_dir=None, scratch_root=None,
+               name=None, retry=None, verbose=False):
+    """
+    Connects to a DistributedPool at address and minimises the points it sends until it stops or the
+    connection is lost. The worker owns a TherCaller running in a scratch directory, in which the database
+    and theriak.ini files of source_dir (the current directory by default) are copied, and applies the
+    RetryPolicy retry if given.
+    """
+    own_scratch = scratch_root is None
+    scratch_root = tempfile.mkdtemp(prefix="theriapy_worker_") if own_scratch else scratch_root
+    caller = _new_caller({"programs_dir": programs_dir,
+                          "database": database,
+                          "theriak_version": theriak_version,
+                          "scratch_root": scratch_root,
+                          "source_dir": os.getcwd() if source_dir is None else source_dir,
+                          "verbose": verbose,
+                          "retry": retry})
+    name = f"{socket.gethostname()}:{os.getpid()}" if name is None else name
+    try:
+        conn = Client(address, authkey=authkey)
+    except OSError as exc:
+        shutil.rmtree(caller.scratch_dir, ignore_errors=True)
+        if own_scratch:
+            shutil.rmtree(scratch_root, ignore_errors=True)
+        print(f"Worker {name} could not connect to {address}: {exc}", file=sys.stderr)
+        return
+    try:
+        conn.send(("hello", name))
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message[0] == "stop":
+                break
+            for index, (pressure, temperature, bulk, return_failed_minimisation) in message[1]:
+                try:
+                    res = caller.minimisation(pressure, temperature, bulk,
+                                              return_failed_minimisation=return_failed_minimisation)
+                    conn.send(("result", index, res))
+                except Exception as exc:
+                    conn.send(("error", index, f"{type(exc).__name__}: {exc}"))
+                if verbose:
+                    print(name, ":", temperature, pressure, flush=True)
+    except (OSError, EOFError):
+        pass
+    finally:
+        conn.close()
+        shutil.rmtree(caller.scratch_dir, ignore_errors=True)
+        if own_scratch:
+            shutil.rmtree(scratch_root, ignore_errors=True)
+
+
+def main(argv=None):
+    """Command line of a worker node: python -m theriapy.distributed worker --address host:port ..."""
+    parser = argparse.ArgumentParser(prog="python -m theriapy.distributed")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Run a worker connected to a DistributedPool")
+    worker.add_argument("--address", required=True, help="host:port of the coordinator")
+    worker.add_argument("--authkey", default=None,
+                        help=f"hex shared secret (read from ${AUTHKEY_ENV} if not given)")
+    worker.add_argument("--programs-dir", required=True)
+    worker.add_argument("--database", required=True)
+    worker.add_argument("--theriak-version", required=True)
+    worker.add_argument("--source-dir", default=None)
+    worker.add_argument("--scratch-root", default=None)
+    worker.add_argument("--name", default=None)
+    worker.add_argument("--timeout", type=float, default=None, help="seconds before a Theriak run is killed")
+    worker.add_argument("--retries", type=int, default=0)
+    worker.add_argument("--perturbation", type=float, nargs=2, default=(0, 0), metavar=("DP", "DT"),
+                        help="P (bar) and T (°C) offsets of the retries")
+    worker.add_argument("--on-failure", choices=("raise", "record"), default="raise")
+    worker.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    authkey = args.authkey if args.authkey is not None else os.environ.get(AUTHKEY_ENV)
+    if authkey is None:
+        parser.error(f"--authkey or ${AUTHKEY_ENV} is required")
+    host, port = args.address.rsplit(":", 1)
+    retry = RetryPolicy(timeout=args.timeout, retries=args.retries, perturbation=tuple(args.perturbation),
+                        on_failure=args.on_failure)
+    run_worker((host, int(port)), bytes.fromhex(authkey), args.programs_dir, args.database, args.theriak_version,
+               source_dir=args.source_dir, scratch_root=args.scratch_root, name=args.name, retry=retry,
+               verbose=args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from theriapy.arrays import GrowableArray
+from theriapy.bulk import BulkMatrix
+
+
+def split_bulk(bulk):
+    """Elements and values of a bulk string; nan for the elements computed by Theriak ("O(?)")"""
+    matrix = BulkMatrix.from_strings([bulk])
+    return matrix.elements, np.where(matrix.free, np.nan, matrix.values[:, 0])
+
+
+def perturb_bulk(bulk, n_members, sigma, relative=True, distribution="normal", seed=None):
+    """
+    Matrix (n_members, n_elements) of perturbed bulk values, drawn at once for all the members.
+    sigma is a standard deviation for all the elements, or a dict element -> standard deviation (0 for the
+    elements not in it); it is a fraction of each value if relative is True. With distribution="uniform",
+    values are drawn in value +- sigma. Negative values are clipped to 0 and "?" elements stay nan.
+    Returns the element list and the matrix.
+    """
+    elements, values = split_bulk(bulk)
+    if isinstance(sigma, dict):
+        sd = np.array([float(sigma.get(el, 0.0)) for el in elements])
+    else:
+        sd = np.full(len(elements), float(sigma))
+    if relative:
+        sd = sd * np.nan_to_num(values)
+
+    rng = np.random.default_rng(seed)
+    if distribution == "normal":
+        noise = rng.standard_normal((n_members, len(elements))) * sd
+    elif distribution == "uniform":
+        noise = rng.uniform(-1.0, 1.0, (n_members, len(elements))) * sd
+    else:
+        raise ValueError(f"Unknown distribution '{distribution}', expected 'normal' or 'uniform'")
+    return elements, np.clip(values + noise, 0.0, None)
+
+
+class BulkEnsemble:
+    """Result of compute_bulk_ensemble.
+
+    Attributes:
+        elements : Elements of the perturbed bulk
+        members : Float array (n_members, n_elements) of the perturbed values (after rounding)
+        bulks : Distinct bulk strings that were minimised
+        member_bulk : Int array (n_members), index of each member's bulk in bulks
+        pressures, temperatures : The path
+        phases : Phase names, in order of first appearance
+        fluid_phases : Set of the phases that are fluids
+        volumes : Float array (n_bulks, n_steps, n_phases) of the phase volumes of the distinct bulks
+        stable : Bool array (n_bulks, n_steps, n_phases)
+    """
+
+    def __init__(self, elements, members, bulks, member_bulk, pressures, temperatures, phases, fluid_phases,
+                 volumes, stable):
+        self.elements = elements
+        self.members = members
+        self.bulks = bulks
+        self.member_bulk = member_bulk
+        self.pressures = pressures
+        self.temperatures = temperatures
+        self.phases = phases
+        self.fluid_phases = fluid_phases
+        self.volumes = volumes
+        self.stable = stable
+
+    @property
+    def n_members(self):
+        return len(self.member_bulk)
+
+    def _weights(self):
+        return np.bincount(self.member_bulk, minlength=len(self.bulks)).astype(float)
+
+    def member_volumes(self, normalize=False):
+        """Array (n_members, n_steps, n_phases); in % of the rock volume at each step if normalize is True"""
+        vols = self.volumes
+        if normalize:
+            total = vols.sum(axis=2, keepdims=True)
+            vols = np.divide(vols, total, out=np.zeros_like(vols), where=total > 0) * 100
+        return vols[self.member_bulk]
+
+    def mean_volumes(self, normalize=False):
+        """Array (n_steps, n_phases) of the mean volume over the members (duplicates weighted, not re-expanded)"""
+        vols = self.volumes
+        if normalize:
+            total = vols.sum(axis=2, keepdims=True)
+            vols = np.divide(vols, total, out=np.zeros_like(vols), where=total > 0) * 100
+        return np.tensordot(self._weights(), vols, axes=1) / self.n_members
+
+    def percentile_volumes(self, q, normalize=False):
+        """Array (len(q), n_steps, n_phases) (or (n_steps, n_phases) for a scalar q) of volume percentiles"""
+        return np.percentile(self.member_volumes(normalize=normalize), q, axis=0)
+
+    def presence_probability(self):
+        """Array (n_steps, n_phases), fraction of the members in which the phase is stable"""
+        return np.tensordot(self._weights(), self.stable.astype(float), axes=1) / self.n_members
+
+    def phase_summary(self, phase, percentiles=(5, 50, 95), normalize=False):
+        """DataFrame, one row per step: P, T, mean, percentiles of the volume of phase and its presence probability"""
+        k = self.phases.index(phase)
+        df = pd.DataFrame({"pressure": self.pressures, "temperature": self.temperatures,
+                           "mean": self.mean_volumes(normalize=normalize)[:, k]})
+        pct = self.percentile_volumes(percentiles, normalize=normalize)
+        for q, values in zip(percentiles, pct):
+            df[f"p{q:g}"] = values[:, k]
+        df["presence"] = self.presence_probability()[:, k]
+        return df
+
+    def summary(self, percentiles=(5, 50, 95), normalize=False):
+        """Dict of DataFrames (n_steps x phases): "mean", "p<q>" for each percentile and "presence" """
+        res = {"mean": pd.DataFrame(self.mean_volumes(normalize=normalize), columns=self.phases)}
+        for q, values in zip(percentiles, self.percentile_volumes(percentiles, normalize=normalize)):
+            res[f"p{q:g}"] = pd.DataFrame(values, columns=self.phases)
+        res["presence"] = pd.DataFrame(self.presence_probability(), columns=self.phases)
+        return res
+
+
+def compute_bulk_ensemble(ther, bulk, pressures, temps, n_members, sigma, relative=True, distribution="normal",
+                          decimals=2, seed=None, pool=None, verbose=0):
+    """
+    Propagates the uncertainty of a bulk along a P-T path: n_members perturbed bulks are drawn (see perturb_bulk),
+    rounded to decimals so that near-identical members share a single computation, and the distinct bulks are
+    minimised at every step (through pool if given, and through the cache of ther).
+    """
+    elements, members = perturb_bulk(bulk, n_members, sigma, relative=relative, distribution=distribution,
+                                     seed=seed)
+    members = np.round(members, decimals)
+    unique, member_bulk = np.unique(np.nan_to_num(members, nan=-1.0), axis=0, return_inverse=True)
+    unique[unique == -1.0] = np.nan
+    bulks = BulkMatrix(np.nan_to_num(unique.T), elements, free=np.isnan(unique[0])).to_strings(f"%.{decimals}f")
+    if verbose:
+        print(len(bulks), "distinct bulks for", n_members, "members")
+
+    n_steps = len(pressures)
+    ps = [int(p) for p in pressures] * len(bulks)
+    ts = [int(t) for t in temps] * len(bulks)
+    all_bulks = [b for b in bulks for _ in range(n_steps)]
+
+    phases = []
+    phase_index = {}
+    fluid_phases = set()
+    vols = GrowableArray(capacity=len(ps))
+    stable = GrowableArray(dtype=bool, fill_value=False, capacity=len(ps))
+    for rock, el_lis in ther.iter_minimisations(ps, ts, all_bulks, pool=pool):
+        row = vols.append_row()
+        stable.append_row()
+        for phase_list, is_fluid in ((rock.mineral_assemblage, False), (rock.fluid_assemblage, True)):
+            for phase in phase_list:
+                col = phase_index.get(phase.name)
+                if col is None:
+                    col = phase_index[phase.name] = len(phases)
+                    phases.append(phase.name)
+                    vols.add_columns()
+                    stable.add_columns()
+                    if is_fluid:
+                        fluid_phases.add(phase.name)
+                vols.data[row, col] = phase.vol
+                stable.data[row, col] = True
+
+    shape = (len(bulks), n_steps, len(phases))
+    return BulkEnsemble(elements, members, bulks, member_bulk.ravel(), np.asarray(pressures), np.asarray(temps),
+                        phases, fluid_phases, vols.values.reshape(shape), stable.values.reshape(shape))
@@ -0,0 +1,211 @@
+import functools
+import json
+import threading
+import time
+
+
+class _Stage:
+    __slots__ = ("instrument", "name", "args", "start")
+
+    def __init__(self, instrument, name, args):
+        self.instrument = instrument
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.instrument.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullInstrumentation:
+    """Disabled instrumentation: stage() returns a shared no-op context manager and count() does nothing."""
+    enabled = False
+
+    def stage(self, name, **args):
+        return _NULL_STAGE
+
+    def count(self, name, n=1):
+        pass
+
+    def summary(self):
+        return {"stages": {}, "counters": {}}
+
+    def close(self):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class Instrumentation:
+    """Per-stage timers and counters of a run, forwarded to sinks.
+
+    Stages are timed with "with instrument.stage(name): ...", counters are incremented with
+    instrument.count(name). The totals are always aggregated in memory (summary(), report());
+    each sink additionally receives every stage and counter event. A sink is an object with
+    on_stage(name, start_ns, duration_ns, thread_id, args), on_count(name, value, ts_ns) and close().
+
+    Attributes:
+        stages : Dict stage name -> [count, total_ns, min_ns, max_ns]
+        counters : Dict counter name -> value
+        t0 : perf_counter_ns() at creation, the origin of the event timestamps
+    """
+    enabled = True
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.stages = {}
+        self.counters = {}
+        self.t0 = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def stage(self, name, **args):
+        return _Stage(self, name, args)
+
+    def record(self, name, start_ns, duration_ns, args=None):
+        with self._lock:
+            st = self.stages.get(name)
+            if st is None:
+                self.stages[name] = [1, duration_ns, duration_ns, duration_ns]
+            else:
+                st[0] += 1
+                st[1] += duration_ns
+                if duration_ns < st[2]:
+                    st[2] = duration_ns
+                if duration_ns > st[3]:
+                    st[3] = duration_ns
+            if self.sinks:
+                tid = threading.get_ident()
+                for sink in self.sinks:
+                    sink.on_stage(name, start_ns - self.t0, duration_ns, tid, args or {})
+
+    def count(self, name, n=1):
+        with self._lock:
+            value = self.counters.get(name, 0) + n
+            self.counters[name] = value
+            if self.sinks:
+                ts = time.perf_counter_ns() - self.t0
+                for sink in self.sinks:
+                    sink.on_count(name, value, ts)
+
+    def summary(self):
+        """Dict with the stage statistics (seconds) and the counters"""
+        stages = {name: {"count": c, "total": total / 1e9, "mean": total / c / 1e9, "min": lo / 1e9, "max": hi / 1e9}
+                  for name, (c, total, lo, hi) in self.stages.items()}
+        return {"stages": stages, "counters": dict(self.counters)}
+
+    def report(self):
+        """Summary as a text table, stages sorted by total time"""
+        summary = self.summary()
+        lines = [f"{'stage':<28}{'count':>9}{'total [s]':>12}{'mean [ms]':>12}{'max [ms]':>12}"]
+        for name, st in sorted(summary["stages"].items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"{name:<28}{st['count']:>9}{st['total']:>12.4f}{1000 * st['mean']:>12.3f}"
+                         f"{1000 * st['max']:>12.3f}")
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"{name:<28}{value:>9}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class EventListSink:
+    """Keeps the events in memory, as (kind, name, ts_ns, duration_ns or value, thread_id, args) tuples"""
+
+    def __init__(self):
+        self.events = []
+
+    def on_stage(self, name, start_ns, duration_ns, thread_id, args):
+        self.events.append(("stage", name, start_ns, duration_ns, thread_id, args))
+
+    def on_count(self, name, value, ts_ns):
+        self.events.append(("count", name, ts_ns, value, None, {}))
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Writes one JSON object per event to a file (times in seconds from the start of the instrumentation)"""
+
+    def __init__(self, filepath):
+        self.file = open(filepath, "w")
+
+    def on_stage(self, name, start_ns, duration_ns, thread_id, args):
+        rec = {"stage": name, "start": start_ns / 1e9, "duration": duration_ns / 1e9, "thread": thread_id}
+        if args:
+            rec["args"] = args
+        self.file.write(json.dumps(rec, default=str) + "\n")
+
+    def on_count(self, name, value, ts_ns):
+        self.file.write(json.dumps({"counter": name, "value": value, "time": ts_ns / 1e9}) + "\n")
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class ChromeTraceSink:
+    """Collects the events in the Chrome trace format, written on close (open with chrome://tracing or Perfetto)"""
+
+    def __init__(self, filepath, process_name="theriapy"):
+        self.filepath = filepath
+        self.events = [{"name": "process_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": process_name}}]
+
+    def on_stage(self, name, start_ns, duration_ns, thread_id, args):
+        event = {"name": name, "ph": "X", "ts": start_ns / 1000, "dur": duration_ns / 1000, "pid": 0,
+                 "tid": thread_id}
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        self.events.append(event)
+
+    def on_count(self, name, value, ts_ns):
+        self.events.append({"name": name, "ph": "C", "ts": ts_ns / 1000, "pid": 0, "args": {name: value}})
+
+    def close(self):
+        with open(self.filepath, "w") as file:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, file)
+
+
+def timed_method(stage):
+    """Decorator timing a method as a stage of self.instrument"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.instrument.stage(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+import numpy as np
+from theriapy.pseudosection import assemblage_of
+
+
+class Isograds:
+    """Result of compute_isograds.
+
+    Attributes:
+        pressures : The pressures
+        phases : The tracked phases
+        temperatures : Dict phase -> float array of the phase-in temperature at each pressure
+        (lowest probed temperature at which the phase is stable, nan if it is not found below tmax)
+        probes : List (one per pressure) of dicts temperature -> assemblage, for every probe minimisation
+        n_minimisations : Number of minimisations run
+    """
+
+    def __init__(self, pressures, phases, temperatures, probes):
+        self.pressures = pressures
+        self.phases = phases
+        self.temperatures = temperatures
+        self.probes = probes
+        self.n_minimisations = sum(len(pr) for pr in probes)
+
+    def as_array(self):
+        """Array (n_phases, n_pressures) of the phase-in temperatures"""
+        return np.array([self.temperatures[ph] for ph in self.phases])
+
+
+def _k_section(lo, hi, k):
+    temps = np.linspace(lo, hi, k + 2)[1:-1]
+    return sorted(set(int(round(t)) for t in temps if lo < int(round(t)) < hi))
+
+
+def compute_isograds(ther, bulk, pressures, phases, tmin=0, tmax=1200, tol=1, k=None, seed_width=25,
+                     with_fluids=False, pool=None, verbose=0):
+    """
+    Finds the phase-in temperatures of several phases at several pressures.
+    Each probe minimisation updates the bracket of every phase at that pressure. The brackets at a pressure
+    are seeded around the results of the previous pressure, and each round evaluates k probes per bracket
+    (k-section), concurrently if a MinimisationPool is given.
+    As in find_phase_apparition_temp, the phases are assumed to be absent at tmin and stable at tmax.
+    """
+    if isinstance(phases, str):
+        phases = [phases]
+    if k is None:
+        k = pool.n_workers if pool is not None else 1
+    pressures = np.asarray(pressures)
+    temperatures = {ph: np.full(len(pressures), np.nan) for ph in phases}
+    all_probes = []
+    previous = None
+
+    for ip, pressure in enumerate(pressures):
+        probes = {}
+        lo = {ph: tmin for ph in phases}
+        hi = {ph: tmax for ph in phases}
+        found = {ph: False for ph in phases}
+
+        def run(temps):
+            temps = [t for t in dict.fromkeys(temps) if t not in probes]
+            if pool is not None:
+                results = ther.pool_minimisation(pool, [pressure] * len(temps), temps, [bulk] * len(temps))
+            else:
+                results = [ther.minimisation(pressure, t, bulk) for t in temps]
+            for t, (rock, el_lis) in zip(temps, results):
+                if with_fluids:
+                    probes[t] = assemblage_of(rock)
+                else:
+                    probes[t] = tuple(sorted(mineral.name for mineral in rock.mineral_assemblage))
+                for ph in phases:
+                    if ph in probes[t]:
+                        if t <= hi[ph]:
+                            hi[ph] = t
+                            found[ph] = True
+                    elif lo[ph] < t < hi[ph]:
+                        lo[ph] = t
+
+        # Seed the brackets from the neighbouring pressure
+        if previous is not None:
+            seeds = []
+            for ph in phases:
+                if not np.isnan(previous[ph]):
+                    seeds += [max(tmin, int(previous[ph]) - seed_width), min(tmax, int(previous[ph]) + seed_width)]
+            if seeds:
+                run(seeds)
+
+        while True:
+            open_phases = [ph for ph in phases if hi[ph] - lo[ph] > tol]
+            if not open_phases:
+                break
+            temps = []
+            for ph in open_phases:
+                temps += _k_section(lo[ph], hi[ph], k)
+            temps = [t for t in dict.fromkeys(temps) if t not in probes]
+            if not temps:
+                break
+            if verbose:
+                print("P =", int(pressure), ": probing", temps)
+            run(temps)
+
+        for ph in phases:
+            if found[ph]:
+                temperatures[ph][ip] = hi[ph]
+        previous = {ph: temperatures[ph][ip] for ph in phases}
+        all_probes.append(probes)
+        if verbose:
+            print("P =", int(pressure), ":", {ph: temperatures[ph][ip] for ph in phases})
+
+    return Isograds(pressures, phases, temperatures, all_probes)
@@ -0,0 +1,76 @@
+import os
+import pickle
+
+
+class PathJournal:
+    """Append-only journal of the steps of a computed path, used to resume an interrupted run.
+
+    The file holds a header (the kind of path and its parameters) followed by one pickled record
+    per step: (index, pressure, temperature, bulk, rock, element_list, next_bulk). Each record is
+    flushed (and fsync'ed if fsync is True) as soon as the step is computed, so an interrupted run
+    loses at most the step in progress. A truncated last record is dropped when the journal is read.
+    """
+
+    def __init__(self, filepath, fsync=True):
+        self.filepath = filepath
+        self.fsync = fsync
+        self.header = None
+        self.records = []
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.filepath):
+            return
+        good_end = 0
+        with open(self.filepath, "rb") as file:
+            try:
+                self.header = pickle.load(file)
+                good_end = file.tell()
+                while True:
+                    self.records.append(pickle.load(file))
+                    good_end = file.tell()
+            except EOFError:
+                pass
+            except (pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                pass  # record cut by the interruption
+        if good_end == 0:
+            self.header = None
+        if good_end < os.path.getsize(self.filepath):
+            with open(self.filepath, "r+b") as file:
+                file.truncate(good_end)
+
+    def check_header(self, header):
+        """Writes the header of a new journal, or raises a ValueError if the journal belongs to another path"""
+        if self.header is None:
+            self.header = header
+            self._write(header)
+        elif self.header != header:
+            raise ValueError(f"Journal {self.filepath} was written for {self.header}, not {header}")
+
+    def append(self, index, pressure, temperature, bulk, rock, element_list, next_bulk=None):
+        record = (index, pressure, temperature, bulk, rock, element_list, next_bulk)
+        self.records.append(record)
+        self._write(record)
+
+    def _write(self, obj):
+        if self._file is None:
+            self._file = open(self.filepath, "ab")
+        pickle.dump(obj, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def __len__(self):
+        return len(self.records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
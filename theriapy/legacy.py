@@ -7,6 +7,7 @@ from queue import Queue, Empty
 from threading import Thread
 
 from theriapy.regex import list_numbers_in_line, names_in_line, elts_in_header, RegExFinder
+from theriapy.out_parser import parse_out_file
 
 
 class bcolors:
@@ -23,16 +24,20 @@ class bcolors:
 
 
 def enqueue_output(out, queue):
-    for line in iter(out.readline, b''):
+    # The pipe is opened in text mode: readline returns '' at EOF
+    for line in iter(out.readline, ''):
         queue.put(line)
     out.close()
+    queue.put(None)  # EOF marker
 
 
 def get_output(out_queue):
     out_str = ''
     try:
         while True:  # Adds show_output from the Queue until it is empty
-            out_str += out_queue.get_nowait()
+            line = out_queue.get_nowait()
+            if line is not None:
+                out_str += line
     except Empty:
         return out_str
 
@@ -46,12 +51,20 @@ class Theriapy:
         db : The database used for calculations
         verbose : A boolean; if True, more details of the process are printed
         show_output : A boolean; if True, the output of the theriak.exe subprocess is printed
-        execution_time : A float, the time-span waited before looking for the result of the calculation, in econds. Can be increased if calculations are tie-consuming
+        execution_time : Deprecated, kept for compatibility. Completion is now detected from the process output.
+        timeout : A float, the maximum time-span in seconds for a Theriak run before the process is killed
+        retries : Number of times a Theriak run that timed out or exited before completing is started again
+
+    timeout and retries are the counterparts of RetryPolicy.timeout and RetryPolicy.retries for this THERIN
+    driver, which does not take a RetryPolicy: the same point is always started again (no perturbation) and a
+    run that still fails raises an Exception (no recorded failures). A RetryPolicy given to a TheriakContainer
+    or a pool does not apply to Theriapy, and the other way around.
     """
 
-    def __init__(self, therdom_dir, working_dir, db="JUN92d.bs", verbose=False, show_output=False, execution_time=0.2):
+    def __init__(self, therdom_dir, working_dir, db="JUN92d.bs", verbose=False, show_output=False, execution_time=0.2,
+                 timeout=60.0, retries=0):
         os.environ['PATH'] = ''.join(
-            [str(therdom_dir), ";", os.getenv('PATH'), ";", str(working_dir)
+            [str(therdom_dir), os.pathsep, os.getenv('PATH'), os.pathsep, str(working_dir)
              ])
         self.verbose = verbose
         self.show_output = show_output
@@ -59,6 +72,8 @@ class Theriapy:
         self.working_dir = working_dir
         self.db = db
         self.execution_time = execution_time
+        self.timeout = timeout
+        self.retries = retries
         now = datetime.now()
         self.start_time = now.strftime("%Y_%m_%d_%H_%M_%S")
         self.save_dir = os.path.join(self.working_dir, self.start_time)
@@ -101,11 +116,12 @@ class Theriapy:
             msg = "Could not opent the file " + therin_path + "."
             print(msg)
 
-    def compute_step(self, comp, temperature, pressure, ignore_stepping=False):
+    def compute_step(self, comp, temperature, pressure, ignore_stepping=False, tables=False):
+        """Computes one point. If tables is True, OUT is read by the fast parser and an OutTables is returned."""
         self.set_therin(comp, temperature, pressure, ignore_stepping)
         self.reset_output_buffer()
         self.run_subprocess()
-        parsed = self.parse_out()
+        parsed = self.parse_out_tables() if tables else self.parse_out()
         if not ignore_stepping :
             shutil.copyfile(os.path.join(self.working_dir, 'OUT'),
                             os.path.join(self.save_dir, 'OUT_' + 'step' + '_' + str(self.step)))
@@ -128,7 +144,63 @@ class Theriapy:
     def reset_output_buffer(self):
         self.output_buffer = []
 
-    def run_subprocess(self):
+    def wait_output(self, markers, timeout):
+        """
+        Collects the process output until one of the markers is read, the output is closed (process exit)
+        or the timeout is reached. Returns the marker found, 'exit' or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        out_str = ''
+        found = None
+        while found is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                line = self.out_queue.get(timeout=remaining)
+            except Empty:
+                break
+            if line is None:
+                found = 'exit'
+            else:
+                out_str += line
+                found = next((m for m in markers if m in line), None)
+        self.output_buffer.append(out_str + get_output(self.out_queue))
+        return found
+
+    def run_subprocess(self, calculation='no'):
+        """
+        Runs Theriak on THERIN. A run that hangs beyond timeout (killed) or exits without completing is
+        started again, up to retries times, as RetryPolicy(timeout, retries) does for TherCaller runs.
+        """
+        for attempt in range(self.retries + 1):
+            found = self._start_theriak(calculation)
+            if found not in (None, 'exit') or attempt == self.retries:
+                break
+            if found is None:
+                self.p.kill()
+            print("Theriak run " + str(attempt + 1) + " did not complete, restarting it.")
+
+        if found == 'iostat':
+            self.p.kill()
+            self.print_output(output_color=bcolors.FAIL)
+            raise Exception('Theriak execution did not close as expected.'
+                            ' Check database name and database content.')
+        if found is None:
+            self.p.kill()
+            self.print_output(output_color=bcolors.FAIL)
+            raise Exception('Theriak did not complete within ' + str(self.timeout) + ' s'
+                            + (' (' + str(self.retries + 1) + ' attempts).' if self.retries else '.'))
+
+        # Close process
+        try:
+            self.p.wait(timeout=min(self.timeout, 5))
+        except subprocess.TimeoutExpired:
+            self.p.kill()
+
+    def _start_theriak(self, calculation):
+        """Starts Theriak, answers its questions and waits for it; returns the marker found, see wait_output"""
+        self.reset_output_buffer()
         self.p = subprocess.Popen(['theriak'], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                                   shell=False, universal_newlines=True, cwd=self.working_dir)
 
@@ -137,63 +209,62 @@ class Theriapy:
         out_thread.daemon = True
         out_thread.start()
 
-        # Db select
-        self.read_output()
-        if self.show_output:
-            self.print_output()
-        self.write(self.db)
-        time.sleep(self.execution_time)
-        self.read_output()
-        if 'iostat' in self.output_buffer[-1]:
-            self.print_output(output_color=bcolors.FAIL)
-            raise Exception('Theriak execution did not close as expected.'
-                            ' Check database name and database content.')
-
-        # Type of calculation
-        if self.show_output:
-            self.print_output()
-        self.write('no')
-        time.sleep(self.execution_time)
+        # Db select, then type of calculation. Theriak reads its answers line by line from stdin,
+        # closing stdin makes it exit if it asks for more.
+        try:
+            self.write(self.db)
+            self.write(calculation)
+            self.p.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
 
-        self.read_output()
+        found = self.wait_output(('iostat', 'CPU time'), self.timeout)
         if self.show_output:
             self.print_output()
-
-        # Close process
-        self.p.kill()
+        return found
 
     def jump_lines(self, file, step):
         for i in range(step):
             file.readline()
 
-    def parse_out(self):
+    def parse_file(self, file):
+        """Parses the volumes, H2O content and compositions found in a file-like object; returns them with the last line"""
         data_vol_d = []
         data_h2o_compo = []
         data_compo = []
+        prev_line = ''
 
-        out_path = os.path.join(self.working_dir, "OUT")
-        try:
-            with open(out_path, 'r') as file:
-                line = file.readline()
+        line = file.readline()
+        while line:
+            reg_match = RegExFinder(line)
+            if reg_match.volumes_densities:
+                data_vol_d = self.parse_vol_d(file)
 
-                while line:
-                    reg_match = RegExFinder(line)
-                    if reg_match.volumes_densities:
-                        data_vol_d = self.parse_vol_d(file)
+            if reg_match.h2o_content:
+                data_h2o_compo = self.parse_h2o_phases(file)
 
-                    if reg_match.h2o_content:
-                        data_h2o_compo = self.parse_h2o_phases(file)
+            if reg_match.elements_in_phases:
+                data_compo = self.parse_compo(file)
 
-                    if reg_match.elements_in_phases:
-                        data_compo = self.parse_compo(file)
+            prev_line = line
+            line = file.readline()
 
-                    prev_line = line
-                    line = file.readline()
+        return (data_vol_d, data_h2o_compo, data_compo), prev_line
+
+    def parse_out(self):
+        data_vol_d = []
+        data_h2o_compo = []
+        data_compo = []
+
+        out_path = os.path.join(self.working_dir, "OUT")
+        try:
+            with open(out_path, 'r') as file:
+                (data_vol_d, data_h2o_compo, data_compo), prev_line = self.parse_file(file)
 
                 if prev_line and not 'CPU time' in prev_line:
                     self.print_output(output_color=bcolors.FAIL)
                     raise Exception(
-                        'Output not correctly parsed. Check the output for errors or increase the execution time.')
+                        'Output not correctly parsed. Check the output for errors or increase the timeout.')
 
         except IOError:
             msg = "Could not open the file " + out_path + "."
@@ -201,6 +272,15 @@ class Theriapy:
 
         return data_vol_d, data_h2o_compo, data_compo
 
+    def parse_out_tables(self):
+        """Parses OUT with the single-pass parser (out_parser), returns an OutTables"""
+        out_path = os.path.join(self.working_dir, "OUT")
+        tables = parse_out_file(out_path)
+        if not tables.complete:
+            self.print_output(output_color=bcolors.FAIL)
+            raise Exception('Output not correctly parsed. Check the output for errors or increase the timeout.')
+        return tables
+
     def parse_vol_d(self, file):
 
         data_vol_d = [["Phase", "N", "Volume/mol", "volume[ccm]", "vol%",
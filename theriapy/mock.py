@@ -0,0 +1,280 @@
+"""
+Deterministic stand-in for Theriak-Domino, to measure TheriaPy's own overhead without a Theriak install.
+
+The synthetic OUT follows the layout read by pytheriak and by legacy.Theriapy. Assemblages depend on P and T
+through fixed stability windows (PHASE_CATALOGUE), phase compositions are mass-balanced against the bulk.
+"""
+import os
+import re
+import stat
+import subprocess
+import sys
+import time
+import zlib
+from theriapy.retry import TimedTherCaller
+
+# name, is_fluid, end-members (None for pure phases), T-in at 0 bar, T-out at 0 bar, dT/dP (°C per kbar)
+PHASE_CATALOGUE = [
+    ("quartz", False, None, -1e9, 1e9, 0),
+    ("BIO_ann2", False, ["ann2", "obi", "east"], -1e9, 760, 15),
+    ("PHNG_mu", False, ["mu", "pa"], -1e9, 700, 20),
+    ("FSP_abh", False, ["abh", "anc1"], 450, 1e9, -5),
+    ("GARNET_alm", False, ["alm", "py", "gr"], 560, 1e9, -10),
+    ("CHLR_daph", False, ["daph", "clin"], -1e9, 580, 10),
+    ("OPX_fs", False, ["fm", "fs"], 780, 1e9, 12),
+    ("rutile", False, None, 650, 1e9, -20),
+    ("water.fluid", True, None, -1e9, 690, 10),
+    ("LIQtc_h2oL", True, ["h2oL", "qL", "abL"], 690, 1e9, 10),
+]
+
+
+def _unit(*args):
+    """Deterministic pseudo-random number in [0, 1)"""
+    return (zlib.crc32("|".join(map(str, args)).encode()) % 10000) / 10000.0
+
+
+def _num(x):
+    return f"{x:12.6f}"
+
+
+def synthetic_assemblage(pressure, temperature, bulk, catalogue=None):
+    """
+    Returns the element names, the bulk moles and the stable phases (dicts with name, fluid, members,
+    n, vol and comp) of a synthetic minimisation.
+    """
+    catalogue = PHASE_CATALOGUE if catalogue is None else catalogue
+    parsed = [(el, float(v)) for el, v in re.findall(r'([A-Z]+)\(([-+]?[\d.]+(?:[eE][-+]?\d+)?|\?)\)', bulk)
+              if v != '?']
+    names = [el for el, v in parsed]
+    moles = [v for el, v in parsed]
+    if "O" not in names:
+        names.append("O")
+        moles.append(1.5 * sum(moles))
+
+    kbar = pressure / 1000.0
+    stable = [c for c in catalogue if c[3] + c[5] * kbar <= temperature < c[4] + c[5] * kbar]
+    fractions = []
+    for c in stable:
+        t_in = c[3] + c[5] * kbar
+        t_out = c[4] + c[5] * kbar
+        w = 1.0 + _unit(c[0])
+        if t_in > -1e8:
+            w *= min(1.0, (temperature - t_in + 5) / 60.0)
+        if t_out < 1e8:
+            w *= min(1.0, (t_out - temperature + 5) / 60.0)
+        fractions.append(max(w, 0.02))
+
+    affinity = [[0.2 + _unit(c[0], el) for el in names] for c in stable]
+    weights = [sum(affinity[k][j] * fractions[k] for k in range(len(stable))) for j in range(len(names))]
+    phases = []
+    for i, c in enumerate(stable):
+        comp = [moles[j] * affinity[i][j] * fractions[i] / weights[j] for j in range(len(names))]
+        vol = sum(comp) * (0.9 + 0.3 * _unit(c[0], "v")) * (1 + 0.0001 * (temperature - 500)) * \
+            (1 - 0.00001 * pressure)
+        if c[1]:
+            vol *= 1.5
+        phases.append({"name": c[0], "fluid": c[1], "members": c[2], "n": sum(comp) / 10.0, "vol": vol,
+                       "comp": comp})
+    return names, moles, phases
+
+
+def render_out(pressure, temperature, bulk, database="mockdb", catalogue=None, end_marker=True, failed=False):
+    """Synthetic Theriak OUT of a minimisation, flagged as failed (activity test) if failed is True"""
+    names, moles, phases = synthetic_assemblage(pressure, temperature, bulk, catalogue)
+    solids = [p for p in phases if not p["fluid"]]
+    fluids = [p for p in phases if p["fluid"]]
+    stable = solids + fluids
+    total = sum(moles)
+
+    lines = [" THERIAK (TheriaPy mock)", f" database: {database}", f" P = {pressure} bar  T = {temperature} C", "",
+             " composition:        N           N             mol%", " ----------------", ""]
+    for i, (el, m) in enumerate(zip(names, moles)):
+        lines.append(f" {el:<6}{i + 1:>4}  {m:.6f}  {m:.6E}  {100 * m / total:.6f}")
+    lines += [f" E     {len(names) + 1:>4}  0.000000  0.000000E+00  0.000000", "", " ------------------",
+              " considered phases:", " ------------------", "",
+              " equilibrium assemblage:"]
+    lines += [" ---"] * 6
+    lines += [f" G(System) at P and T: {-1000.0 * total - 10.0 * temperature - 0.01 * pressure:.4f}", "",
+              "         phase                   N         mol%                                   x              x"
+              "         activity       act.(x)"]
+    n_total = sum(p["n"] for p in phases) or 1.0
+    for k, p in enumerate(phases, start=1):
+        if p["members"]:
+            xs = [0.2 + _unit(p["name"], m) for m in p["members"]]
+            xs = [x / sum(xs) for x in xs]
+            for j, (m, x) in enumerate(zip(p["members"], xs)):
+                prefix = f"   0  {k}  {p['name']}  {p['n']:.6f}  {100 * p['n'] / n_total:.4f}  " if j == 0 \
+                    else " " * 40
+                lines.append(f"{prefix}{m}  {x:.6f}  {x:.6f}  {0.9 * x:.6f}  {0.9 * x:.6f}  ")
+        else:
+            lines.append(f"   {k}  {p['name']}  {p['n']:.6f}  {100 * p['n'] / n_total:.4f}")
+    if failed:
+        lines += ["", " ** activity test: " + " ".join(p["name"] for p in phases if p["members"])]
+
+    solid_vol = sum(p["vol"] for p in solids) or 1.0
+    solid_wt = 2.7 * solid_vol
+    lines += ["", " -----------------------------------------", " volumes and densities of stable phases:",
+              " ---------------------------------------", "",
+              "  solid phases             N       volume/mol  volume[ccm]    vol%       wt/mol       wt [g]"
+              "       wt %     density [g/ccm]", ""]
+    for p in solids:
+        lines.append(f"  {p['name']:<20}{_num(p['n'])}{_num(p['vol'] / p['n'])}{_num(p['vol'])}"
+                     f"{_num(100 * p['vol'] / solid_vol)}{_num(2.7 * p['vol'] / p['n'])}{_num(2.7 * p['vol'])}"
+                     f"{_num(100 * 2.7 * p['vol'] / solid_wt)}{_num(2.7)} ")
+    lines += ["  ----------", f"  total of solids     {_num(solid_vol)}{_num(100.0)}{_num(solid_wt)}{_num(100.0)}"
+                                f"{_num(2.7)} ", "", ""]
+    if fluids:
+        lines += ["  gases and fluids       N       volume/mol  volume[ccm]               wt/mol       wt [g]"
+                  "              density [g/ccm]", "  ----------"]
+        for p in fluids:
+            lines.append(f"  {p['name']:<20}{_num(p['n'])}{_num(p['vol'] / p['n'])}{_num(p['vol'])}"
+                         f"{_num(1.1 * p['vol'] / p['n'])}{_num(1.1 * p['vol'])}{_num(1.1)} ")
+    else:
+        lines += ["", ""]
+    lines += ["", " ----------------------------------------------", "", " H2O content of stable phases:",
+              " -----------------------------", "",
+              "  solid phases             N        H2O[pfu]     H2O[mol]     H2O [g]  wt% of fluid  wt% of solids"
+              "  wt% H2O.solid"]
+    h_idx = names.index("H") if "H" in names else None
+    h_solids = 0.0
+    for p in solids:
+        h = p["comp"][h_idx] / 2 if h_idx is not None else 0.0
+        h_solids += h
+        lines.append(f"  {p['name']:<20}{_num(p['n'])}{_num(h / p['n'])}{_num(h)}{_num(18.015 * h)}{_num(0.0)}"
+                     f"{_num(1.0)}{_num(1.0)} ")
+    lines += ["  --------", f"  total {_num(h_solids)}{_num(18.015 * h_solids)}{_num(1.0)} ", "",
+              "  gases and fluids", "  --------", ""]
+    for p in fluids:
+        h = p["comp"][h_idx] / 2 if h_idx is not None else 0.0
+        lines.append(f"  {p['name']:<20}{_num(p['n'])}{_num(h / p['n'])}{_num(h)}{_num(18.015 * h)}{_num(50.0)} ")
+
+    elements_header = "              " + "".join(f"{el:>8}    " for el in names) + "       E    "
+    lines += ["", " compositions of stable phases [ mol% ]:", " ----------------------------------------", "",
+              " elements in stable phases:", " --------------------------", "", elements_header]
+    for p in stable:
+        lines.append(f" {p['name']:<12}" + "".join(_num(x) for x in p["comp"]) + _num(0.0) + " ")
+    lines += [" total:      " + "".join(_num(x) for x in moles) + _num(0.0) + " ", "",
+              " elements per formula unit:", " --------------------------", "", elements_header]
+    for p in stable:
+        lines.append(f" {p['name']:<12}" + "".join(_num(x / p['n']) for x in p["comp"]) + _num(0.0) + " ")
+    lines += ["", " --------------------------", "", " activities of all phases:", " -------------------------", "",
+              "  phase", ""]
+    for p in stable:
+        lines.append(f" S  1  {p['name']}  0.00000E+00  0.00000E+00  1.0")
+    lines.append("-" * 68)
+    stable_names = {p["name"] for p in stable}
+    for c in (PHASE_CATALOGUE if catalogue is None else catalogue):
+        if c[0] not in stable_names:
+            lines.append(f" P  1  {c[0]}  0.00000E+00  {1000 * _unit(c[0], temperature, pressure):.5E}  0.5")
+    lines += ["", " ------------", "", " chemical potentials of components:", " ----------------------------------",
+              ""]
+    if end_marker:
+        lines += [" exit THERIAK", " CPU time:  0.01 s"]
+    return "\n".join(lines) + "\n"
+
+
+class MockTherCaller(TimedTherCaller):
+    """In-process stand-in for pytheriak.wrapper.TherCaller, returning synthetic rocks.
+
+    Attributes:
+        latency : Time in seconds slept by each call, to emulate the Theriak run time
+        catalogue : The phase catalogue, PHASE_CATALOGUE by default
+        hang : Set of the (P, T) points at which the call hangs (subprocess.TimeoutExpired after timeout)
+        crash : Set of the (P, T) points at which the call returns an empty output
+        failed : Set of the (P, T) points at which the minimisation fails (activity test in the output)
+        n_calls : Number of minimisations run
+    """
+
+    def __init__(self, programs_dir=".", database="mockdb", theriak_version="mock", latency=0.0, catalogue=None,
+                 verbose=False, hang=(), crash=(), failed=()):
+        super().__init__(programs_dir=programs_dir, database=database, theriak_version=theriak_version,
+                         verbose=verbose)
+        self.latency = latency
+        self.catalogue = catalogue
+        self.hang = set(hang)
+        self.crash = set(crash)
+        self.failed = set(failed)
+        self.n_calls = 0
+
+    def call_theriak(self, pressure, temperature, bulk):
+        self.pressure = pressure
+        self.temperature = temperature
+        self.therin_PT = "    " + str(temperature) + "    " + str(pressure)
+        self.therin_bulk = "1   " + bulk + "    *"
+        self.n_calls += 1
+        if (pressure, temperature) in self.hang:
+            if self.timeout is None:
+                raise RuntimeError(f"Mock Theriak hangs at P={pressure} T={temperature} and no timeout is set")
+            time.sleep(self.timeout)
+            raise subprocess.TimeoutExpired("theriak", self.timeout)
+        if (pressure, temperature) in self.crash:
+            return ""
+        if self.latency:
+            time.sleep(self.latency)
+        return render_out(pressure, temperature, bulk, self.database, self.catalogue,
+                          failed=(pressure, temperature) in self.failed)
+
+
+def install_fake_theriak(directory):
+    """
+    Writes a fake 'theriak' executable in directory (usable as programs_dir for pools and
+    AsyncTheriakContainer, or as therdom_dir for legacy.Theriapy). Its latency is read from the
+    THERIAPY_MOCK_LATENCY environment variable; it hangs at the "P:T" points listed (comma separated)
+    in THERIAPY_MOCK_HANG. Returns the path of the executable.
+    """
+    os.makedirs(directory, exist_ok=True)
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(directory, "theriak")
+    with open(path, "w") as file:
+        file.write(f"#!{sys.executable}\n"
+                   f"import sys\n"
+                   f"sys.path.insert(0, {package_dir!r})\n"
+                   f"from theriapy.mock import main\n"
+                   f"main()\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def main():
+    """Entry point of the fake theriak executable: reads the answers on stdin and THERIN in the working directory."""
+    latency = float(os.environ.get("THERIAPY_MOCK_LATENCY", "0"))
+    hang = os.environ.get("THERIAPY_MOCK_HANG", "")
+    hang = {tuple(int(v) for v in point.split(":")) for point in hang.split(",") if point}
+    database = sys.stdin.readline().strip()
+    calculation = sys.stdin.readline().strip()
+
+    with open("THERIN") as file:
+        lines = [line for line in file.read().splitlines() if line.strip() and not line.startswith("!")]
+    points = [(lines[i], lines[i + 1]) for i in range(0, len(lines) - 1, 2)]
+    if calculation != "loop":
+        points = points[:1]
+
+    outs = []
+    for pt_line, bulk_line in points:
+        temperature, pressure = pt_line.split()[:2]
+        if (int(float(pressure)), int(float(temperature))) in hang:
+            time.sleep(3600)
+        if latency:
+            time.sleep(latency)
+        outs.append(render_out(int(float(pressure)), int(float(temperature)), bulk_line.split()[1], database,
+                               end_marker=False))
+    out = "".join(outs) + " exit THERIAK\n CPU time:  0.01 s\n"
+    with open("OUT", "w") as file:
+        file.write(out)
+    sys.stdout.write(out)
+
+
+def mock_container(latency=0.0, cache=None, programs_dir=None, catalogue=None, retry=None, hang=(), crash=(),
+                   failed=()):
+    """
+    TheriakContainer backed by MockTherCaller. If programs_dir is given, a fake theriak executable is
+    installed there so that pools (n_workers > 1) also run without Theriak.
+    """
+    from theriapy.containers import TheriakContainer
+    if programs_dir is not None:
+        install_fake_theriak(programs_dir)
+    ther = TheriakContainer(programs_dir if programs_dir is not None else ".", "mockdb", "mock", cache=cache,
+                            retry=retry)
+    ther.theriak = MockTherCaller(programs_dir=ther.programs_dir, latency=latency, catalogue=catalogue, hang=hang,
+                                  crash=crash, failed=failed)
+    return ther
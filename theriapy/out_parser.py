@@ -0,0 +1,241 @@
+import mmap
+import re
+import numpy as np
+
+_elements_header = re.compile(r'  ([A-Z]+)  ')
+_phase_name = re.compile(r'\w*[a-zA-Z:_-]')
+
+vol_dtype = np.dtype([('phase', 'U32'), ('is_fluid', bool), ('n', 'f8'), ('vol_mol', 'f8'), ('vol', 'f8'),
+                      ('vol_percent', 'f8'), ('wt_mol', 'f8'), ('wt', 'f8'), ('wt_percent', 'f8'),
+                      ('density', 'f8')])
+h2o_dtype = np.dtype([('phase', 'U32'), ('is_fluid', bool), ('n', 'f8'), ('h2o_pfu', 'f8'), ('h2o_mol', 'f8'),
+                      ('h2o_g', 'f8'), ('wt_percent_fluid', 'f8'), ('wt_percent_solids', 'f8'),
+                      ('wt_percent_h2o_solid', 'f8')])
+
+_vol_legacy_header = ["Phase", "N", "Volume/mol", "volume[ccm]", "vol%", "wt/mol", "wt [g]", "wt [%]", "density"]
+_h2o_legacy_header = ["Phase", "N", "H2O [pfu]", "H2O [mol]", "H2O [g]", "wt% of fluid", "wt% of solids",
+                      "wt% of H2O.solid"]
+
+
+def _numbers(tokens):
+    try:
+        return [float(tok) for tok in tokens]
+    except ValueError:
+        pass
+    nums = []
+    for tok in tokens:
+        try:
+            nums.append(float(tok))
+        except ValueError:
+            pass
+    return nums
+
+
+def _is_separator(line):
+    stripped = line.strip()
+    return not stripped or stripped.strip('-') == ''
+
+
+class OutTables:
+    """Typed tables parsed from a Theriak OUT.
+
+    Attributes:
+        volumes : Structured array (vol_dtype), one row per stable phase; nan for the fields fluids do not have
+        volume_totals : Dict of the "total of solids" row (vol, vol_percent, wt, wt_percent, density)
+        h2o : Structured array (h2o_dtype), one row per phase of the H2O content table
+        h2o_total : Total H2O of solids (h2o_mol, h2o_g, wt_percent_solids)
+        elements : Element names of the composition table (including E)
+        comp_phases : Phase names of the composition table
+        compositions : Float array (n_phases, n_elements), moles of elements in stable phases
+        comp_total : Float array (n_elements), moles of elements in the system
+        complete : True if the OUT ends with the CPU time marker
+    """
+
+    def __init__(self):
+        self.volumes = np.zeros(0, dtype=vol_dtype)
+        self.volume_totals = {}
+        self.h2o = np.zeros(0, dtype=h2o_dtype)
+        self.h2o_total = {}
+        self.elements = []
+        self.comp_phases = []
+        self.compositions = np.zeros((0, 0))
+        self.comp_total = np.zeros(0)
+        self.complete = False
+
+    def get_composition(self, phase):
+        return dict(zip(self.elements, self.compositions[self.comp_phases.index(phase)]))
+
+    def to_legacy(self):
+        """Tables in the list-of-lists format returned by Theriapy.parse_out"""
+        solids = self.volumes[~self.volumes['is_fluid']]
+        fluids = self.volumes[self.volumes['is_fluid']]
+        data_vol_d = [list(_vol_legacy_header)]
+        data_vol_d += [[row['phase'], *[float(row[f]) for f in vol_dtype.names[2:]]] for row in solids]
+        if self.volume_totals:
+            t = self.volume_totals
+            data_vol_d.append(["Total", '', '', t['vol'], t['vol_percent'], '', t['wt'], t['wt_percent'],
+                               t['density']])
+        data_vol_d += [[row['phase'], float(row['n']), float(row['vol_mol']), float(row['vol']), '',
+                        float(row['wt_mol']), float(row['wt']), '', float(row['density'])] for row in fluids]
+
+        solids = self.h2o[~self.h2o['is_fluid']]
+        fluids = self.h2o[self.h2o['is_fluid']]
+        data_h2o = [list(_h2o_legacy_header)]
+        data_h2o += [[row['phase'], *[float(row[f]) for f in h2o_dtype.names[2:]]] for row in solids]
+        if self.h2o_total:
+            t = self.h2o_total
+            data_h2o.append(["Total (solids)", '', '', t['h2o_mol'], t['h2o_g'], '', t['wt_percent_solids'], ''])
+        data_h2o += [[row['phase'], *[float(row[f]) for f in h2o_dtype.names[2:7]], '', ''] for row in fluids]
+
+        data_compo = []
+        if self.elements:
+            data_compo.append(['Phase', *self.elements])
+            for name, row in zip(self.comp_phases, self.compositions):
+                data_compo.append([name, *row.tolist()])
+            data_compo.append(['total:', *self.comp_total.tolist()])
+        return data_vol_d, data_h2o, data_compo
+
+
+def _parse_volumes(lines, i, tables):
+    solids = []
+    fluids = []
+    i += 5
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if 'exit THERIAK' in line:
+            break
+        if _is_separator(line):
+            continue
+        tokens = line.split()
+        if tokens[0] == 'total':
+            nums = _numbers(tokens)
+            tables.volume_totals = dict(zip(('vol', 'vol_percent', 'wt', 'wt_percent', 'density'), nums))
+            i += 4
+            break
+        nums = _numbers(tokens[1:])
+        solids.append((tokens[0], False, *nums[:8], *([np.nan] * (8 - len(nums[:8])))))
+
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if 'exit THERIAK' in line or '-------------' in line:
+            break
+        if _is_separator(line):
+            continue
+        tokens = line.split()
+        n, vol_mol, vol, wt_mol, wt, density = (_numbers(tokens[1:]) + [np.nan] * 6)[:6]
+        fluids.append((tokens[0], True, n, vol_mol, vol, np.nan, wt_mol, wt, np.nan, density))
+
+    tables.volumes = np.array(solids + fluids, dtype=vol_dtype)
+    return i
+
+
+def _parse_h2o(lines, i, tables):
+    rows = []
+    i += 4
+    in_solids = i - 1 < len(lines) and "solid phases" in lines[i - 1]
+    if not in_solids:
+        i += 1
+    while in_solids and i < len(lines):
+        line = lines[i]
+        i += 1
+        if 'exit THERIAK' in line:
+            break
+        if _is_separator(line):
+            continue
+        tokens = line.split()
+        if tokens[0] == 'total':
+            tables.h2o_total = dict(zip(('h2o_mol', 'h2o_g', 'wt_percent_solids'), _numbers(tokens)))
+            i += 4
+            break
+        nums = _numbers(tokens[1:])
+        rows.append((tokens[0], False, *(nums + [np.nan] * 7)[:7]))
+
+    while i < len(lines):
+        tokens = lines[i].split()
+        if not tokens or not _phase_name.match(tokens[0]) or tokens[0].strip('-') == '':
+            break
+        i += 1
+        nums = _numbers(tokens[1:])
+        rows.append((tokens[0], True, *(nums + [np.nan] * 5)[:5], np.nan, np.nan))
+
+    tables.h2o = np.array(rows, dtype=h2o_dtype)
+    return i
+
+
+def _parse_elements(lines, i, tables):
+    i += 3
+    elements = _elements_header.findall(lines[i])
+    n_lines = 1
+    i += 1
+    if elements and elements[-1] != 'E':
+        elements += _elements_header.findall(lines[i])
+        n_lines += 1
+        i += 1
+
+    names = []
+    rows = []
+    while i < len(lines):
+        line = lines[i]
+        if 'exit THERIAK' in line:
+            break
+        tokens = line.split()
+        if not tokens or tokens[0].strip('-') == '' or tokens[0] == 'elements':
+            i += 1
+            continue
+        nums = _numbers(tokens[1:])
+        for k in range(1, n_lines):
+            nums += _numbers(lines[i + k].split())
+        i += n_lines
+        if tokens[0] == 'total:':
+            tables.comp_total = np.array(nums[:len(elements)])
+            break
+        names.append(tokens[0])
+        rows.append((nums + [np.nan] * len(elements))[:len(elements)])
+
+    tables.elements = elements
+    tables.comp_phases = names
+    tables.compositions = np.array(rows, dtype=float).reshape(len(rows), len(elements))
+    return i
+
+
+_section_parsers = {
+    'volumes and densities of stable phases:': _parse_volumes,
+    'H2O content of stable phases:': _parse_h2o,
+    'elements in stable phases:': _parse_elements,
+}
+
+
+def parse_out_text(text):
+    """Parses the volumes, H2O content and element compositions of a Theriak OUT given as a string"""
+    tables = OutTables()
+    stripped = text.rstrip()
+    tables.complete = 'CPU time' in stripped[stripped.rfind('\n') + 1:]
+
+    # Sections are located with substring searches over the buffer; only their lines are split
+    starts = []
+    for header in _section_parsers:
+        pos = text.find('\n ' + header)
+        if pos != -1:
+            starts.append((pos + 1, header))
+    starts.sort()
+    for k, (start, header) in enumerate(starts):
+        if k + 1 < len(starts):
+            end = starts[k + 1][0]
+        else:
+            end = text.find('\n elements per formula unit:', start)
+            end = len(text) if end == -1 else end
+        _section_parsers[header](text[start:end].splitlines(), 0, tables)
+    return tables
+
+
+def parse_out_file(filepath):
+    """Parses a Theriak OUT file (memory-mapped), see parse_out_text"""
+    with open(filepath, 'rb') as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                text = mm[:].decode('utf-8', errors='replace')
+        except ValueError:  # empty file
+            text = ''
+    return parse_out_text(text)
@@ -0,0 +1,160 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from theriapy.retry import TimedTherCaller, minimise_with_retry
+
+
+class ScratchTherCaller(TimedTherCaller):
+    """A TherCaller writing THERIN and running Theriak in its own scratch directory.
+
+    pytheriak writes THERIN in the current working directory, so concurrent callers would
+    overwrite each other's input. The database and theriak.ini files are copied from source_dir
+    (the current working directory by default) into scratch_dir. If a RetryPolicy is given,
+    minimisation applies it.
+    """
+
+    def __init__(self, programs_dir, database, theriak_version, scratch_dir, source_dir=None, verbose=True,
+                 retry=None):
+        super().__init__(programs_dir=programs_dir, database=database, theriak_version=theriak_version,
+                         verbose=verbose)
+        self.retry = retry
+        self.scratch_dir = scratch_dir
+        source_dir = os.getcwd() if source_dir is None else source_dir
+        os.makedirs(scratch_dir, exist_ok=True)
+        for name in os.listdir(source_dir):
+            if name == "theriak.ini" or name.startswith(database):
+                src = os.path.join(source_dir, name)
+                if os.path.isfile(src):
+                    shutil.copy(src, os.path.join(scratch_dir, name))
+
+    def write_therin(self, pressure, temperature, bulk):
+        self.pressure = pressure
+        self.temperature = temperature
+        self.theriak_input = self.database + "\n" + "no\n"
+        self.therin_PT = "    " + str(temperature) + "    " + str(pressure)
+        self.therin_bulk = "1   " + bulk + "    *"
+
+        with open(os.path.join(self.scratch_dir, "THERIN"), "w") as therin_file:
+            therin_file.write(self.therin_PT)
+            therin_file.write("\n")
+            therin_file.write(self.therin_bulk)
+
+    def call_theriak(self, pressure, temperature, bulk):
+        self.write_therin(pressure, temperature, bulk)
+        out = subprocess.run([self.theriak_exe], input=self.theriak_input, encoding="utf-8",
+                             capture_output=True, cwd=self.scratch_dir, timeout=self.timeout)
+        return out.stdout
+
+    def minimisation(self, pressure, temperature, bulk, return_failed_minimisation=False):
+        if self.retry is not None:
+            return minimise_with_retry(self, pressure, temperature, bulk, self.retry, return_failed_minimisation)
+        return super().minimisation(pressure, temperature, bulk, return_failed_minimisation)
+
+
+# Per-process caller, created by the process pool initializer
+_process_caller = None
+
+
+def _new_caller(config):
+    scratch_dir = tempfile.mkdtemp(prefix="worker_", dir=config["scratch_root"])
+    return ScratchTherCaller(config["programs_dir"], config["database"], config["theriak_version"],
+                             scratch_dir=scratch_dir, source_dir=config["source_dir"],
+                             verbose=config["verbose"], retry=config.get("retry"))
+
+
+def _init_process_worker(config):
+    global _process_caller
+    _process_caller = _new_caller(config)
+
+
+def _process_minimisation(args):
+    pressure, temperature, bulk, return_failed_minimisation = args
+    return _process_caller.minimisation(pressure, temperature, bulk,
+                                        return_failed_minimisation=return_failed_minimisation)
+
+
+class MinimisationPool:
+    """Runs independent minimisations concurrently, each worker owning its own TherCaller.
+
+    Attributes:
+        n_workers : Number of workers, defaults to the number of CPUs
+        executor : "thread" or "process"
+        scratch_root : Directory in which worker scratch directories are created. A temporary
+        directory is created (and removed on close) if None.
+        retry : RetryPolicy applied by the workers (timeouts, retries, failures recorded or raised), or None
+    """
+
+    def __init__(self, programs_dir, database, theriak_version, n_workers=None, executor="thread",
+                 scratch_root=None, source_dir=None, verbose=False, retry=None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor '{executor}', expected 'thread' or 'process'")
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.executor_type = executor
+        self._own_scratch = scratch_root is None
+        self.scratch_root = tempfile.mkdtemp(prefix="theriapy_") if scratch_root is None else scratch_root
+        os.makedirs(self.scratch_root, exist_ok=True)
+        self.config = {"programs_dir": programs_dir,
+                       "database": database,
+                       "theriak_version": theriak_version,
+                       "scratch_root": self.scratch_root,
+                       "source_dir": os.getcwd() if source_dir is None else source_dir,
+                       "verbose": verbose,
+                       "retry": retry}
+
+        if executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_process_worker,
+                                                initargs=(self.config,))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        self._thread_callers = threading.local()
+
+    def _thread_minimisation(self, args):
+        pressure, temperature, bulk, return_failed_minimisation = args
+        caller = getattr(self._thread_callers, "caller", None)
+        if caller is None:
+            caller = _new_caller(self.config)
+            self._thread_callers.caller = caller
+        return caller.minimisation(pressure, temperature, bulk, return_failed_minimisation=return_failed_minimisation)
+
+    def map(self, pressures, temps, bulks, return_failed_minimisation=True):
+        """Returns the (rock, element_list) results in the order of the inputs."""
+        args = [(int(p), int(t), b, return_failed_minimisation) for p, t, b in zip(pressures, temps, bulks)]
+        if self.executor_type == "process":
+            chunksize = max(1, len(args) // (4 * self.n_workers))
+            return list(self.executor.map(_process_minimisation, args, chunksize=chunksize))
+        return list(self.executor.map(self._thread_minimisation, args))
+
+    def imap(self, pressures, temps, bulks, return_failed_minimisation=True, window=None):
+        """
+        Yields the (rock, element_list) results in the order of the inputs, keeping at most window
+        (4 x n_workers by default) points in flight. Pending points are cancelled if the iteration is stopped.
+        """
+        window = 4 * self.n_workers if window is None else window
+        fn = _process_minimisation if self.executor_type == "process" else self._thread_minimisation
+        args = ((int(p), int(t), b, return_failed_minimisation) for p, t, b in zip(pressures, temps, bulks))
+        pending = deque()
+        try:
+            for arg in args:
+                pending.append(self.executor.submit(fn, arg))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self._own_scratch:
+            shutil.rmtree(self.scratch_root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,176 @@
+import numpy as np
+from matplotlib import pyplot as plt
+
+
+def assemblage_of(rock):
+    """Sorted tuple of the stable mineral and fluid names of a rock"""
+    return tuple(sorted([mineral.name for mineral in rock.mineral_assemblage] +
+                        [fluid.name for fluid in rock.fluid_assemblage]))
+
+
+class PTGrid:
+    """Result of compute_pt_grid. Nodes are indexed [temperature index, pressure index].
+
+    Attributes:
+        temperatures, pressures : The grid axes
+        assemblages : List of the assemblages found (sorted tuples of phase names)
+        labels : Int array (nT, nP), index of the assemblage at each node in assemblages
+        phases : Phase names, in order of first appearance
+        fluid_phases : Set of the phases that are fluids
+        volumes : Float array (nT, nP, n_phases) of the phase volumes
+        computed : Bool array (nT, nP), True where the node was minimised, False where it was filled
+        n_minimisations : Number of minimisations run
+    """
+
+    def __init__(self, temperatures, pressures, assemblages, labels, phases, fluid_phases, volumes, computed):
+        self.temperatures = temperatures
+        self.pressures = pressures
+        self.assemblages = assemblages
+        self.labels = labels
+        self.phases = phases
+        self.fluid_phases = fluid_phases
+        self.volumes = volumes
+        self.computed = computed
+        self.n_minimisations = int(computed.sum())
+
+    def assemblage_names(self):
+        return [" + ".join(asm) for asm in self.assemblages]
+
+    def cell_labels(self):
+        """Assemblage index of each cell (nT - 1, nP - 1); -1 for cells whose corners differ (field boundaries)."""
+        ll = self.labels[:-1, :-1]
+        same = (ll == self.labels[1:, :-1]) & (ll == self.labels[:-1, 1:]) & (ll == self.labels[1:, 1:])
+        return np.where(same, ll, -1)
+
+    def get_phase_vol(self, phase):
+        if phase not in self.phases:
+            return np.zeros(self.labels.shape)
+        return self.volumes[:, :, self.phases.index(phase)]
+
+    def get_mineral_vols(self):
+        idx = [i for i, ph in enumerate(self.phases) if ph not in self.fluid_phases]
+        return self.volumes[:, :, idx]
+
+    def get_fluid_vols(self):
+        idx = [i for i, ph in enumerate(self.phases) if ph in self.fluid_phases]
+        return self.volumes[:, :, idx]
+
+    def plot_fields(self, title=None, cmap=None, show_computed=False):
+        fig, ax = plt.subplots(figsize=(6, 5))
+        ax.pcolormesh(self.temperatures, self.pressures, self.labels.T, shading="nearest",
+                      cmap=plt.get_cmap("tab20") if cmap is None else cmap)
+        if show_computed:
+            tt, pp = np.meshgrid(self.temperatures, self.pressures, indexing="ij")
+            ax.plot(tt[self.computed], pp[self.computed], "k.", markersize=2)
+        ax.set_xlabel("T (°C)")
+        ax.set_ylabel("P (bar)")
+        if title:
+            ax.set_title(title)
+        return fig, ax
+
+
+def compute_pt_grid(ther, bulk, p_range, t_range, n_coarse=(4, 4), max_level=3, pool=None, verbose=0):
+    """
+    Maps the assemblage fields of a P-T area with an adaptive quadtree.
+    The coarse grid has n_coarse (temperature, pressure) cells. Each cell whose corner assemblages differ
+    is split in four, up to max_level times; the nodes of uniform cells are filled with the corner
+    assemblage and bilinearly interpolated volumes.
+    """
+    step = 2 ** max_level
+    n_t = n_coarse[0] * step + 1
+    n_p = n_coarse[1] * step + 1
+    temperatures = np.linspace(t_range[0], t_range[1], n_t)
+    pressures = np.linspace(p_range[0], p_range[1], n_p)
+
+    nodes = {}  # (i, j) -> (assemblage, {phase: vol})
+    phases = []
+    fluid_phases = set()
+
+    def evaluate(points):
+        points = [pt for pt in dict.fromkeys(points) if pt not in nodes]
+        if not points:
+            return
+        ps = [int(pressures[j]) for i, j in points]
+        ts = [int(temperatures[i]) for i, j in points]
+        if pool is not None:
+            results = ther.pool_minimisation(pool, ps, ts, [bulk] * len(points))
+        else:
+            results = [ther.minimisation(p, t, bulk) for p, t in zip(ps, ts)]
+        for pt, (rock, el_lis) in zip(points, results):
+            vols = {}
+            for mineral in rock.mineral_assemblage:
+                vols[mineral.name] = mineral.vol
+            for fluid in rock.fluid_assemblage:
+                vols[fluid.name] = fluid.vol
+                fluid_phases.add(fluid.name)
+            for name in vols:
+                if name not in phases:
+                    phases.append(name)
+            nodes[pt] = (assemblage_of(rock), vols)
+
+    evaluate([(i, j) for i in range(0, n_t, step) for j in range(0, n_p, step)])
+    cells = [(i, j) for i in range(0, n_t - 1, step) for j in range(0, n_p - 1, step)]
+    uniform_cells = []
+
+    while cells:
+        to_split = []
+        for i, j in cells:
+            corners = [nodes[(i, j)][0], nodes[(i + step, j)][0], nodes[(i, j + step)][0],
+                       nodes[(i + step, j + step)][0]]
+            if all(c == corners[0] for c in corners):
+                if step > 1:
+                    uniform_cells.append((i, j, step))
+            elif step > 1:
+                to_split.append((i, j))
+
+        if verbose:
+            print("Cell size", step, ":", len(to_split), "cells refined over", len(cells))
+        if step == 1:
+            break
+
+        half = step // 2
+        new_points = []
+        cells = []
+        for i, j in to_split:
+            new_points += [(i + half, j), (i, j + half), (i + half, j + half), (i + step, j + half),
+                           (i + half, j + step)]
+            cells += [(i, j), (i + half, j), (i, j + half), (i + half, j + half)]
+        evaluate(new_points)
+        step = half
+
+    assemblages = []
+    asm_index = {}
+    for asm, vols in nodes.values():
+        if asm not in asm_index:
+            asm_index[asm] = len(assemblages)
+            assemblages.append(asm)
+
+    labels = np.full((n_t, n_p), -1, dtype=int)
+    volumes = np.zeros((n_t, n_p, len(phases)))
+    computed = np.zeros((n_t, n_p), dtype=bool)
+    phase_index = {ph: k for k, ph in enumerate(phases)}
+
+    def vol_vector(vols):
+        vec = np.zeros(len(phases))
+        for name, vol in vols.items():
+            vec[phase_index[name]] = vol
+        return vec
+
+    # Fill uniform cells, then overwrite with the minimised nodes
+    for i, j, size in uniform_cells:
+        v00 = vol_vector(nodes[(i, j)][1])
+        v10 = vol_vector(nodes[(i + size, j)][1])
+        v01 = vol_vector(nodes[(i, j + size)][1])
+        v11 = vol_vector(nodes[(i + size, j + size)][1])
+        u = np.linspace(0, 1, size + 1)[:, None, None]
+        w = np.linspace(0, 1, size + 1)[None, :, None]
+        volumes[i:i + size + 1, j:j + size + 1] = ((1 - u) * (1 - w) * v00 + u * (1 - w) * v10 +
+                                                   (1 - u) * w * v01 + u * w * v11)
+        labels[i:i + size + 1, j:j + size + 1] = asm_index[nodes[(i, j)][0]]
+
+    for (i, j), (asm, vols) in nodes.items():
+        labels[i, j] = asm_index[asm]
+        volumes[i, j] = vol_vector(vols)
+        computed[i, j] = True
+
+    return PTGrid(temperatures, pressures, assemblages, labels, phases, fluid_phases, volumes, computed)
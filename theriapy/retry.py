@@ -0,0 +1,158 @@
+import subprocess
+from dataclasses import dataclass
+from pytheriak import wrapper
+
+
+class MinimisationError(Exception):
+    """A minimisation that still failed (timeout or crash) after the retries of its RetryPolicy"""
+
+    def __init__(self, failure):
+        super().__init__(f"Minimisation at P={failure.pressure} T={failure.temperature} failed after "
+                         f"{failure.attempts} attempt(s): {failure.reason}")
+        self.failure = failure
+
+
+class FailedRock:
+    """Stands in for the rock of a failed minimisation when the RetryPolicy records failures.
+
+    It has the attributes of a pytheriak rock that TheriaPy reads, with empty assemblages, so that
+    a failed point is an empty step for the path, grid and ensemble code; States records it as a failure.
+
+    Attributes:
+        pressure, temperature, bulk : The requested point
+        reason : Why the last attempt failed
+        attempts : Number of attempts made
+    """
+
+    def __init__(self, pressure, temperature, bulk, reason, attempts):
+        self.pressure = pressure
+        self.temperature = temperature
+        self.bulk = bulk
+        self.reason = reason
+        self.attempts = attempts
+        self.mineral_assemblage = []
+        self.fluid_assemblage = []
+        self.bulk_composition_moles = []
+
+    def __repr__(self):
+        return f"FailedRock(P={self.pressure}, T={self.temperature}, reason={self.reason!r})"
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How a minimisation is run. timeout: wall-clock limit in seconds of a Theriak run, the process is killed
+    beyond it (None: no limit); retries: number of attempts after the first one; perturbation: (dP bar, dT °C)
+    added to the point on the k-th retry as +k, -k, +k+1, ... times the offsets, (0, 0) to retry the same
+    point; on_failure: "raise" a MinimisationError or "record" it (a FailedRock is returned).
+    """
+    timeout: float = None
+    retries: int = 0
+    perturbation: tuple = (0, 0)
+    on_failure: str = "raise"
+
+    def __post_init__(self):
+        if self.on_failure not in ("raise", "record"):
+            raise ValueError(f"Unknown on_failure '{self.on_failure}', expected 'raise' or 'record'")
+
+    def offsets(self):
+        """(dP, dT) of each attempt, (0, 0) first"""
+        dp, dt = self.perturbation
+        res = [(0, 0)]
+        for k in range(1, self.retries + 1):
+            sign = 1 if k % 2 else -1
+            scale = sign * ((k + 1) // 2)
+            res.append((scale * dp, scale * dt))
+        return res
+
+
+class TimedTherCaller(wrapper.TherCaller):
+    """A TherCaller whose Theriak process is killed after timeout seconds (subprocess.TimeoutExpired is raised)"""
+
+    def __init__(self, programs_dir, database, theriak_version, verbose=True, timeout=None):
+        super().__init__(programs_dir=programs_dir, database=database, theriak_version=theriak_version,
+                         verbose=verbose)
+        self.timeout = timeout
+
+    def call_theriak(self, pressure, temperature, bulk):
+        self.pressure = pressure
+        self.temperature = temperature
+        self.theriak_input = self.database + "\n" + "no\n"
+        self.therin_PT = "    " + str(temperature) + "    " + str(pressure)
+        self.therin_bulk = "1   " + bulk + "    *"
+
+        with open("THERIN", "w") as therin_file:
+            therin_file.write(self.therin_PT)
+            therin_file.write("\n")
+            therin_file.write(self.therin_bulk)
+        out = subprocess.run([self.theriak_exe], input=self.theriak_input, encoding="utf-8",
+                             capture_output=True, timeout=self.timeout)
+        return out.stdout
+
+    def parse_output(self, theriak_output, return_failed_minimisation=False, minimisation_state=None):
+        """
+        Rock and element list from a Theriak output, (output, []) for a failed minimisation. minimisation_state
+        is the result of check_minimisation, if already known.
+        """
+        if minimisation_state is None:
+            minimisation_state = self.check_minimisation(theriak_output=theriak_output)
+        if minimisation_state or return_failed_minimisation:
+            blocks, element_list, output_line_overflow, fluids_stable = self.read_theriak(theriak_output=theriak_output)
+            rock = self.create_rock(blocks=blocks, output_line_overflow=output_line_overflow,
+                                    fluids_stable=fluids_stable)
+            return rock, element_list
+        return theriak_output, []
+
+    def minimisation(self, pressure, temperature, bulk, return_failed_minimisation=False):
+        # wrapper.TherCaller.minimisation calls TherCaller.call_theriak explicitly, bypassing the override
+        theriak_output = self.call_theriak(pressure=pressure, temperature=temperature, bulk=bulk)
+        return self.parse_output(theriak_output, return_failed_minimisation)
+
+
+def perturbation_of(rock):
+    """(dP, dT) offset of the retry that computed rock, (0, 0) if it was computed at the requested point"""
+    return getattr(rock, "perturbation", (0, 0))
+
+
+def minimise_with_retry(caller, pressure, temperature, bulk, policy, return_failed_minimisation=True,
+                        instrument=None):
+    """
+    Runs caller.call_theriak (killed after policy.timeout if the caller supports it) then parses the output
+    with caller.parse_output, retrying timeouts, crashes and unreadable outputs as set by policy.
+    Returns (rock, element_list), or (FailedRock, []) when the attempts are exhausted and failures are recorded.
+    A rock computed by a retry off the requested point has a perturbation attribute, the (dP, dT) offset used
+    (see perturbation_of). Failed minimisations are counted in instrument, if given.
+    OSErrors (e.g. FileNotFoundError for a missing Theriak executable or database) are configuration errors
+    that no retry can fix: they are raised as is. caller.timeout is restored on return.
+    """
+    previous_timeout = getattr(caller, "timeout", None)
+    caller.timeout = policy.timeout
+    reason = None
+    attempts = 0
+    try:
+        for dp, dt in policy.offsets():
+            attempts += 1
+            try:
+                output = caller.call_theriak(pressure=int(pressure + dp), temperature=int(temperature + dt),
+                                             bulk=bulk)
+                if not output or not output.strip():
+                    raise RuntimeError("empty Theriak output")
+                minimisation_state = caller.check_minimisation(theriak_output=output)
+                rock, element_list = caller.parse_output(output, return_failed_minimisation, minimisation_state)
+                if instrument is not None and not minimisation_state:
+                    instrument.count("failed_minimisations")
+                if (dp, dt) != (0, 0) and not isinstance(rock, str):
+                    rock.perturbation = (dp, dt)
+                return rock, element_list
+            except subprocess.TimeoutExpired:
+                reason = f"timeout after {policy.timeout} s"
+            except OSError:
+                raise
+            except Exception as exc:
+                reason = f"{type(exc).__name__}: {exc}"
+    finally:
+        caller.timeout = previous_timeout
+    failure = FailedRock(pressure, temperature, bulk, reason, attempts)
+    if policy.on_failure == "raise":
+        raise MinimisationError(failure)
+    return failure, []
@@ -0,0 +1,32 @@
+import csv
+
+
+class VolumesCsvSink:
+    """Writes the phase volumes of each streamed state to a CSV file, one row per (step, phase).
+
+    Columns: step, pressure, temperature, phase, is_fluid, vol
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.file = open(filepath, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["step", "pressure", "temperature", "phase", "is_fluid", "vol"])
+        self.step = 0
+
+    def add_state(self, state, list_elements):
+        for mineral in state.mineral_assemblage:
+            self.writer.writerow([self.step, state.pressure, state.temperature, mineral.name, 0, mineral.vol])
+        for fluid in state.fluid_assemblage:
+            self.writer.writerow([self.step, state.pressure, state.temperature, fluid.name, 1, fluid.vol])
+        self.step += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
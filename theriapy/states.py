@@ -1,10 +1,15 @@
+import bisect
+from dataclasses import dataclass
 from itertools import cycle
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 import matplotlib as mpl
 from matplotlib import pyplot as plt
 from theriapy.bulk import name_ox_to_el, molar_mass, ratio_el_to_ox
-from theriapy.df_tools import add_nosort
+from theriapy.arrays import GrowableArray
+from theriapy.instrument import NULL_INSTRUMENTATION, timed_method
+from theriapy.retry import FailedRock, perturbation_of
 
 default_colors = mpl.rcParams['axes.prop_cycle'].by_key()['color']
 color_cycle = cycle(plt.rcParams["axes.prop_cycle"].by_key()["color"])
@@ -58,23 +63,344 @@ def assign_colors(list_cols, label_to_style, custom_cmap=None):
     return label_to_style
 
 
+@dataclass
+class AssemblageChange:
+    step: int  # first state of the new assemblage
+    entered: tuple  # phases stable from this step, sorted
+    left: tuple  # phases no longer stable from this step, sorted
+    assemblage: tuple  # stable phases from this step, sorted
+
+
+@dataclass
+class Projection:
+    """
+    Fields kept by States.add_state. rocks: keep the pytheriak rocks (None in states otherwise);
+    compositions: "all", None or a list of the phases whose compositions are kept; bulk: keep the
+    bulk composition (moles) of each state. Volumes, stable phases and P-T are always kept.
+    """
+    rocks: bool = True
+    compositions: object = "all"
+    bulk: bool = False
+
+    @classmethod
+    def lean(cls, compositions=None, bulk=False):
+        """Volumes only, plus the compositions of the given phases and the bulk if requested"""
+        return cls(rocks=False, compositions=compositions, bulk=bulk)
+
+
 class States:
-    def __init__(self, members=None):
+    """
+    States along a path. Besides the rocks, a columnar representation is kept as states are added:
+    the phase vocabulary (phase_names), the volumes (n_states x n_phases), the stable phases,
+    the P and T vectors and, for each phase, its molar compositions over list_all_elements.
+    A Projection restricts what is kept, e.g. States(projection=Projection.lean(["GARNET_alm"])) drops
+    the rocks once their volumes and the garnet composition are extracted.
+    The stable matrix is a per-phase presence bitmap; the runs of steps where each phase is stable and
+    the assemblage changes along the path are also indexed as states are added, so that
+    first_appearance, phase_runs, assemblage_at, ... do not scan the states.
+    """
+
+    def __init__(self, members=None, projection=None):
         self.states = []
         self.list_current_elements = []
         self.list_all_elements = []
-        self.members = None
+        self._members = None
+        self.projection = Projection() if projection is None else projection
+        compositions = self.projection.compositions
+        self._comp_all = compositions == "all"
+        self._comp_kept = set() if self._comp_all or compositions is None else set(compositions)
+        self._element_lists = {}  # interned element lists, tuple -> list
+        self._bulk = GrowableArray()
+
+        self.phase_names = []
+        self.phase_index = {}
+        self.fluid_phases = set()
+        self.element_index = {}
+        self._vols = GrowableArray()
+        self._stable = GrowableArray(dtype=bool, fill_value=False)
+        self._pt = GrowableArray(n_cols=2)
+        self._comp_rows = {}  # phase -> GrowableArray of state indices
+        self._comp_vals = {}  # phase -> GrowableArray (rows x list_all_elements)
+        self._comp_elements = {}  # phase -> set of the element indices in its compositions
+        self._interpolated = []  # indices of the interpolated states
+        self._failed = {}  # index -> reason of the failed minimisations
+        self._perturbed = {}  # index -> (dP, dT) offset of the states computed off their point by a retry
+        self._runs = {}  # phase -> list of [start, stop) step ranges where it is stable, stop None while open
+        self._events = []  # AssemblageChange list, in step order
+        self._event_steps = []  # step of each event, for bisection
+        self._last_cols = frozenset()  # stable columns of the last state
+        self._oxide_weights_cache = None
+        self._version = 0  # bumped by every new state and by set_members
+        self._views = {}  # memoised derived tables, see _memo
+        self._views_version = 0
+        self.instrument = NULL_INSTRUMENTATION  # set by TheriakContainer to time the post-processing
+
+    def __len__(self):
+        return len(self.states)
+
+    def _phase_col(self, name, is_fluid):
+        col = self.phase_index.get(name)
+        if col is None:
+            col = len(self.phase_names)
+            self.phase_names.append(name)
+            self.phase_index[name] = col
+            self._vols.add_columns()
+            self._stable.add_columns()
+            self._comp_rows[name] = GrowableArray(n_cols=1, dtype=np.int64)
+            self._comp_vals[name] = GrowableArray(n_cols=len(self.list_all_elements))
+            self._comp_elements[name] = set()
+            self._runs[name] = []
+            if is_fluid:
+                self.fluid_phases.add(name)
+        return col
 
     def add_state(self, state, list_elements):
-        self.states.append(state)
-        self.list_current_elements.append(list_elements)
-        for el in list_elements:
-            if el not in self.list_all_elements:
-                self.list_all_elements.append(el)
+        if isinstance(state, FailedRock):
+            self.add_failed_state(state.pressure, state.temperature, state.reason, list_elements)
+            self.states[-1] = state if self.projection.rocks else None
+            return
+        self.states.append(state if self.projection.rocks else None)
+        self._add_row(state.pressure, state.temperature, list_elements,
+                      [(phase.name, is_fluid, phase.vol, phase.composition_moles)
+                       for phases, is_fluid in ((state.mineral_assemblage, False), (state.fluid_assemblage, True))
+                       for phase in phases],
+                      state.bulk_composition_moles if self.projection.bulk else None)
+        offset = perturbation_of(state)
+        if offset != (0, 0):
+            self._perturbed[len(self.states) - 1] = offset
+
+    def keeps_composition(self, phase):
+        return self._comp_all or phase in self._comp_kept
+
+    def add_interpolated_state(self, pressure, temperature, list_elements, phases, bulk=None):
+        """
+        Adds a state without rock, e.g. interpolated between two computed states. phases is a list of
+        (name, is_fluid, vol, composition_moles) tuples. The state is flagged in interpolated.
+        """
+        self.states.append(None)
+        self._add_row(pressure, temperature, list_elements, phases, bulk)
+        self._interpolated.append(len(self.states) - 1)
+
+    def add_failed_state(self, pressure, temperature, reason, list_elements=()):
+        """Adds a state without phases for a minimisation that failed (see RetryPolicy); it is flagged in failed"""
+        self.states.append(None)
+        self._add_row(pressure, temperature, list_elements, [])
+        self._failed[len(self.states) - 1] = reason
+
+    def _add_row(self, pressure, temperature, list_elements, phases, bulk=None):
+        self._version += 1
+        key = tuple(list_elements)
+        interned = self._element_lists.get(key)
+        if interned is None:
+            interned = self._element_lists[key] = list(list_elements)
+            for el in interned:
+                if el not in self.element_index:
+                    self.element_index[el] = len(self.list_all_elements)
+                    self.list_all_elements.append(el)
+        self.list_current_elements.append(interned)
+
+        row = self._vols.append_row()
+        self._stable.append_row()
+        self._pt.append_row((pressure, temperature))
+        el_idx = [self.element_index[el] for el in interned]
+        if self.projection.bulk:
+            self._bulk.ensure_columns(len(self.list_all_elements))
+            bulk_row = self._bulk.append_row()
+            if bulk is not None:
+                self._bulk.data[bulk_row, el_idx] = bulk[:len(el_idx)]
+        seen = set()
+        cols = set()
+        for name, is_fluid, vol, composition in phases:
+            col = self._phase_col(name, is_fluid)
+            cols.add(col)
+            self._vols.data[row, col] = vol
+            self._stable.data[row, col] = True
+            if name in seen or not (self._comp_all or name in self._comp_kept):
+                continue
+            seen.add(name)
+            vals = self._comp_vals[name]
+            vals.ensure_columns(len(self.list_all_elements))
+            comp_row = vals.append_row()
+            vals.data[comp_row, el_idx] = composition[:len(el_idx)]
+            self._comp_rows[name].append_row((row,))
+            self._comp_elements[name].update(el_idx)
+        self._index_row(row, frozenset(cols))
+
+    def _index_row(self, row, cols):
+        if cols == self._last_cols and row > 0:
+            return  # row 0 always opens an event, even with an empty assemblage
+        entered = sorted(self.phase_names[c] for c in cols - self._last_cols)
+        left = sorted(self.phase_names[c] for c in self._last_cols - cols)
+        for name in entered:
+            self._runs[name].append([row, None])
+        for name in left:
+            self._runs[name][-1][1] = row
+        self._events.append(AssemblageChange(row, tuple(entered), tuple(left),
+                                             tuple(sorted(self.phase_names[c] for c in cols))))
+        self._event_steps.append(row)
+        self._last_cols = cols
+
+    def _reindex(self):
+        """Rebuilds the phase runs and the assemblage changes from the stable matrix (e.g. after loading)"""
+        self._runs = {name: [] for name in self.phase_names}
+        self._events = []
+        self._event_steps = []
+        self._last_cols = frozenset()
+        stable = self.stable
+        if not len(stable):
+            return
+        changes = np.concatenate(([0], np.flatnonzero(np.any(stable[1:] != stable[:-1], axis=1)) + 1))
+        for row in changes.tolist():
+            self._index_row(row, frozenset(np.flatnonzero(stable[row]).tolist()))
+
+    def phase_runs(self, phase):
+        """List of the (start, stop) step ranges (stop excluded) where phase is stable"""
+        return [(start, len(self.states) if stop is None else stop) for start, stop in self._runs.get(phase, [])]
+
+    def first_appearance(self, phase):
+        """First step where phase is stable, or None"""
+        runs = self._runs.get(phase)
+        return runs[0][0] if runs else None
+
+    def last_appearance(self, phase):
+        """Last step where phase is stable, or None"""
+        runs = self._runs.get(phase)
+        if not runs:
+            return None
+        return len(self.states) - 1 if runs[-1][1] is None else runs[-1][1] - 1
+
+    def is_stable_at(self, phase, step):
+        col = self.phase_index.get(phase)
+        return col is not None and bool(self._stable.values[step, col])
+
+    def steps_with(self, phase):
+        """Int array of the steps where phase is stable"""
+        runs = self.phase_runs(phase)
+        if not runs:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(start, stop) for start, stop in runs])
+
+    def assemblage_changes(self, phase=None):
+        """List of the AssemblageChange events, only those where phase enters or leaves if given"""
+        if phase is None:
+            return list(self._events)
+        return [event for event in self._events if phase in event.entered or phase in event.left]
+
+    def assemblage_at(self, step):
+        """Sorted tuple of the phases stable at step"""
+        if step < 0:
+            step += len(self.states)
+        if not 0 <= step < len(self.states):
+            raise IndexError(f"Step {step} out of range for {len(self.states)} states")
+        return self._events[bisect.bisect_right(self._event_steps, step) - 1].assemblage
+
+    def assemblage_segments(self):
+        """List of (start, stop, assemblage), the ranges of steps (stop excluded) with a constant assemblage"""
+        stops = self._event_steps[1:] + [len(self.states)]
+        return [(event.step, stop, event.assemblage) for event, stop in zip(self._events, stops)]
+
+    @property
+    def interpolated(self):
+        """Bool array (n_states), True for the states added by add_interpolated_state"""
+        flags = np.zeros(len(self.states), dtype=bool)
+        flags[self._interpolated] = True
+        return flags
+
+    @property
+    def failed(self):
+        """Bool array (n_states), True for the failed minimisations"""
+        flags = np.zeros(len(self.states), dtype=bool)
+        flags[list(self._failed)] = True
+        return flags
+
+    @property
+    def failures(self):
+        """Dict index -> reason of the failed minimisations"""
+        return dict(self._failed)
+
+    @property
+    def perturbed(self):
+        """Bool array (n_states), True for the states computed off their P-T point by a retry (see RetryPolicy)"""
+        flags = np.zeros(len(self.states), dtype=bool)
+        flags[list(self._perturbed)] = True
+        return flags
+
+    @property
+    def perturbations(self):
+        """Dict index -> (dP, dT) offset of the perturbed states, their P and T being the ones computed"""
+        return dict(self._perturbed)
+
+    @property
+    def volumes(self):
+        """Array (n_states, n_phases) of the phase volumes, columns in the order of phase_names"""
+        return self._vols.values
+
+    @property
+    def stable(self):
+        """Bool array (n_states, n_phases), True where the phase is stable"""
+        return self._stable.values
+
+    @property
+    def pressures(self):
+        return self._pt.values[:, 0]
+
+    @property
+    def temperatures(self):
+        return self._pt.values[:, 1]
+
+    def get_phase_vols(self, phase):
+        if phase not in self.phase_index:
+            return np.zeros(len(self.states))
+        return self.volumes[:, self.phase_index[phase]]
+
+    @property
+    def bulks(self):
+        """Array (n_states, n_all_elements) of the bulk compositions (moles), if kept by the projection"""
+        if not self.projection.bulk:
+            raise ValueError("The bulk compositions are not kept by the projection of these States")
+        out = np.zeros((len(self.states), len(self.list_all_elements)))
+        values = self._bulk.values
+        out[:, :values.shape[1]] = values
+        return out
+
+    def get_phase_comp_array(self, phase, with_fluids=True):
+        """
+        Array (n_states, n_all_elements) of the molar composition of a phase, columns in the order of
+        list_all_elements; zero where the phase is not stable.
+        """
+        if not self.keeps_composition(phase):
+            raise ValueError(f"The compositions of {phase} are not kept by the projection of these States")
+        arr = np.zeros((len(self.states), len(self.list_all_elements)))
+        if phase in self._comp_rows and (with_fluids or phase not in self.fluid_phases):
+            vals = self._comp_vals[phase].values
+            arr[self._comp_rows[phase].values[:, 0], :vals.shape[1]] = vals
+        return arr
+
+    @property
+    def members(self):
+        return self._members
+
+    @members.setter
+    def members(self, members):
+        self._members = members
+        self._version += 1
 
     def set_members(self, members):
         self.members = members
 
+    def _memo(self, key, build):
+        """
+        Derived table key, built by build() on first use and kept until a state is added or the members
+        change. Callers return copies, so the memoised tables are never modified.
+        """
+        if self._views_version != self._version:
+            self._views.clear()
+            self._views_version = self._version
+        value = self._views.get(key)
+        if value is None:
+            value = self._views[key] = build()
+        return value
+
     def print(self, verbose=True):
         for idx, st in self.states:
             print("Pressure", st.pressure, "Temperature", st.temperature)
@@ -97,20 +423,14 @@ class States:
                     df = df[[col_to_move] + [col for col in df.columns if col != col_to_move]]
         return df
 
+    @timed_method("states.get_vols_df")
     def get_vols_df(self, normalize=False, normalize_to_solids=False, liq_phases=None):
-        df = pd.DataFrame()
-        list_phases = []
-        for i in range(len(self.states)):
-            st = self.states[i]
-            for phase in st.mineral_assemblage:
-                df.loc[i, phase.name] = phase.vol
-                if phase.name not in list_phases:
-                    list_phases.append(phase.name)
-            for fluid in st.fluid_assemblage:
-                df.loc[i, fluid.name] = fluid.vol
-                if fluid.name not in list_phases:
-                    list_phases.append(fluid.name)
-        df = df.fillna(0)
+        key = ("vols", normalize, normalize_to_solids, tuple(liq_phases) if liq_phases is not None else None)
+        return self._memo(key, lambda: self._build_vols_df(normalize, normalize_to_solids, liq_phases)).copy()
+
+    def _build_vols_df(self, normalize, normalize_to_solids, liq_phases):
+        list_phases = list(self.phase_names)
+        df = pd.DataFrame(self.volumes.copy(), columns=list_phases)
 
         if normalize:
             if normalize_to_solids is True:
@@ -123,21 +443,18 @@ class States:
                 return df
         return df
 
-    def plot_path_stacked_volumes(self, valx, title=None, ignore=None, normalize=False, normalize_to_solids=False,
-                                  liq_phases=None,
-                                  xtitle="Phase volumes",
-                                  shrink=None, shrink_part=0.95, ticks_style=None, nbins=12, cmap=None,
-                                  move_front_lists=None, move_end_lists=None,
-                                  label_to_style=None, return_polycols=False):
-        if ignore is None:
-            ignore = []
-        if shrink is None:
-            shrink = []
-        move_front_lists = [] if move_front_lists is None else move_front_lists
-        move_end_lists = [] if move_end_lists is None else move_end_lists
-
-        xlabels = [str(e) for e in valx]
-
+    def get_merged_vols_df(self, normalize=False, normalize_to_solids=False, liq_phases=None, shrink=(),
+                           shrink_part=0.95, ignore=()):
+        """
+        Volumes with the end-members merged to their solution (see set_members), the shrink phases lowered by
+        shrink_part of their minimum and the ignore phases dropped; as get_vols_df without members.
+        """
+        key = ("merged", normalize, normalize_to_solids, tuple(liq_phases) if liq_phases is not None else None,
+               tuple(shrink), shrink_part, tuple(ignore))
+        return self._memo(key, lambda: self._build_merged_vols_df(normalize, normalize_to_solids, liq_phases,
+                                                                  shrink, shrink_part, ignore)).copy()
+
+    def _build_merged_vols_df(self, normalize, normalize_to_solids, liq_phases, shrink, shrink_part, ignore):
         df = self.get_vols_df(normalize=normalize, normalize_to_solids=normalize_to_solids, liq_phases=liq_phases)
 
         if self.members:
@@ -158,7 +475,31 @@ class States:
                     memb = df[solut].min()
                     df[solut] = df[solut] - memb * shrink_part
 
-            df = df.drop(columns=ignore, errors="ignore")
+            df = df.drop(columns=list(ignore), errors="ignore")
+        return df
+
+    @timed_method("states.plot_path_stacked_volumes")
+    def plot_path_stacked_volumes(self, valx, title=None, ignore=None, normalize=False, normalize_to_solids=False,
+                                  liq_phases=None,
+                                  xtitle="Phase volumes",
+                                  shrink=None, shrink_part=0.95, ticks_style=None, nbins=12, cmap=None,
+                                  move_front_lists=None, move_end_lists=None,
+                                  label_to_style=None, return_polycols=False, ax=None):
+        """
+        Stacked phase volumes along the path. The figure is created with pyplot, unless an Axes is given
+        (e.g. a panel of a figure rendered off-screen by batch_plot.batch_render_stacked_volumes).
+        """
+        if ignore is None:
+            ignore = []
+        if shrink is None:
+            shrink = []
+        move_front_lists = [] if move_front_lists is None else move_front_lists
+        move_end_lists = [] if move_end_lists is None else move_end_lists
+
+        xlabels = [str(e) for e in valx]
+
+        df = self.get_merged_vols_df(normalize=normalize, normalize_to_solids=normalize_to_solids,
+                                     liq_phases=liq_phases, shrink=shrink, shrink_part=shrink_part, ignore=ignore)
 
         # Sort columns
         df = self.df_move_front(df, move_front_lists)
@@ -176,11 +517,16 @@ class States:
         colors = [label_to_style[lab]["color"] for lab in list_cols]
 
         # Plot stacked lines
-        self.stack_fig, self.stack_ax = plt.subplots(figsize=(6, 4))
-        self.stack_fig.canvas.manager.set_window_title(title)
+        if ax is None:
+            self.stack_fig, self.stack_ax = plt.subplots(figsize=(6, 4))
+            self.stack_fig.canvas.manager.set_window_title(title)
+        else:
+            self.stack_fig, self.stack_ax = ax.figure, ax
         self.stack_ax.set_title(title)
-        polycols = self.stack_ax.stackplot(xlabels, data, labels=list_cols, colors=colors, linewidth=0.5,
-                                           edgecolor="face")
+        polycols = self.stack_ax.stackplot(xlabels, data, labels=list_cols, colors=colors, linewidth=0.5)
+        for pc in polycols:
+            # Matplotlib >= 3.10 cycles the stackplot edgecolor argument as a list of colors, rejecting "face"
+            pc.set_edgecolor("face")
 
         # Ticks
         if ticks_style == 'vertical':
@@ -211,6 +557,7 @@ class States:
             handle, label = self.stack_ax.get_legend_handles_labels()
             return df, handle, label
 
+    @timed_method("states.plot_path_phase_elts")
     def plot_path_phase_elts(self, phase, valx, title=None, ignore=['O', ], save=None, ticks_style=None,
                              with_fluids=False,
                              verbose=True):
@@ -218,26 +565,12 @@ class States:
             ignore = []
         xlabels = [str(e) for e in valx]
 
-        mol_df = DataFrame(columns=self.list_all_elements)
-        for i in range(len(self.states)):
-            state = self.states[i]
-            not_stable = True
-            for miner in state.mineral_assemblage:
-                if phase == miner.name:
-                    not_stable = False
-                    if verbose:
-                        print(list(zip(self.list_current_elements[i], miner.composition_moles)))
-                    mol_df.loc[len(mol_df)] = dict(zip(self.list_current_elements[i], miner.composition_moles))
-                    break
-            if with_fluids:
-                for fluid in state.fluid_assemblage:
-                    if phase == fluid.name:
-                        not_stable = False
-                        if verbose:
-                            print(list(zip(self.list_current_elements[i], fluid.composition_moles)))
-                        mol_df.loc[len(mol_df)] = dict(zip(self.list_current_elements[i], fluid.composition_moles))
-            if not_stable:
-                mol_df.loc[len(mol_df)] = 0
+        comp = self.get_phase_comp_array(phase, with_fluids=with_fluids)
+        mol_df = DataFrame(comp, columns=self.list_all_elements)
+        if verbose and phase in self._comp_rows and (with_fluids or phase not in self.fluid_phases):
+            for i in self._comp_rows[phase].values[:, 0]:
+                cols = [self.element_index[el] for el in self.list_current_elements[i]]
+                print(list(zip(self.list_current_elements[i], comp[i, cols].tolist())))
 
         if isinstance(save, str):
             dfs = mol_df.copy()
@@ -270,64 +603,106 @@ class States:
         ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
         fig.subplots_adjust(right=0.84)
 
+    def save(self, dirpath):
+        """Saves the volumes, compositions, element lists and P-T of the states, see archive.save_states"""
+        from theriapy.archive import save_states
+        save_states(self, dirpath)
+
+    @staticmethod
+    def load(dirpath, mmap=True):
+        """Loads States saved with save (without the rocks), memory-mapping the arrays if mmap is True"""
+        from theriapy.archive import load_states
+        return load_states(dirpath, mmap=mmap)
+
     def save_phases_vol(self, filepath):
         df = self.get_vols_df()
         df.T.to_excel(filepath, sheet_name="Vols")
 
+    @timed_method("states.get_phase_molar_comp")
     def get_phase_molar_comp(self, phase, verbose=0):
-        df = pd.DataFrame(index=range(len(self.states)), )
         if verbose:
             print("Get phase molar comp :", phase)
-        for i in range(len(self.states)):
-            df.loc[i, 'index'] = i
-            cols = self.list_current_elements[i]
-            st = self.states[i]
-            phase_names = [mineral.name for mineral in st.mineral_assemblage]
-            if phase in phase_names:
-                idx = phase_names.index(phase)
-                vals = st.mineral_assemblage[idx].composition_moles
-                df.loc[i, cols] = vals
-            else:
-                df.loc[i] = 0
-        df.fillna(0)
+        return self._memo(("molar", phase), lambda: self._build_phase_molar_comp(phase)).copy()
+
+    def _build_phase_molar_comp(self, phase):
+        comp = self.get_phase_comp_array(phase, with_fluids=False)
+        elt_idx = sorted(self._comp_elements[phase]) if phase not in self.fluid_phases and \
+            phase in self._comp_elements else []
+        df = pd.DataFrame(comp[:, elt_idx], columns=[self.list_all_elements[k] for k in elt_idx])
+        df.insert(0, 'index', np.arange(len(self.states), dtype=float))
         return df
 
+    def _oxide_weights(self):
+        """
+        Element -> oxide weight matrix (n_all_elements, n_oxides), built once per element vocabulary from
+        molar_mass and ratio_el_to_ox. Returns the oxide elements, the oxide names and the matrix.
+        """
+        n_elements = len(self.list_all_elements)
+        if self._oxide_weights_cache is None or self._oxide_weights_cache[0] != n_elements:
+            el_to_ox = {v: k for k, v in name_ox_to_el.items()}
+            elements = [el for el in self.list_all_elements if el in el_to_ox]
+            weights = np.zeros((n_elements, len(elements)))
+            for j, el in enumerate(elements):
+                weights[self.element_index[el], j] = molar_mass[el] / ratio_el_to_ox[el]
+            self._oxide_weights_cache = (n_elements, elements, [el_to_ox[el] for el in elements], weights)
+        return self._oxide_weights_cache[1:]
+
+    @timed_method("states.get_comp_oxides")
+    def get_comp_oxides(self, groups, normalize=True):
+        """
+        Oxide weights of groups of phases along the path, groups being a dict name -> list of phases (a single
+        phase, or the end-members of a solution, which are summed). The mineral compositions of all the groups
+        are converted in one product: membership (n_groups, n_phases) x compositions (n_phases, n_states,
+        n_elements) x element -> oxide weights (n_elements, n_oxides).
+        Returns a dict name -> DataFrame (n_states x oxides), normalised to 100 if normalize is True, with the
+        oxides of the elements found in the group's phases.
+        """
+        elements, oxides, weights = self._oxide_weights()
+        ox_col = {el: j for j, el in enumerate(elements)}
+        phases = list(dict.fromkeys(ph for members in groups.values() for ph in members
+                                    if ph in self._comp_rows and ph not in self.fluid_phases))
+        dropped = [ph for ph in phases if not self.keeps_composition(ph)]
+        if dropped:
+            raise ValueError(f"The compositions of {dropped} are not kept by the projection of these States")
+        phase_pos = {ph: i for i, ph in enumerate(phases)}
+
+        comp = np.zeros((len(phases), len(self.states), len(self.list_all_elements)))
+        for i, ph in enumerate(phases):
+            vals = self._comp_vals[ph].values
+            comp[i, self._comp_rows[ph].values[:, 0], :vals.shape[1]] = vals
+        membership = np.zeros((len(groups), len(phases)))
+        for g, members in enumerate(groups.values()):
+            for ph in members:
+                if ph in phase_pos:
+                    membership[g, phase_pos[ph]] = 1
+        ox_arr = np.einsum("gp,pse,eo->gso", membership, comp, weights, optimize=True)
+
+        res = {}
+        for g, (name, members) in enumerate(groups.items()):
+            # Oxide columns in order of the elements of the members (as merged by add_nosort)
+            elt_idx = list(dict.fromkeys(k for ph in members if ph in phase_pos
+                                         for k in sorted(self._comp_elements[ph])))
+            group_elements = [self.list_all_elements[k] for k in elt_idx if self.list_all_elements[k] != "O"]
+            missing = [el for el in group_elements if el not in ox_col]
+            if missing:
+                raise KeyError(f"No oxide for the elements {missing}")
+            df = pd.DataFrame(ox_arr[g][:, [ox_col[el] for el in group_elements]],
+                              columns=[oxides[ox_col[el]] for el in group_elements])
+            if normalize:
+                df = df.div(df.sum(axis=1), axis=0).mul(100)
+            res[name] = df
+        return res
+
+    @timed_method("states.get_phase_comp_oxides")
     def get_phase_comp_oxides(self, phase, normalize=True):
-        df = self.get_phase_molar_comp(phase)
-        ox_df = pd.DataFrame()
-        elt_cols = list(df.columns)
-        elt_cols.remove('index')
-
-        elt_cols_wo_O = elt_cols.copy()
-        elt_cols_wo_O.remove('O')
-
-        el_to_ox = {v: k for k, v in name_ox_to_el.items()}
-        for elt in elt_cols_wo_O:
-            ox_df[el_to_ox[elt]] = df[elt] * molar_mass[elt] / ratio_el_to_ox[elt]
-
-        final_df = ox_df.fillna(0)  # copy and fillna
-        if normalize:
-            final_df = ox_df.div(ox_df.sum(axis=1), axis=0).mul(100)
-
-        return final_df
+        return self.get_comp_oxides({phase: [phase]}, normalize=normalize)[phase]
 
+    @timed_method("states.get_solution_comp_oxides")
     def get_solution_comp_oxides(self, solution, normalize=True):
         members = [memb for memb in list(self.members[solution]) if '_' in memb]
-        mol_df = pd.DataFrame()
-        for phase in members:
-            df = self.get_phase_molar_comp(phase)
-            df = df.drop(columns="index", errors="ignore")
-            mol_df = add_nosort(mol_df, df)
-
-        ox_df = pd.DataFrame()
-        cols = list(mol_df.columns)
-        cols.remove("O")
-        el_to_ox = {v: k for k, v in name_ox_to_el.items()}
-        for elt in cols:
-            ox_df[el_to_ox[elt]] = mol_df[elt] * molar_mass[elt] / ratio_el_to_ox[elt]
-
-        final_df = ox_df.copy()
-        if normalize:
-            final_df = ox_df.div(ox_df.sum(axis=1), axis=0).mul(100)
+        return self.get_comp_oxides({solution: members}, normalize=normalize)[solution]
 
-        return final_df
+    def get_solutions_comp_oxides(self, normalize=True):
+        """Oxide weights of all the solutions of members, converted together, see get_comp_oxides"""
+        groups = {sol: [memb for memb in list(poles) if '_' in memb] for sol, poles in self.members.items()}
+        return self.get_comp_oxides(groups, normalize=normalize)